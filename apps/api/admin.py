@@ -1,12 +1,34 @@
 from django.contrib import admin
 from unfold.admin import ModelAdmin
 
+from apps.core.admin import LargeTableAdminMixin
+
+from .models import ArchivedTodo
 from .models import Todo
+from .models import TodoStats
 
 
 @admin.register(Todo)
-class TodoAdmin(ModelAdmin):
-    list_display = ("id", "title", "completed", "created_at")
+class TodoAdmin(LargeTableAdminMixin, ModelAdmin):
+    list_display = ("id", "title", "user", "completed", "created_at")
     list_filter = ("completed",)
+    list_select_related = ("user",)
     search_fields = ("title", "description")
     ordering = ("-created_at",)
+
+
+@admin.register(ArchivedTodo)
+class ArchivedTodoAdmin(LargeTableAdminMixin, ModelAdmin):
+    list_display = ("id", "title", "user", "created_at", "archived_at")
+    list_select_related = ("user",)
+    ordering = ("-created_at",)
+    readonly_fields = ("archived_at",)
+
+
+@admin.register(TodoStats)
+class TodoStatsAdmin(LargeTableAdminMixin, ModelAdmin):
+    list_display = ("user", "total", "completed", "last_updated")
+    list_select_related = ("user",)
+    ordering = ("-pk",)
+    search_fields = ("user__email",)
+    readonly_fields = ("user", "total", "completed", "last_updated")
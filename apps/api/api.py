@@ -2,19 +2,37 @@ import logging
 from datetime import UTC
 from datetime import datetime
 
-import stripe
 from django.conf import settings
-from django.contrib.auth.decorators import login_required
+from django.contrib.auth import get_user_model
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from django.utils.html import escape
 from ninja import NinjaAPI
 from ninja import Schema
+from ninja.errors import HttpError
+from ninja.security import django_auth
 from pydantic import Field
-from stripe import StripeError
 
+from apps.payments.stripe_client import get_stripe
+from apps.users.cache import forget_user
+from apps.users.tokens import revoke_user_tokens
+
+from . import stats
+from . import sync
+from .auth import AccessTokenAuth
+from .models import ArchivedTodo
 from .models import Todo
+from .models import TodoTombstone
+
+User = get_user_model()
+
+
+# Bearer access tokens first: they need no session or user lookup
+api = NinjaAPI(auth=[AccessTokenAuth(), django_auth])
 
-api = NinjaAPI()
+# Operations kept out of ATOMIC_REQUESTS, by URL name; apps.api.urls marks
+# their views, and each needs a path no other operation shares
+NON_ATOMIC_OPERATIONS = frozenset({"current_user"})
 logger = logging.getLogger(__name__)
 
 
@@ -58,6 +76,7 @@ class UserOut(Schema):
     def from_orm(user):
         subscription_info = None
         if settings.STRIPE_SECRET_KEY and getattr(user, "stripe_customer_id", None):
+            stripe = get_stripe()
             try:
                 subscriptions = stripe.Subscription.list(
                     customer=user.stripe_customer_id,
@@ -85,7 +104,7 @@ class UserOut(Schema):
                             "cancel_at_period_end", False
                         ),
                     )
-            except StripeError as exc:
+            except stripe.StripeError as exc:
                 logger.debug(
                     "Unable to fetch Stripe subscription for user %s: %s", user.pk, exc
                 )
@@ -100,8 +119,8 @@ class UserOut(Schema):
         )
 
 
-@api.get("/user/", response=UserOut)
-@login_required
+# Fetches the subscription from Stripe; no transaction is held open meanwhile
+@api.get("/user/", response=UserOut, url_name="current_user")
 def get_current_user(request):
     return UserOut.from_orm(request.user)
 
@@ -111,16 +130,17 @@ class MessageOut(Schema):
 
 
 @api.post("/debug/cancel-access/", response=MessageOut)
-@login_required
 def debug_cancel_access(request):
     """Debug endpoint to cancel user access. Only available in DEBUG mode."""
     if not settings.DEBUG:
         return {"message": "Only available in debug mode"}
 
-    user = request.user
-    user.has_membership = False
-    user.membership_paused = False
-    user.save(update_fields=["has_membership", "membership_paused"])
+    # request.user may be a TokenUser, so update the row directly
+    User.objects.filter(pk=request.user.pk).update(
+        has_membership=False, membership_paused=False
+    )
+    revoke_user_tokens(request.user.pk)
+    forget_user(request.user.pk)
     return {"message": "Access cancelled"}
 
 
@@ -147,36 +167,134 @@ class TodoOut(Schema):
         )
 
 
-@api.get("/todos/", response=list[TodoOut])
-@login_required
-def list_todos(request):
-    todos = Todo.objects.filter(user=request.user)
-    return [TodoOut.from_orm(todo) for todo in todos]
+# Sparse fieldsets: read endpoints take ``fields=id,title,...`` and select and
+# return only those (the id always). The list defaults to a compact projection
+# without the unbounded description.
+TODO_OUT_FIELDS = tuple(TodoOut.model_fields)
+TODO_LIST_FIELDS = ("id", "title", "completed")
+
 
+class TodoFieldsOut(Schema):
+    """``TodoOut`` limited to the requested fields; the rest are left out."""
 
+    id: int
+    title: str | None = None
+    description: str | None = None
+    completed: bool | None = None
+    created_at: str | None = None
+    updated_at: str | None = None
+
+
+def todo_fields(fields: str, default: tuple[str, ...]) -> tuple[str, ...]:
+    """The model fields named in a ``fields=`` parameter, in schema order."""
+    if not fields:
+        return default
+    requested = {name.strip() for name in fields.split(",")} - {""}
+    unknown = requested.difference(TODO_OUT_FIELDS)
+    if unknown:
+        raise HttpError(400, f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(name for name in TODO_OUT_FIELDS if name in requested | {"id"})
+
+
+def todo_values(row: dict, fields: tuple[str, ...]) -> dict:
+    """Output for a ``values()`` row, escaped like ``TodoOut``."""
+    out = {}
+    for name in fields:
+        value = row[name]
+        if name in {"title", "description"}:
+            value = escape(value)
+        elif name in {"created_at", "updated_at"}:
+            value = value.isoformat()
+        out[name] = value
+    return out
+
+
+@api.get("/todos/", response=list[TodoFieldsOut], exclude_unset=True)
+def list_todos(request, *, include_archived: bool = False, fields: str = ""):
+    names = todo_fields(fields, TODO_LIST_FIELDS)
+    todos = Todo.objects.filter(user_id=request.user.pk).values(*names)
+    if include_archived:
+        # Both tables have the same columns in the same order. A UNION can
+        # only be ordered by a selected column.
+        selected = (*names, "created_at") if "created_at" not in names else names
+        archived = ArchivedTodo.objects.filter(user_id=request.user.pk)
+        todos = (
+            todos.values(*selected)
+            .union(archived.values(*selected), all=True)
+            .order_by("-created_at")
+        )
+    return [todo_values(row, names) for row in todos]
+
+
+class TodoStatsOut(Schema):
+    total: int
+    completed: int
+    last_updated: str | None
+
+
+@api.get("/todos/stats/", response=TodoStatsOut)
+def todo_stats(request):
+    counts = stats.get_stats(request.user.pk)
+    return TodoStatsOut(
+        total=counts.total,
+        completed=counts.completed,
+        last_updated=counts.last_updated.isoformat() if counts.last_updated else None,
+    )
+
+
+class TodoChangesOut(Schema):
+    cursor: str
+    reset: bool
+    changed: list[TodoFieldsOut]
+    deleted: list[int]
+
+
+@api.get("/todos/changes/", response=TodoChangesOut, exclude_unset=True)
+def todo_changes(request, since: str = "", fields: str = ""):
+    """
+    Todos changed and ids deleted since the ``cursor`` of the previous call.
+
+    With ``reset`` the client must list all todos again, after keeping the
+    new ``cursor`` for its next call.
+    """
+    names = todo_fields(fields, TODO_OUT_FIELDS)
+    result = sync.changes(request.user.pk, since, names)
+    return {
+        **result,
+        "changed": [todo_values(row, names) for row in result["changed"]],
+    }
+
+
+# Writes run in the ATOMIC_REQUESTS transaction, so the counters commit or
+# roll back with the todo
 @api.post("/todos/", response={201: TodoOut})
-@login_required
 def create_todo(request, data: TodoIn):
     todo = Todo.objects.create(
-        user=request.user,
+        user_id=request.user.pk,
         title=data.title,
         description=data.description,
         completed=data.completed,
     )
+    stats.adjust(request.user.pk, total=1, completed=int(todo.completed))
     return 201, TodoOut.from_orm(todo)
 
 
-@api.get("/todos/{todo_id}/", response=TodoOut)
-@login_required
-def get_todo(request, todo_id: int):
-    todo = get_object_or_404(Todo, id=todo_id, user=request.user)
-    return TodoOut.from_orm(todo)
+@api.get("/todos/{todo_id}/", response=TodoFieldsOut, exclude_unset=True)
+def get_todo(request, todo_id: int, fields: str = ""):
+    names = todo_fields(fields, TODO_OUT_FIELDS)
+    row = get_object_or_404(
+        Todo.objects.values(*names), id=todo_id, user_id=request.user.pk
+    )
+    return todo_values(row, names)
 
 
 @api.put("/todos/{todo_id}/", response=TodoOut)
-@login_required
 def update_todo(request, todo_id: int, data: TodoUpdate):
-    todo = get_object_or_404(Todo, id=todo_id, user=request.user)
+    # Locked, so concurrent toggles can't both count the same change
+    todo = get_object_or_404(
+        Todo.objects.select_for_update(), id=todo_id, user_id=request.user.pk
+    )
+    was_completed = todo.completed
 
     if data.title is not None:
         todo.title = data.title
@@ -186,14 +304,20 @@ def update_todo(request, todo_id: int, data: TodoUpdate):
         todo.completed = data.completed
 
     todo.save()
+    stats.adjust(request.user.pk, completed=int(todo.completed) - int(was_completed))
     return TodoOut.from_orm(todo)
 
 
 @api.delete("/todos/{todo_id}/", response={204: None})
-@login_required
 def delete_todo(request, todo_id: int):
-    todo = get_object_or_404(Todo, id=todo_id, user=request.user)
+    todo = get_object_or_404(
+        Todo.objects.select_for_update(), id=todo_id, user_id=request.user.pk
+    )
+    TodoTombstone.objects.create(
+        id=todo.pk, user_id=todo.user_id, deleted_at=timezone.now()
+    )
     todo.delete()
+    stats.adjust(request.user.pk, total=-1, completed=-int(todo.completed))
     return 204, None
 
 
@@ -0,0 +1,100 @@
+"""
+Move old completed todos out of the hot ``api_todo`` table.
+
+Each batch is one statement: ``DELETE ... RETURNING`` the oldest completed
+todos not updated for ``TODO_ARCHIVE_AFTER_DAYS`` days, inserted straight
+into ``api_archivedtodo``. A batch commits on its own, so locks are short and
+an interrupted run loses nothing. ``SKIP LOCKED`` leaves rows a user is
+editing right now for a later run. The same statement writes tombstones
+for delta sync clients and lowers the user's ``TodoStats`` counters.
+"""
+
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from apps.core import metrics
+
+logger = logging.getLogger(__name__)
+
+# Completed todos take the partial api_todo_completed_idx in created_at order.
+# In the same statement, sync clients get tombstones for what was moved and the
+# counters in api_todostats drop by it.
+ARCHIVE_SQL = """
+WITH moved AS (
+    DELETE FROM "api_todo"
+    WHERE "id" IN (
+        SELECT "id" FROM "api_todo"
+        WHERE "completed" AND "updated_at" < %(cutoff)s
+        ORDER BY "created_at"
+        LIMIT %(batch_size)s
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING "id", "user_id", "title", "description", "completed",
+        "created_at", "updated_at"
+),
+archived AS (
+    INSERT INTO "api_archivedtodo" (
+        "id", "user_id", "title", "description", "completed",
+        "created_at", "updated_at", "archived_at"
+    )
+    SELECT "id", "user_id", "title", "description", "completed",
+        "created_at", "updated_at", %(now)s
+    FROM moved
+),
+tombstones AS (
+    INSERT INTO "api_todotombstone" ("id", "user_id", "deleted_at")
+    SELECT "id", "user_id", %(now)s FROM moved
+),
+counts AS (
+    SELECT "user_id", count(*) AS "moved" FROM moved GROUP BY "user_id"
+),
+adjusted AS (
+    UPDATE "api_todostats" SET
+        "total" = "api_todostats"."total" - counts."moved",
+        "completed" = "api_todostats"."completed" - counts."moved",
+        "last_updated" = %(now)s
+    FROM counts
+    WHERE "api_todostats"."user_id" = counts."user_id"
+)
+SELECT count(*) FROM moved
+"""
+
+
+def archive_completed_todos(
+    after_days: int | None = None,
+    batch_size: int | None = None,
+    time_budget: float | None = None,
+) -> int:
+    """
+    Archive in batches until none are left or ``time_budget`` seconds passed.
+
+    Returns how many todos were moved; settings supply missing arguments.
+    """
+    if after_days is None:
+        after_days = settings.TODO_ARCHIVE_AFTER_DAYS
+    if batch_size is None:
+        batch_size = settings.TODO_ARCHIVE_BATCH_SIZE
+    if time_budget is None:
+        time_budget = settings.TODO_ARCHIVE_TIME_BUDGET
+
+    now = timezone.now()
+    cutoff = now - timedelta(days=after_days)
+    deadline = time.monotonic() + time_budget
+    moved = 0
+    while True:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                ARCHIVE_SQL, {"cutoff": cutoff, "batch_size": batch_size, "now": now}
+            )
+            (count,) = cursor.fetchone()
+        moved += count
+        metrics.incr("todos_archived_total", count)
+        if count < batch_size or time.monotonic() >= deadline:
+            break
+    logger.info("Archived %s completed todos", moved)
+    return moved
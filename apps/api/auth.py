@@ -0,0 +1,25 @@
+from ninja.security import HttpBearer
+
+from apps.core import log
+from apps.core.routers import track_subject
+from apps.users.tokens import authenticate_access_token
+
+
+class AccessTokenAuth(HttpBearer):
+    """
+    ``Authorization: Bearer <access token>`` from the headless app client.
+
+    Checked against the signature and the revocation list only; no session or
+    user row is loaded. ``request.user`` becomes a ``TokenUser``. These clients
+    send no cookies, so the user id pins their reads to the primary after a
+    write.
+    """
+
+    def authenticate(self, request, token):
+        user = authenticate_access_token(token)
+        if user is None:
+            return None
+        request.user = user
+        log.update_context(user_id=user.pk)
+        track_subject(request, user.pk)
+        return user
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from apps.api.stats import repair_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every user's todo counters from the todo table with one "
+        "grouped aggregate and fix the ones that drifted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Only list the drifted counters"
+        )
+
+    def handle(self, *args, **options):
+        drifted = repair_stats(dry_run=options["dry_run"])
+        for user_id, stored, actual in drifted:
+            self.stdout.write(
+                f"user {user_id}: {stored[1]}/{stored[0]} -> {actual[1]}/{actual[0]}"
+            )
+        verb = "would be repaired" if options["dry_run"] else "repaired"
+        self.stdout.write(f"{len(drifted)} counters {verb}")
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:13
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.contrib.postgres.operations import TrigramExtension
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('api', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        AddIndexConcurrently(
+            model_name='todo',
+            index=models.Index(fields=['-created_at'], name='api_todo_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='todo',
+            index=models.Index(condition=models.Q(('completed', True)), fields=['-created_at'], name='api_todo_completed_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='todo',
+            index=models.Index(condition=models.Q(('completed', False)), fields=['-created_at'], name='api_todo_open_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='todo',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('title'), name='gin_trgm_ops'), name='api_todo_title_trgm'),
+        ),
+        AddIndexConcurrently(
+            model_name='todo',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('description'), name='gin_trgm_ops'), name='api_todo_description_trgm'),
+        ),
+    ]
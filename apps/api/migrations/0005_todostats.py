@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_archivedtodo'),
+        ('users', '0002_user_large_table_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TodoStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='todo_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total', models.IntegerField(default=0)),
+                ('completed', models.IntegerField(default=0)),
+                ('last_updated', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'todo stats',
+            },
+        ),
+        migrations.RunSQL(
+            """
+            INSERT INTO "api_todostats" ("user_id", "total", "completed", "last_updated")
+            SELECT "user_id", count(*), count(*) FILTER (WHERE "completed"), now()
+            FROM "api_todo"
+            GROUP BY "user_id"
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:11
+
+import django.db.models.deletion
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('api', '0005_todostats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TodoTombstone',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('deleted_at', models.DateTimeField()),
+            ],
+        ),
+        AddIndexConcurrently(
+            model_name='todo',
+            index=models.Index(fields=['user', 'updated_at'], name='api_todo_user_updated_idx'),
+        ),
+        migrations.AddField(
+            model_name='todotombstone',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='todotombstone',
+            index=models.Index(fields=['user', 'deleted_at'], name='api_todotombstone_user_idx'),
+        ),
+    ]
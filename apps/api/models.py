@@ -1,5 +1,8 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.indexes import OpClass
 from django.db import models
+from django.db.models.functions import Upper
 
 User = get_user_model()
 
@@ -18,9 +21,111 @@ class Todo(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["-created_at"], name="api_todo_created_idx"),
+            # Delta sync reads one user's changes since a cursor
+            models.Index(
+                fields=["user", "updated_at"], name="api_todo_user_updated_idx"
+            ),
+            # Partial indexes for the admin "completed" filter
+            models.Index(
+                fields=["-created_at"],
+                condition=models.Q(completed=True),
+                name="api_todo_completed_idx",
+            ),
+            models.Index(
+                fields=["-created_at"],
+                condition=models.Q(completed=False),
+                name="api_todo_open_idx",
+            ),
+            GinIndex(
+                OpClass(Upper("title"), name="gin_trgm_ops"),
+                name="api_todo_title_trgm",
+            ),
+            GinIndex(
+                OpClass(Upper("description"), name="gin_trgm_ops"),
+                name="api_todo_description_trgm",
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
 
+class ArchivedTodo(models.Model):
+    """
+    Completed todos moved out of ``Todo`` by ``apps.api.archive``.
+
+    Same columns in the same order, so the two tables can be read with one
+    UNION; ids are kept from ``Todo``.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="archived_todos"
+    )
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True, default="")
+    completed = models.BooleanField(default=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["user", "-created_at"], name="api_archivedtodo_user_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return self.title
+
+
+class TodoTombstone(models.Model):
+    """
+    Ids of todos that left a user's list, for delta sync clients.
+
+    Written on delete and on archiving; rows older than
+    ``TODO_TOMBSTONE_RETENTION_DAYS`` are compacted away.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    deleted_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "deleted_at"], name="api_todotombstone_user_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return str(self.id)
+
+
+class TodoStats(models.Model):
+    """
+    Per-user todo counts, kept in step with ``Todo`` by ``apps.api.stats``.
+
+    Counts cover the todo list proper; archived todos are taken out when
+    they are archived.
+    """
+
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name="todo_stats"
+    )
+    total = models.IntegerField(default=0)
+    completed = models.IntegerField(default=0)
+    last_updated = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = "todo stats"
+
+    def __str__(self):
+        return f"{self.completed}/{self.total}"
+
+
 # ############################################################
@@ -0,0 +1,92 @@
+"""
+Per-user todo counters (``TodoStats``).
+
+Every write path adjusts the counters in the same transaction as the todo
+itself:
+
+- the todo API, through ``adjust``
+- archiving, in the same statement that moves the todos
+
+Writes made elsewhere (the admin, the shell, ``QuerySet.update()``) leave
+them drifted until ``manage.py repair_todo_stats`` recomputes them.
+"""
+
+from django.db import connection
+from django.db.models import Count
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Todo
+from .models import TodoStats
+
+# An upsert, so the first todo of a user creates the row
+ADJUST_SQL = """
+INSERT INTO "api_todostats" ("user_id", "total", "completed", "last_updated")
+VALUES (%(user_id)s, %(total)s, %(completed)s, %(now)s)
+ON CONFLICT ("user_id") DO UPDATE SET
+    "total" = "api_todostats"."total" + EXCLUDED."total",
+    "completed" = "api_todostats"."completed" + EXCLUDED."completed",
+    "last_updated" = EXCLUDED."last_updated"
+"""
+
+
+def adjust(user_id: int, total: int = 0, completed: int = 0) -> None:
+    """Add ``total`` and ``completed`` to the user's counters."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            ADJUST_SQL,
+            {
+                "user_id": user_id,
+                "total": total,
+                "completed": completed,
+                "now": timezone.now(),
+            },
+        )
+
+
+def get_stats(user_id: int) -> TodoStats:
+    """The user's counters; zeros for a user who never had a todo."""
+    return TodoStats.objects.filter(user_id=user_id).first() or TodoStats(
+        user_id=user_id
+    )
+
+
+def repair_stats(*, dry_run: bool = False) -> list[tuple[int, tuple, tuple]]:
+    """
+    Recompute every user's counters with one grouped aggregate over ``Todo``.
+
+    Returns ``(user_id, stored, actual)`` for each drifted user, where the
+    counts are ``(total, completed)``; with ``dry_run`` nothing is written.
+    Increments committed while this runs can be overwritten, so run it when
+    the API is quiet or run it twice.
+    """
+    actual = {
+        row["user_id"]: (row["total"], row["completed"])
+        for row in Todo.objects.order_by()
+        .values("user_id")
+        .annotate(total=Count("id"), completed=Count("id", filter=Q(completed=True)))
+    }
+    stored = {stats.user_id: stats for stats in TodoStats.objects.all()}
+
+    drifted = []
+    for user_id in actual.keys() | stored.keys():
+        counts = actual.get(user_id, (0, 0))
+        stats = stored.get(user_id)
+        current = (stats.total, stats.completed) if stats else None
+        if current != counts and (stats or counts != (0, 0)):
+            drifted.append((user_id, current or (0, 0), counts))
+    if dry_run or not drifted:
+        return drifted
+
+    now = timezone.now()
+    to_update: list[TodoStats] = []
+    to_create: list[TodoStats] = []
+    for user_id, _stored, (total, completed) in drifted:
+        stats = stored.get(user_id) or TodoStats(user_id=user_id)
+        stats.total, stats.completed, stats.last_updated = total, completed, now
+        (to_update if user_id in stored else to_create).append(stats)
+    TodoStats.objects.bulk_update(
+        to_update, ["total", "completed", "last_updated"], batch_size=1000
+    )
+    TodoStats.objects.bulk_create(to_create, batch_size=1000, ignore_conflicts=True)
+    return drifted
@@ -0,0 +1,6 @@
+# Tasks are routed to Celery queues by module (see CELERY_TASK_ROUTES), so each
+# class of work lives in its own submodule: webhooks, email or bulk.
+from .bulk import archive_todos
+from .bulk import compact_todo_tombstones
+
+__all__ = ["archive_todos", "compact_todo_tombstones"]
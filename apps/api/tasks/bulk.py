@@ -0,0 +1,16 @@
+from celery import shared_task
+
+from apps.api.archive import archive_completed_todos
+from apps.api.sync import compact_tombstones
+
+
+@shared_task
+def archive_todos():
+    """Move old completed todos to the archive table, within the time budget."""
+    return archive_completed_todos()
+
+
+@shared_task
+def compact_todo_tombstones():
+    """Drop delete markers older than the delta sync retention."""
+    return compact_tombstones()
@@ -0,0 +1,76 @@
+"""Tests for archiving completed todos."""
+
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.api.archive import archive_completed_todos
+from apps.api.models import ArchivedTodo
+from apps.api.models import Todo
+
+User = get_user_model()
+
+
+class ArchiveTodosTest(TestCase):
+    """Tests for moving old completed todos and reading them back."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="archive@example.com",
+            password="testpass123",  # noqa: S106
+        )
+        long_ago = timezone.now() - timedelta(days=60)
+        self.old_done = [
+            Todo.objects.create(user=self.user, title=f"Old {n}", completed=True)
+            for n in range(3)
+        ]
+        self.recent_done = Todo.objects.create(
+            user=self.user, title="Recent", completed=True
+        )
+        self.old_open = Todo.objects.create(user=self.user, title="Open")
+        Todo.objects.filter(
+            pk__in=[todo.pk for todo in [*self.old_done, self.old_open]]
+        ).update(updated_at=long_ago, created_at=long_ago)
+
+    def test_moves_only_old_completed_todos_in_batches(self):
+        """Test that batches continue until nothing old and completed is left."""
+        moved = archive_completed_todos(after_days=30, batch_size=2, time_budget=60)
+
+        assert moved == 3  # noqa: PLR2004
+        archived = ArchivedTodo.objects.get(pk=self.old_done[0].pk)
+        assert archived.title == "Old 0"
+        assert archived.user_id == self.user.pk
+        assert (
+            archived.created_at
+            == self.old_done[0].created_at.replace(
+                microsecond=archived.created_at.microsecond
+            )
+            or archived.created_at < self.recent_done.created_at
+        )
+        assert set(Todo.objects.values_list("title", flat=True)) == {
+            "Recent",
+            "Open",
+        }
+
+    def test_time_budget_stops_after_a_batch(self):
+        """Test that an exhausted budget stops after the current batch."""
+        moved = archive_completed_todos(after_days=30, batch_size=2, time_budget=0)
+
+        assert moved == 2  # noqa: PLR2004
+        assert ArchivedTodo.objects.count() == 2  # noqa: PLR2004
+
+    def test_include_archived_lists_both_tables(self):
+        """Test the include_archived option of the todo list."""
+        archive_completed_todos(after_days=30)
+        self.client.force_login(self.user)
+
+        hot = self.client.get("/api/todos/").json()
+        both = self.client.get("/api/todos/?include_archived=true").json()
+
+        assert [todo["title"] for todo in hot] == ["Recent", "Open"]
+        assert len(both) == 5  # noqa: PLR2004
+        assert both[0]["title"] == "Recent"
+        assert {todo["title"] for todo in both[2:]} == {"Old 0", "Old 1", "Old 2"}
+        assert all(todo["completed"] for todo in both if todo["title"] != "Open")
@@ -0,0 +1,179 @@
+"""Tests for access-token authentication of the JSON API."""
+
+import jwt
+from allauth.account.models import EmailAddress
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from apps.api.models import Todo
+from apps.payments.membership import update_user_flags
+from apps.users.tokens import revoke_token
+from apps.users.tokens import revoke_user_tokens
+
+User = get_user_model()
+
+LOGIN_URL = "/_allauth/app/v1/auth/login"
+REFRESH_URL = "/_allauth/app/v1/tokens/refresh"
+SESSION_URL = "/_allauth/app/v1/auth/session"
+
+
+class AccessTokenAuthTest(TestCase):
+    """Tests for tokens issued by the headless app client."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="token@example.com",
+            password="testpass123",  # noqa: S106
+            has_membership=True,
+        )
+        EmailAddress.objects.create(
+            user=self.user, email=self.user.email, verified=True, primary=True
+        )
+        Todo.objects.create(user=self.user, title="Token todo")
+
+    def login(self):
+        response = self.client.post(
+            LOGIN_URL,
+            {"email": self.user.email, "password": "testpass123"},
+            content_type="application/json",
+        )
+        assert response.status_code == 200  # noqa: PLR2004
+        return response.json()["meta"]
+
+    def get_todos(self, access_token):
+        return self.client.get(
+            "/api/todos/", headers={"Authorization": f"Bearer {access_token}"}
+        )
+
+    def test_login_issues_tokens_with_membership_claims(self):
+        """Test that the access token carries the user id and membership."""
+        meta = self.login()
+
+        assert meta["refresh_token"]
+        claims = jwt.decode(meta["access_token"], options={"verify_signature": False})
+        assert claims["sub"] == str(self.user.pk)
+        assert claims["membership"] is True
+        assert claims["membership_paused"] is False
+
+    def test_access_token_needs_no_session_or_user_query(self):
+        """Test that only the todo query hits the database."""
+        access_token = self.login()["access_token"]
+        self.client.cookies.clear()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get_todos(access_token)
+
+        assert response.status_code == 200  # noqa: PLR2004
+        assert [todo["title"] for todo in response.json()] == ["Token todo"]
+        selects = [q["sql"] for q in queries if q["sql"].startswith("SELECT")]
+        assert len(selects) == 1
+        assert 'FROM "api_todo"' in selects[0]
+
+    def test_token_writes_need_no_csrf_token(self):
+        """Test that a bearer-authenticated write isn't subject to CSRF."""
+        access_token = self.login()["access_token"]
+        client = Client(enforce_csrf_checks=True)
+
+        response = client.post(
+            "/api/todos/",
+            {"title": "Token write"},
+            content_type="application/json",
+            headers={"Authorization": f"Bearer {access_token}"},
+        )
+
+        assert response.status_code == 201  # noqa: PLR2004
+
+    def test_anonymous_requests_are_rejected(self):
+        """Test that the API answers 401 without a token or session."""
+        assert self.client.get("/api/todos/").status_code == 401  # noqa: PLR2004
+        assert self.get_todos("not-a-token").status_code == 401  # noqa: PLR2004
+
+    def test_revoked_tokens_are_rejected(self):
+        """Test revoking a single token and all of a user's tokens."""
+        access_token = self.login()["access_token"]
+        self.client.cookies.clear()
+        payload = jwt.decode(access_token, options={"verify_signature": False})
+
+        revoke_token(payload)
+        assert self.get_todos(access_token).status_code == 401  # noqa: PLR2004
+
+        cache.clear()
+        revoke_user_tokens(self.user.pk)
+        assert self.get_todos(access_token).status_code == 401  # noqa: PLR2004
+
+    def test_refresh_token_issues_new_access_token(self):
+        """Test the allauth refresh endpoint with the custom strategy."""
+        meta = self.login()
+        self.client.cookies.clear()
+
+        response = self.client.post(
+            REFRESH_URL,
+            {"refresh_token": meta["refresh_token"]},
+            content_type="application/json",
+        )
+
+        assert response.status_code == 200  # noqa: PLR2004
+        access_token = response.json()["data"]["access_token"]
+        assert self.get_todos(access_token).status_code == 200  # noqa: PLR2004
+
+    def test_logout_revokes_access_tokens(self):
+        """Test that logging out stops the access token working."""
+        meta = self.login()
+        self.client.cookies.clear()
+
+        self.client.delete(
+            SESSION_URL, headers={"X-Session-Token": meta["session_token"]}
+        )
+
+        assert self.get_todos(meta["access_token"]).status_code == 401  # noqa: PLR2004
+
+    def test_logout_with_access_token_keeps_other_devices(self):
+        """Test that an app client logging out only revokes its own token."""
+        phone = self.login()["access_token"]
+        self.client.cookies.clear()
+        tablet = self.login()["access_token"]
+        self.client.cookies.clear()
+
+        self.client.delete(SESSION_URL, headers={"Authorization": f"Bearer {phone}"})
+
+        assert self.get_todos(phone).status_code == 401  # noqa: PLR2004
+        assert self.get_todos(tablet).status_code == 200  # noqa: PLR2004
+
+    def test_membership_change_revokes_access_tokens(self):
+        """Test that stale membership claims force a refresh."""
+        access_token = self.login()["access_token"]
+        self.client.cookies.clear()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            update_user_flags(self.user.pk, {"has_membership": False})
+
+        assert self.get_todos(access_token).status_code == 401  # noqa: PLR2004
+
+
+class SessionAuthCsrfTest(TestCase):
+    """Tests for CSRF protection of session-authenticated API writes."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email="csrf@example.com")
+        self.client = Client(enforce_csrf_checks=True)
+        self.client.force_login(self.user)
+
+    def create_todo(self, **headers):
+        return self.client.post(
+            "/api/todos/",
+            {"title": "CSRF"},
+            content_type="application/json",
+            headers=headers,
+        )
+
+    def test_session_write_needs_csrf_token(self):
+        """Test that a cookie-authenticated write without the token is refused."""
+        assert self.create_todo().status_code == 403  # noqa: PLR2004
+
+        token = self.client.get("/api/csrf/").json()["csrfToken"]
+        assert self.create_todo(**{"X-CSRFToken": token}).status_code == 201  # noqa: PLR2004
@@ -0,0 +1,106 @@
+"""Tests for sparse fieldsets on the todo read endpoints."""
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from apps.api.models import Todo
+
+User = get_user_model()
+
+
+class TodoFieldsTest(TestCase):
+    """Tests for the ``fields`` parameter."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="fields@example.com",
+            password="testpass123",  # noqa: S106
+        )
+        self.client.force_login(self.user)
+        self.todo = Todo.objects.create(
+            user=self.user, title="<b>Title</b>", description="Long description"
+        )
+
+    def test_list_defaults_to_compact_projection(self):
+        """Test that the list neither selects nor returns the description."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/todos/")
+
+        assert response.status_code == 200  # noqa: PLR2004
+        assert response.json() == [
+            {
+                "id": self.todo.pk,
+                "title": "&lt;b&gt;Title&lt;/b&gt;",
+                "completed": False,
+            }
+        ]
+        todo_queries = [q["sql"] for q in queries if '"api_todo"' in q["sql"]]
+        assert todo_queries
+        assert all('"description"' not in sql for sql in todo_queries)
+
+    def test_list_returns_requested_fields(self):
+        """Test that requested fields are returned, with the id always."""
+        response = self.client.get("/api/todos/", {"fields": "description"})
+
+        assert response.json() == [
+            {"id": self.todo.pk, "description": "Long description"}
+        ]
+
+    def test_list_with_archived_returns_requested_fields(self):
+        """Test that the archive union orders by created_at without returning it."""
+        response = self.client.get(
+            "/api/todos/", {"include_archived": "true", "fields": "title"}
+        )
+
+        assert response.json() == [
+            {"id": self.todo.pk, "title": "&lt;b&gt;Title&lt;/b&gt;"}
+        ]
+
+    def test_unknown_field_is_rejected(self):
+        """Test that an unknown field name is a 400."""
+        response = self.client.get("/api/todos/", {"fields": "title,user_id"})
+
+        assert response.status_code == 400  # noqa: PLR2004
+        assert "user_id" in response.json()["detail"]
+
+    def test_detail_defaults_to_all_fields(self):
+        """Test that the detail endpoint returns everything unless asked."""
+        url = f"/api/todos/{self.todo.pk}/"
+
+        full = self.client.get(url).json()
+        sparse = self.client.get(url, {"fields": "completed"}).json()
+
+        assert set(full) == {
+            "id",
+            "title",
+            "description",
+            "completed",
+            "created_at",
+            "updated_at",
+        }
+        assert sparse == {"id": self.todo.pk, "completed": False}
+
+    def test_detail_of_other_users_todo_is_404(self):
+        """Test that the values() lookup is still scoped to the user."""
+        other = User.objects.create_user(email="other@example.com")
+        todo = Todo.objects.create(user=other, title="Theirs")
+
+        response = self.client.get(f"/api/todos/{todo.pk}/", {"fields": "title"})
+
+        assert response.status_code == 404  # noqa: PLR2004
+
+    @override_settings(TODO_SYNC_OVERLAP=0)
+    def test_changes_return_requested_fields(self):
+        """Test that delta sync honours the fields parameter."""
+        cursor = self.client.get("/api/todos/changes/").json()["cursor"]
+        self.todo.completed = True
+        self.todo.save()
+
+        result = self.client.get(
+            "/api/todos/changes/", {"since": cursor, "fields": "completed"}
+        ).json()
+
+        assert result["changed"] == [{"id": self.todo.pk, "completed": True}]
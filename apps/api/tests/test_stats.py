@@ -0,0 +1,90 @@
+"""Tests for the per-user todo counters."""
+
+import io
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.api.archive import archive_completed_todos
+from apps.api.models import Todo
+from apps.api.models import TodoStats
+
+User = get_user_model()
+
+
+class TodoStatsTest(TestCase):
+    """Tests for keeping and repairing the counters."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="stats@example.com",
+            password="testpass123",  # noqa: S106
+        )
+        self.client.force_login(self.user)
+
+    def stats(self):
+        response = self.client.get("/api/todos/stats/")
+        assert response.status_code == 200  # noqa: PLR2004
+        return response.json()
+
+    def create(self, **data):
+        response = self.client.post(
+            "/api/todos/", {"title": "Todo", **data}, content_type="application/json"
+        )
+        return response.json()["id"]
+
+    def test_counters_follow_api_writes(self):
+        """Test create, toggle and delete through the API."""
+        assert self.stats() == {"total": 0, "completed": 0, "last_updated": None}
+
+        first = self.create()
+        second = self.create(completed=True)
+        self.client.put(
+            f"/api/todos/{first}/", {"completed": True}, content_type="application/json"
+        )
+        self.client.put(
+            f"/api/todos/{first}/",
+            {"title": "Renamed"},
+            content_type="application/json",
+        )
+        self.client.delete(f"/api/todos/{second}/")
+
+        stats = self.stats()
+        assert (stats["total"], stats["completed"]) == (1, 1)
+        assert stats["last_updated"]
+
+    def test_archiving_lowers_counters(self):
+        """Test that archived todos leave the counters."""
+        todo_id = self.create(completed=True)
+        self.create()
+        long_ago = timezone.now() - timedelta(days=60)
+        Todo.objects.filter(pk=todo_id).update(updated_at=long_ago)
+
+        archive_completed_todos(after_days=30)
+
+        stats = self.stats()
+        assert (stats["total"], stats["completed"]) == (1, 0)
+
+    def test_repair_command_fixes_drift(self):
+        """Test that writes outside the API are repaired."""
+        self.create()
+        Todo.objects.create(user=self.user, title="Shell", completed=True)
+        other = User.objects.create_user(email="other@example.com")
+        TodoStats.objects.create(user=other, total=3, completed=1)
+
+        out = io.StringIO()
+        call_command("repair_todo_stats", "--dry-run", stdout=out)
+        assert "2 counters would be repaired" in out.getvalue()
+        assert TodoStats.objects.get(user=self.user).total == 1
+
+        call_command("repair_todo_stats", stdout=io.StringIO())
+
+        stats = self.stats()
+        assert (stats["total"], stats["completed"]) == (2, 1)
+        assert TodoStats.objects.get(user=other).total == 0
+        out = io.StringIO()
+        call_command("repair_todo_stats", stdout=out)
+        assert "0 counters repaired" in out.getvalue()
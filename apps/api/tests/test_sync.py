@@ -0,0 +1,110 @@
+"""Tests for delta sync of the todo list."""
+
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.test import override_settings
+from django.utils import timezone
+
+from apps.api import sync
+from apps.api.archive import archive_completed_todos
+from apps.api.models import Todo
+from apps.api.models import TodoTombstone
+from apps.core import routers
+
+User = get_user_model()
+
+
+@override_settings(TODO_SYNC_OVERLAP=0)
+class TodoChangesTest(TestCase):
+    """Tests for the changes endpoint, tombstones and compaction."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="sync@example.com",
+            password="testpass123",  # noqa: S106
+        )
+        self.client.force_login(self.user)
+        self.kept = Todo.objects.create(user=self.user, title="Kept")
+        self.doomed = Todo.objects.create(user=self.user, title="Doomed")
+
+    def changes(self, since=""):
+        response = self.client.get("/api/todos/changes/", {"since": since})
+        assert response.status_code == 200  # noqa: PLR2004
+        return response.json()
+
+    def test_missing_cursor_asks_for_resync(self):
+        """Test that the first poll only hands out a cursor."""
+        result = self.changes()
+
+        assert result["reset"] is True
+        assert result["changed"] == []
+        assert sync.decode_cursor(result["cursor"]) is not None
+
+    def test_returns_only_changes_since_cursor(self):
+        """Test that updates, creations and deletions after the cursor show up."""
+        cursor = self.changes()["cursor"]
+
+        self.client.put(
+            f"/api/todos/{self.kept.pk}/",
+            {"completed": True},
+            content_type="application/json",
+        )
+        self.client.post(
+            "/api/todos/", {"title": "New"}, content_type="application/json"
+        )
+        self.client.delete(f"/api/todos/{self.doomed.pk}/")
+
+        result = self.changes(cursor)
+        assert result["reset"] is False
+        assert [todo["title"] for todo in result["changed"]] == ["Kept", "New"]
+        assert result["deleted"] == [self.doomed.pk]
+
+        assert self.changes(result["cursor"])["changed"] == []
+
+    @patch("apps.core.routers.replica_is_fresh", return_value=True)
+    @patch("apps.core.routers.has_replica", return_value=True)
+    def test_changes_are_read_from_primary(self, *mocks):
+        """Test that a lagging replica can't hide changes behind the cursor."""
+        since = sync.encode_cursor(timezone.now() - timedelta(minutes=1))
+
+        # No replica alias exists here, so a replica read would raise
+        with routers.replica_reads():
+            result = sync.changes(self.user.pk, since, ["id"])
+
+        assert len(result["changed"]) == 2  # noqa: PLR2004
+
+    def test_archived_todos_are_reported_deleted(self):
+        """Test that archiving leaves a tombstone."""
+        cursor = self.changes()["cursor"]
+        long_ago = timezone.now() - timedelta(days=60)
+        Todo.objects.filter(pk=self.doomed.pk).update(
+            completed=True, updated_at=long_ago
+        )
+
+        archive_completed_todos(after_days=30)
+
+        assert self.changes(cursor)["deleted"] == [self.doomed.pk]
+
+    def test_expired_cursor_asks_for_resync(self):
+        """Test that cursors older than retention can't be trusted."""
+        old = timezone.now() - timedelta(days=31)
+
+        result = self.changes(sync.encode_cursor(old))
+
+        assert result["reset"] is True
+        assert self.changes("garbage")["reset"] is True
+
+    def test_compaction_drops_old_tombstones(self):
+        """Test tombstone compaction against the retention window."""
+        now = timezone.now()
+        TodoTombstone.objects.create(id=1, user=self.user, deleted_at=now)
+        TodoTombstone.objects.create(
+            id=2, user=self.user, deleted_at=now - timedelta(days=31)
+        )
+
+        assert sync.compact_tombstones() == 1
+
+        assert list(TodoTombstone.objects.values_list("id", flat=True)) == [1]
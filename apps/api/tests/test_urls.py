@@ -0,0 +1,50 @@
+"""Tests for marking API operations non-atomic."""
+
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse
+from django.test import SimpleTestCase
+from django.urls import path
+from django.urls import resolve
+
+from apps.api.urls import mark_non_atomic
+
+
+def view(request):
+    return HttpResponse()
+
+
+class MarkNonAtomicTest(SimpleTestCase):
+    """Tests for ``mark_non_atomic``."""
+
+    def test_marks_the_operations_own_path(self):
+        """Test that the marked operation's view leaves ATOMIC_REQUESTS."""
+        marked = path("user/", lambda request: HttpResponse(), name="current_user")
+        other = path("todos/", view, name="list_todos")
+
+        mark_non_atomic([marked, other], {"current_user"})
+
+        assert getattr(marked.callback, "_non_atomic_requests", None) == {"default"}
+        assert not hasattr(other.callback, "_non_atomic_requests")
+
+    def test_rejects_a_path_shared_with_another_operation(self):
+        """Test that a write sharing the path can't silently lose its transaction."""
+        patterns = [
+            path("todos/", view, name="list_todos"),
+            path("todos/", view, name="create_todo"),
+        ]
+
+        with pytest.raises(ImproperlyConfigured, match="create_todo"):
+            mark_non_atomic(patterns, {"list_todos"})
+
+    def test_rejects_unknown_operations(self):
+        """Test that a renamed operation isn't silently made atomic again."""
+        with pytest.raises(ImproperlyConfigured, match="current_user"):
+            mark_non_atomic([path("todos/", view, name="list_todos")], {"current_user"})
+
+    def test_current_user_is_non_atomic(self):
+        """Test that the mounted API marks /api/user/."""
+        match = resolve("/api/user/")
+
+        assert match.url_name == "current_user"
+        assert getattr(match.func, "_non_atomic_requests", None) == {"default"}
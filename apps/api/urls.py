@@ -0,0 +1,42 @@
+"""
+The API's URL patterns, mounted lazily from ``config.urls``.
+
+``ATOMIC_REQUESTS`` wraps the Django view ninja registers for a path, which
+serves every method on it. The operations in ``NON_ATOMIC_OPERATIONS`` get
+``non_atomic_requests`` here, so they must not share a path with other
+operations, which would silently lose their transaction too.
+"""
+
+from collections import defaultdict
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+
+from .api import NON_ATOMIC_OPERATIONS
+from .api import api
+
+
+def mark_non_atomic(patterns, names) -> None:
+    """Mark the views of the operations named ``names`` non-atomic."""
+    by_route = defaultdict(list)
+    for pattern in patterns:
+        by_route[str(pattern.pattern)].append(pattern.name)
+    unknown = set(names).difference(*by_route.values())
+    if unknown:
+        msg = f"No API operations named {', '.join(sorted(unknown))}"
+        raise ImproperlyConfigured(msg)
+    for pattern in patterns:
+        if pattern.name not in names:
+            continue
+        shared = [name for name in by_route[str(pattern.pattern)] if name not in names]
+        if shared:
+            msg = (
+                f"Non-atomic API operation {pattern.name!r} shares its path with "
+                f"{', '.join(shared)}; give it a path of its own"
+            )
+            raise ImproperlyConfigured(msg)
+        transaction.non_atomic_requests(pattern.callback)
+
+
+urlpatterns, app_name, _namespace = api.urls
+mark_non_atomic(urlpatterns, NON_ATOMIC_OPERATIONS)
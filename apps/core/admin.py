@@ -0,0 +1,16 @@
+from typing import ClassVar
+
+from .paginator import EstimatedCountPaginator
+
+
+class LargeTableAdminMixin:
+    """
+    Changelist settings for tables with millions of rows.
+
+    Page counts come from planner estimates and the second "x total" count is
+    skipped. Pair it with ``list_select_related`` and indexes that match the
+    admin's ordering, filters and search fields.
+    """
+
+    paginator: ClassVar[type] = EstimatedCountPaginator
+    show_full_result_count = False
@@ -0,0 +1,146 @@
+"""
+Server-side product analytics, sent to PostHog in the background.
+
+``capture()`` only puts the event on a bounded, process-wide queue; a daemon
+thread sends batches of up to ``ANALYTICS_BATCH_SIZE`` events at least every
+``ANALYTICS_FLUSH_INTERVAL`` seconds. Requests never wait on PostHog. Once
+the queue passes ``ANALYTICS_BACKPRESSURE_THRESHOLD`` of its size,
+non-essential events are sampled at ``ANALYTICS_BACKPRESSURE_SAMPLE_RATE``.
+A full queue drops events and counts them in ``analytics_dropped_total``.
+
+The queue and thread belong to one process: a forked gunicorn or Celery
+child starts with an empty queue and starts its own flusher on first use.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from datetime import UTC
+from datetime import datetime
+
+from django.conf import settings
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_queue: queue.Queue = queue.Queue()
+_flusher: threading.Thread | None = None
+_wake = threading.Event()
+
+
+def enabled() -> bool:
+    return bool(settings.ANALYTICS_ENABLED and settings.POSTHOG_API_KEY)
+
+
+def capture(distinct_id, event: str, properties=None, *, essential=False) -> None:
+    """
+    Queue ``event`` for ``distinct_id`` without blocking.
+
+    ``essential`` events (money and access changes) are never sampled away
+    under backpressure, only dropped when the queue is full.
+    """
+    if not enabled():
+        return
+    _ensure_flusher()
+    fill = _queue.qsize() / settings.ANALYTICS_QUEUE_SIZE
+    if (
+        not essential
+        and fill >= settings.ANALYTICS_BACKPRESSURE_THRESHOLD
+        and random.random() >= settings.ANALYTICS_BACKPRESSURE_SAMPLE_RATE  # noqa: S311
+    ):
+        metrics.incr("analytics_dropped_total", reason="sampled")
+        return
+    message = {
+        "event": event,
+        "distinct_id": str(distinct_id),
+        "properties": {**(properties or {}), "$lib": "django-server"},
+        "timestamp": datetime.now(tz=UTC).isoformat(),
+        "uuid": str(uuid.uuid4()),
+    }
+    try:
+        _queue.put_nowait(message)
+    except queue.Full:
+        metrics.incr("analytics_dropped_total", reason="full")
+        return
+    if _queue.qsize() >= settings.ANALYTICS_BATCH_SIZE:
+        _wake.set()
+
+
+def _ensure_flusher() -> None:
+    global _flusher, _queue  # noqa: PLW0603
+    if _flusher is not None:
+        return
+    with _lock:
+        if _flusher is None:
+            _queue = queue.Queue(maxsize=settings.ANALYTICS_QUEUE_SIZE)
+            _flusher = threading.Thread(
+                target=_run, name="analytics-flusher", daemon=True
+            )
+            _flusher.start()
+
+
+def _run() -> None:
+    while True:
+        _wake.wait(settings.ANALYTICS_FLUSH_INTERVAL)
+        _wake.clear()
+        flush()
+
+
+def _drain(limit: int) -> list[dict]:
+    batch: list[dict] = []
+    while len(batch) < limit:
+        try:
+            batch.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+
+def flush() -> int:
+    """Send everything queued so far; returns the number of events sent."""
+    sent = 0
+    while batch := _drain(settings.ANALYTICS_BATCH_SIZE):
+        started = time.perf_counter()
+        try:
+            _send(batch)
+        except Exception as exc:  # noqa: BLE001
+            metrics.incr("analytics_dropped_total", len(batch), reason="error")
+            logger.warning("Dropping %s analytics events: %s", len(batch), exc)
+            continue
+        metrics.observe("analytics_flush_seconds", time.perf_counter() - started)
+        metrics.incr("analytics_sent_total", len(batch))
+        sent += len(batch)
+    return sent
+
+
+def _send(batch: list[dict]) -> None:
+    from posthog.request import batch_post  # noqa: PLC0415
+
+    batch_post(
+        settings.POSTHOG_API_KEY,
+        host=settings.POSTHOG_HOST,
+        gzip=True,
+        timeout=settings.ANALYTICS_SEND_TIMEOUT,
+        batch=batch,
+    )
+
+
+def _reset_after_fork() -> None:
+    global _flusher, _lock, _queue, _wake  # noqa: PLW0603
+    # The flusher thread does not exist in the child; the parent sends
+    # whatever it had queued.
+    _lock = threading.Lock()
+    _queue = queue.Queue()
+    _wake = threading.Event()
+    _flusher = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+atexit.register(flush)
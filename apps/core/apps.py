@@ -0,0 +1,20 @@
+from django.apps import AppConfig
+from django.core.signals import request_finished
+
+
+class CoreConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "apps.core"
+
+    def ready(self):
+        from . import metrics  # noqa: PLC0415
+        from .db import collect_pool_stats  # noqa: PLC0415
+
+        metrics.register_collector(collect_pool_stats)
+        request_finished.connect(self.flush_metrics, dispatch_uid="core_flush_metrics")
+
+    @staticmethod
+    def flush_metrics(**kwargs):
+        from . import metrics  # noqa: PLC0415
+
+        metrics.maybe_flush()
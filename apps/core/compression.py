@@ -0,0 +1,125 @@
+"""
+Brotli and gzip compression for ``CompressionMiddleware``.
+
+The encoding is negotiated from ``Accept-Encoding``, preferring Brotli at
+equal weight. Every compressed response records its compressed/original size
+ratio (``response_compression_ratio``) and the CPU time spent compressing it
+(``response_compression_seconds``), labelled by encoding.
+"""
+
+import time
+import zlib
+
+import brotli
+from django.conf import settings
+
+from . import metrics
+
+# In order of preference
+ENCODINGS = ("br", "gzip")
+RATIO_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1)
+SECONDS_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05)
+
+
+def negotiate(accept_encoding: str) -> str | None:
+    """The best of ``ENCODINGS`` that the client accepts, or None."""
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.partition(";")
+        weight = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.strip()] = weight
+    accepted = [
+        (weights.get(encoding, weights.get("*", 0.0)), -rank, encoding)
+        for rank, encoding in enumerate(ENCODINGS)
+    ]
+    weight, _, encoding = max(accepted)
+    return encoding if weight > 0 else None
+
+
+class Compressor:
+    """Incremental compression in one encoding, measured for metrics."""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(
+                mode=brotli.MODE_TEXT, quality=settings.COMPRESSION_BROTLI_QUALITY
+            )
+        else:
+            # 16 + MAX_WBITS writes the gzip header and trailer
+            self._zlib = zlib.compressobj(
+                settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+            )
+        self.size_in = 0
+        self.size_out = 0
+        self.cpu_seconds = 0.0
+
+    def compress(self, data: bytes, *, flush: bool = True) -> bytes:
+        """Compress a chunk; flushed by default, so a stream doesn't stall."""
+        started = time.thread_time()
+        if self.encoding == "br":
+            out = self._brotli.process(data)
+            if flush:
+                out += self._brotli.flush()
+        else:
+            out = self._zlib.compress(data)
+            if flush:
+                out += self._zlib.flush(zlib.Z_SYNC_FLUSH)
+        return self._count(data, out, started)
+
+    def finish(self) -> bytes:
+        """The end of the stream; records the metrics."""
+        started = time.thread_time()
+        out = self._brotli.finish() if self.encoding == "br" else self._zlib.flush()
+        out = self._count(b"", out, started)
+        if self.size_in:
+            metrics.observe(
+                "response_compression_ratio",
+                self.size_out / self.size_in,
+                buckets=RATIO_BUCKETS,
+                encoding=self.encoding,
+            )
+        metrics.observe(
+            "response_compression_seconds",
+            self.cpu_seconds,
+            buckets=SECONDS_BUCKETS,
+            encoding=self.encoding,
+        )
+        return out
+
+    def _count(self, data: bytes, out: bytes, started: float) -> bytes:
+        self.cpu_seconds += time.thread_time() - started
+        self.size_in += len(data)
+        self.size_out += len(out)
+        return out
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """Compress a whole body."""
+    compressor = Compressor(encoding)
+    return compressor.compress(data, flush=False) + compressor.finish()
+
+
+def compress_sequence(chunks, encoding: str):
+    """Compress an iterable of byte chunks as it is consumed."""
+    compressor = Compressor(encoding)
+    for chunk in chunks:
+        if out := compressor.compress(chunk):
+            yield out
+    yield compressor.finish()
+
+
+async def acompress_sequence(chunks, encoding: str):
+    """Compress an async iterable of byte chunks as it is consumed."""
+    compressor = Compressor(encoding)
+    async for chunk in chunks:
+        if out := compressor.compress(chunk):
+            yield out
+    yield compressor.finish()
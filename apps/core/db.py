@@ -0,0 +1,36 @@
+"""Connection pool instrumentation."""
+
+from django.db import connections
+
+from . import metrics
+
+# psycopg_pool counters, reset by pop_stats() -> (metric name, scale)
+_POOL_COUNTERS = {
+    "requests_num": ("db_pool_requests_total", 1),
+    "requests_queued": ("db_pool_requests_queued_total", 1),
+    "requests_wait_ms": ("db_pool_wait_seconds_total", 0.001),
+    "requests_errors": ("db_pool_timeouts_total", 1),
+    "connections_num": ("db_pool_connections_opened_total", 1),
+    "connections_lost": ("db_pool_connections_lost_total", 1),
+    "returns_bad": ("db_pool_returns_bad_total", 1),
+}
+
+
+def collect_pool_stats() -> None:
+    """Export psycopg pool usage for every database alias running a pool."""
+    for alias in connections:
+        connection = connections[alias]
+        if not connection.settings_dict["OPTIONS"].get("pool"):
+            continue
+        pool = connection.pool  # type: ignore[attr-defined]
+        if pool is None:
+            continue
+        stats = pool.pop_stats()
+        size = stats.get("pool_size", 0)
+        available = stats.get("pool_available", 0)
+        metrics.gauge("db_pool_size", size, alias=alias)
+        metrics.gauge("db_pool_in_use", size - available, alias=alias)
+        metrics.gauge("db_pool_waiting", stats.get("requests_waiting", 0), alias=alias)
+        for key, (name, scale) in _POOL_COUNTERS.items():
+            if stats.get(key):
+                metrics.incr(name, stats[key] * scale, alias=alias)
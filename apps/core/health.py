@@ -0,0 +1,72 @@
+"""Readiness checks for the database, Redis and the Celery broker."""
+
+import threading
+import time
+
+import redis
+from django.conf import settings
+from django.db import connections
+from kombu import Connection
+
+_lock = threading.Lock()
+_cached: tuple[float, dict[str, str]] | None = None
+
+
+def check_database() -> None:
+    for alias in connections:
+        with connections[alias].cursor() as cursor:
+            cursor.execute("SELECT 1")
+
+
+def check_redis() -> None:
+    client = redis.Redis.from_url(
+        settings.REDIS_URL, socket_timeout=1, socket_connect_timeout=1
+    )
+    try:
+        client.ping()
+    finally:
+        client.close()
+
+
+def check_broker() -> None:
+    with Connection(
+        settings.CELERY_BROKER_URL,
+        ssl=settings.CELERY_BROKER_USE_SSL or False,
+        connect_timeout=1,
+    ) as connection:
+        connection.ensure_connection(max_retries=1)
+
+
+CHECKS = {
+    "database": check_database,
+    "redis": check_redis,
+    "broker": check_broker,
+}
+
+
+def run_checks() -> dict[str, str]:
+    results = {}
+    for name, check in CHECKS.items():
+        try:
+            check()
+        except Exception as exc:  # noqa: BLE001
+            results[name] = f"error: {type(exc).__name__}"
+        else:
+            results[name] = "ok"
+    return results
+
+
+def readiness() -> dict[str, str]:
+    """Return check results, reusing them for ``HEALTHCHECK_CACHE_SECONDS``.
+
+    Orchestrators probe every few seconds from several nodes; caching in
+    process means most probes cost a dictionary lookup.
+    """
+    global _cached  # noqa: PLW0603
+    ttl = settings.HEALTHCHECK_CACHE_SECONDS
+    with _lock:
+        if _cached is not None and time.monotonic() - _cached[0] < ttl:
+            return _cached[1]
+        results = run_checks()
+        _cached = (time.monotonic(), results)
+        return results
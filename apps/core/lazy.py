@@ -0,0 +1,42 @@
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+def lazy_view(
+    dotted_path: str, *, csrf_exempt: bool = False, non_atomic_requests: bool = False
+):
+    """
+    Return a view that imports ``dotted_path`` the first time it is called.
+
+    Attributes the handler and middleware read before calling the view
+    (``csrf_exempt``, ``non_atomic_requests``) can't be discovered without the
+    import, so they are passed explicitly.
+    """
+    target = None
+
+    def view(request, *args, **kwargs):
+        nonlocal target
+        if target is None:
+            target = import_string(dotted_path)
+        return target(request, *args, **kwargs)
+
+    view.__name__ = dotted_path.rsplit(".", 1)[-1]
+    view.__qualname__ = view.__name__
+    view.__module__ = dotted_path.rsplit(".", 1)[0]
+    if csrf_exempt:
+        view.csrf_exempt = True  # type: ignore[attr-defined]
+    if non_atomic_requests:
+        view = transaction.non_atomic_requests(view)
+    return view
+
+
+def lazy_include(dotted_path: str, *, app_name: str, namespace: str):
+    """
+    Like ``include()``, but import the URLconf on first use, not at load.
+
+    The module is imported when a URL under the prefix is first resolved, or
+    when anything is first reversed. ``include()`` imports it to read
+    ``app_name``, so ``app_name`` and ``namespace`` must be passed explicitly
+    and match the module's.
+    """
+    return (dotted_path, app_name, namespace)
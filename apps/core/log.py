@@ -0,0 +1,212 @@
+"""
+Structured logging through a background thread.
+
+``QueueLogHandler`` only puts records on a bounded queue; a ``QueueListener``
+thread formats them and writes to stderr, so a slow log pipe never blocks a
+request or task. Records are tagged in the calling thread with the current
+request or task context (``request_id``, ``user_id``, ``route`` and
+``duration_ms`` since it started) by ``ContextFilter``, and ``JsonFormatter``
+writes them one JSON object per line. ``SamplingFilter`` keeps a fraction of
+a noisy logger's debug and info records; warnings and errors always pass.
+
+This module is imported by ``LOGGING`` before the app registry is ready, so
+it must not import models.
+"""
+
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import weakref
+from contextvars import ContextVar
+from contextvars import Token
+from datetime import UTC
+from datetime import datetime
+from logging.handlers import QueueHandler
+from logging.handlers import QueueListener
+
+# Attributes every LogRecord has; anything else came from ``extra``
+_RECORD_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_context: ContextVar[dict | None] = ContextVar("log_context", default=None)
+_handlers: "weakref.WeakSet[QueueLogHandler]" = weakref.WeakSet()
+
+
+def set_context(**fields) -> Token:
+    """
+    Start a log context, e.g. for a request or task; returns the reset token.
+
+    ``duration_ms`` of every record logged in the context is measured from
+    this call.
+    """
+    return _context.set({**fields, "started": time.perf_counter()})
+
+
+def update_context(**fields) -> None:
+    """Add fields known only later, such as the route, to the current context."""
+    context = _context.get()
+    if context is not None:
+        context.update(fields)
+
+
+def reset_context(token: Token) -> None:
+    _context.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Copy the current log context onto each record."""
+
+    def filter(self, record):
+        context = _context.get()
+        if context:
+            for field, value in context.items():
+                if field != "started" and not hasattr(record, field):
+                    setattr(record, field, value)
+            if not hasattr(record, "duration_ms"):
+                elapsed = time.perf_counter() - context["started"]
+                record.duration_ms = round(elapsed * 1000, 1)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep ``rates[prefix]`` of the records below WARNING from matching loggers.
+
+    The longest matching logger name prefix wins; loggers without one are
+    not sampled.
+    """
+
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = dict(rates or {})
+
+    def rate_for(self, name: str) -> float:
+        matches = [
+            prefix
+            for prefix in self.rates
+            if name == prefix or name.startswith(f"{prefix}.")
+        ]
+        return self.rates[max(matches, key=len)] if matches else 1.0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        return random.random() < self.rate_for(record.name)  # noqa: S311
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, including context and ``extra`` fields."""
+
+    def format(self, record):
+        payload = {
+            "time": datetime.fromtimestamp(record.created, tz=UTC).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+            "thread": record.thread,
+        }
+        # Context fields and ``extra``
+        payload.update(
+            (key, value)
+            for key, value in record.__dict__.items()
+            if key not in _RECORD_ATTRS and not key.startswith("_")
+        )
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exc_info"] = record.exc_text
+        if record.stack_info:
+            payload["stack_info"] = record.stack_info
+        return json.dumps(payload, default=str)
+
+
+class QueueLogHandler(QueueHandler):
+    """
+    Hand records to a listener thread that writes them to stderr.
+
+    The queue holds at most ``maxsize`` records; when it is full, records
+    are dropped and counted in ``log_records_dropped_total`` rather than
+    blocking the caller. The listener starts on the first record in each
+    process, so a forked gunicorn or Celery child gets its own.
+    """
+
+    def __init__(self, maxsize=10_000):
+        super().__init__(queue.Queue(maxsize))
+        self.maxsize = maxsize
+        self.target = logging.StreamHandler()
+        self.listener: QueueListener | None = None
+        self.start_lock = threading.Lock()
+        _handlers.add(self)
+
+    def setFormatter(self, fmt):  # noqa: N802
+        # The formatter configured for this handler runs on the listener thread
+        super().setFormatter(fmt)
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Render the message and traceback now, while args and exc_info
+        # still refer to live objects; the listener only serializes.
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if self.listener is None:
+            self.start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            from . import metrics  # noqa: PLC0415
+
+            metrics.incr("log_records_dropped_total")
+
+    def start(self) -> None:
+        with self.start_lock:
+            if self.listener is None:
+                self.listener = QueueListener(
+                    self.queue, self.target, respect_handler_level=True
+                )
+                self.listener.start()
+
+    def flush(self):
+        """Wait until every queued record is written and stop the listener."""
+        with self.start_lock:
+            listener, self.listener = self.listener, None
+        if listener is not None:
+            listener.stop()
+        self.target.flush()
+
+    def close(self):
+        self.flush()
+        super().close()
+
+    def reset_after_fork(self) -> None:
+        # The listener thread and the queue's lock state belong to the parent
+        self.queue = queue.Queue(self.maxsize)
+        self.listener = None
+        self.start_lock = threading.Lock()
+
+
+def flush() -> None:
+    """Write out every queued record; for shutdown hooks."""
+    for handler in list(_handlers):
+        handler.flush()
+
+
+def _reset_after_fork() -> None:
+    for handler in list(_handlers):
+        handler.reset_after_fork()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
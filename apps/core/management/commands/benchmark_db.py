@@ -0,0 +1,89 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.db import connection
+from django.db import connections
+
+# Counts backends of this database other than the sampling connection itself
+ACTIVE_CONNECTIONS_SQL = """
+SELECT count(*) FROM pg_stat_activity
+WHERE datname = current_database() AND pid <> pg_backend_pid()
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate concurrent request threads against the database and report "
+        "latency percentiles and the peak number of Postgres connections. Run "
+        "it with DATABASE_POOL on and off to compare the two modes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--threads", type=int, default=16, help="Concurrent request threads"
+        )
+        parser.add_argument(
+            "--requests", type=int, default=500, help="Total simulated requests"
+        )
+        parser.add_argument(
+            "--think-ms",
+            type=float,
+            default=5.0,
+            help="Time each request spends outside the database",
+        )
+
+    def handle(self, *args, **options):
+        self.think = options["think_ms"] / 1000
+        peak = 0
+        stop = threading.Event()
+
+        def sample():
+            nonlocal peak
+            with connection.cursor() as cursor:
+                while not stop.is_set():
+                    cursor.execute(ACTIVE_CONNECTIONS_SQL)
+                    peak = max(peak, cursor.fetchone()[0])
+                    stop.wait(0.05)
+            connection.close()
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["threads"]) as executor:
+            latencies = list(executor.map(self.request, range(options["requests"])))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        sampler.join()
+
+        quantiles = statistics.quantiles(latencies, n=100)
+        pool = connections.settings["default"].get("OPTIONS", {}).get("pool")
+        self.stdout.write(
+            f"mode: {'pool' if pool else 'per-thread connections'}  "
+            f"threads: {options['threads']}  requests: {len(latencies)}  "
+            f"throughput: {len(latencies) / elapsed:.1f}/s"
+        )
+        self.stdout.write(
+            f"latency p50: {quantiles[49] * 1000:.1f}ms  "
+            f"p95: {quantiles[94] * 1000:.1f}ms  "
+            f"p99: {quantiles[98] * 1000:.1f}ms"
+        )
+        self.stdout.write(f"peak connections: {peak}")
+
+    def request(self, _):
+        """One simulated request: a couple of queries, then release like Django."""
+        started = time.perf_counter()
+        try:
+            get_user_model().objects.filter(is_active=True).exists()
+            time.sleep(self.think)
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+        finally:
+            # request_finished: returns the connection to the pool, or keeps
+            # it open per thread until CONN_MAX_AGE expires
+            close_old_connections()
+        return time.perf_counter() - started
@@ -0,0 +1,104 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+# Runs in a fresh interpreter so nothing is imported yet
+PROBE = """
+import json, os, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+setup_done = time.perf_counter()
+from django.test import Client
+response = Client().get(sys.argv[1], secure=True, headers={"host": sys.argv[2]})
+finished = time.perf_counter()
+print(json.dumps({
+    "setup": setup_done - started,
+    "first_request": finished - setup_done,
+    "total": finished - started,
+    "status": response.status_code,
+}))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure cold start: `-X importtime` breakdown by top-level package and "
+        "time from interpreter start to the first served request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default="/api/csrf/", help="URL to request")
+        parser.add_argument(
+            "--top", type=int, default=20, help="Number of packages to list"
+        )
+        parser.add_argument(
+            "--json", action="store_true", help="Print a JSON report for CI"
+        )
+        parser.add_argument(
+            "--max-seconds",
+            type=float,
+            default=None,
+            help="Fail if time to first request exceeds this many seconds",
+        )
+
+    def handle(self, *args, **options):
+        host = next(
+            (h.lstrip(".") for h in settings.ALLOWED_HOSTS if h != "*"), "localhost"
+        )
+        result = subprocess.run(  # noqa: S603
+            [sys.executable, "-X", "importtime", "-c", PROBE, options["path"], host],
+            capture_output=True,
+            text=True,
+            env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+            check=False,
+        )
+        if result.returncode != 0:
+            msg = f"Startup probe failed:\n{result.stderr[-2000:]}"
+            raise CommandError(msg)
+
+        timings = json.loads(result.stdout.strip().splitlines()[-1])
+        packages = self.parse_importtime(result.stderr)
+        top = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+        top = top[: options["top"]]
+
+        if options["json"]:
+            report = {**timings, "imports_us": dict(top)}
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.stdout.write(f"{'package':<32} {'self ms':>10}")
+            for package, micros in top:
+                self.stdout.write(f"{package:<32} {micros / 1000:>10.1f}")
+            self.stdout.write(
+                f"\ndjango.setup(): {timings['setup']:.3f}s  "
+                f"first request ({timings['status']}): "
+                f"{timings['first_request']:.3f}s  "
+                f"total: {timings['total']:.3f}s"
+            )
+
+        limit = options["max_seconds"]
+        if limit is not None and timings["total"] > limit:
+            msg = f"Time to first request {timings['total']:.3f}s exceeds {limit}s"
+            raise CommandError(msg)
+
+    @staticmethod
+    def parse_importtime(stderr: str) -> dict[str, int]:
+        """Sum ``-X importtime`` self time (microseconds) per top-level package."""
+        totals: dict[str, int] = defaultdict(int)
+        for line in stderr.splitlines():
+            if not line.startswith("import time:"):
+                continue
+            try:
+                self_us, _, name = line[len("import time:") :].split("|")
+                micros = int(self_us)
+            except ValueError:
+                # The header line and anything else that isn't a timing row
+                continue
+            totals[name.strip().split(".")[0]] += micros
+        return dict(totals)
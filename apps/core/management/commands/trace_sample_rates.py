@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from apps.core import tracing
+
+
+class Command(BaseCommand):
+    help = (
+        "Show or override the Sentry trace sample rates per path or task name "
+        "prefix. Overrides are stored in the cache and picked up by every "
+        "process within SENTRY_TRACES_RATES_REFRESH seconds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "rates",
+            nargs="*",
+            metavar="PREFIX=RATE",
+            help='Rates to set, e.g. "/api/=0.05"; an empty prefix is the default',
+        )
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Drop all overrides and go back to SENTRY_TRACES_ROUTE_RATES",
+        )
+
+    def handle(self, *args, **options):
+        if options["clear"]:
+            tracing.set_route_rates(None)
+        elif options["rates"]:
+            overrides = dict(tracing.cache.get(tracing.RATES_CACHE_KEY) or {})
+            overrides.update(self.parse(value) for value in options["rates"])
+            tracing.set_route_rates(overrides)
+
+        for prefix, rate in sorted(tracing.route_rates().items()):
+            self.stdout.write(f"{prefix or '(default)':<40} {rate:g}")
+
+    @staticmethod
+    def parse(value: str) -> tuple[str, float]:
+        prefix, _, rate = value.rpartition("=")
+        try:
+            number = float(rate)
+        except ValueError:
+            number = -1.0
+        if not 0 <= number <= 1 or "=" not in value:
+            msg = f"Expected PREFIX=RATE with a rate between 0 and 1, got {value!r}"
+            raise CommandError(msg)
+        return prefix, number
@@ -0,0 +1,228 @@
+"""
+Process-local metric buffering with periodic export to Redis.
+
+Counters and histograms are aggregated in memory and pushed with a single
+pipelined ``HINCRBYFLOAT`` batch at most every ``METRICS_FLUSH_INTERVAL``
+seconds. The push runs on a daemon thread, so recording a metric never costs
+a network round-trip on the hot path; only ``flush()``, called at shutdown,
+pushes on the calling thread. Every gunicorn and Celery process adds into
+the same Redis hash, and ``render()`` turns that hash into the Prometheus
+text format served at ``/metrics/``. Gauges are per process: each one
+writes its own expiring hash, labelled ``process="<host>:<pid>"`` because
+every container has its own pid namespace.
+"""
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+COUNTERS_KEY = "metrics:counters"
+GAUGES_KEY = "metrics:gauges:{process}"
+GAUGES_TTL = 120
+PROFILES_KEY = "metrics:profiles:{name}"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_lock = threading.Lock()
+_buffer: dict[str, float] = defaultdict(float)
+_gauges: dict[str, float] = {}
+_collectors: list = []
+_last_flush = time.monotonic()
+_client = None
+_pusher: threading.Thread | None = None
+_wake = threading.Event()
+
+
+def _series(name: str, labels: dict[str, object]) -> str:
+    if not labels:
+        return name
+    rendered = ",".join(
+        '{}="{}"'.format(key, str(value).replace('"', ""))
+        for key, value in sorted(labels.items())
+    )
+    return f"{name}{{{rendered}}}"
+
+
+def incr(name: str, value: float = 1, **labels) -> None:
+    """Add ``value`` to a counter."""
+    with _lock:
+        _buffer[_series(name, labels)] += value
+    maybe_flush()
+
+
+def observe(name: str, value: float, buckets=DEFAULT_BUCKETS, **labels) -> None:
+    """Record ``value`` in a cumulative histogram (``_bucket``/``_sum``/``_count``)."""
+    index = bisect_left(buckets, value)
+    with _lock:
+        for bound in buckets[index:]:
+            _buffer[_series(f"{name}_bucket", {**labels, "le": bound})] += 1
+        _buffer[_series(f"{name}_bucket", {**labels, "le": "+Inf"})] += 1
+        _buffer[_series(f"{name}_sum", labels)] += value
+        _buffer[_series(f"{name}_count", labels)] += 1
+    maybe_flush()
+
+
+def gauge(name: str, value: float, **labels) -> None:
+    """Set a per-process gauge; exported with this process's label."""
+    with _lock:
+        _gauges[_series(name, labels)] = value
+
+
+def register_collector(collector) -> None:
+    """Call ``collector()`` before every flush to sample gauges and counters."""
+    _collectors.append(collector)
+
+
+def get_client():
+    global _client  # noqa: PLW0603
+    url = getattr(settings, "METRICS_REDIS_URL", "")
+    if not url:
+        return None
+    if _client is None:
+        _client = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+    return _client
+
+
+def maybe_flush() -> None:
+    """
+    Flush if ``METRICS_FLUSH_INTERVAL`` has passed since the last flush.
+
+    Collectors run on the calling thread, which owns its database connections;
+    the push to Redis is handed to the pusher thread.
+    """
+    global _last_flush  # noqa: PLW0603
+    interval = getattr(settings, "METRICS_FLUSH_INTERVAL", 5)
+    if time.monotonic() - _last_flush < interval:
+        return
+    _last_flush = time.monotonic()
+    _collect()
+    if get_client() is None:
+        # Nothing to wait on; just drop the buffer
+        _push()
+        return
+    _ensure_pusher()
+    _wake.set()
+
+
+def flush() -> None:
+    """Run collectors, push buffered values to Redis and reset the buffer."""
+    global _last_flush  # noqa: PLW0603
+    _last_flush = time.monotonic()
+    _collect()
+    _push()
+
+
+def _collect() -> None:
+    for collector in _collectors:
+        try:
+            collector()
+        except Exception:
+            logger.exception("Metrics collector %r failed", collector)
+
+
+def _push() -> None:
+    with _lock:
+        pending = dict(_buffer)
+        _buffer.clear()
+        gauges = dict(_gauges)
+    client = get_client()
+    if not (pending or gauges) or client is None:
+        return
+    gauges_key = GAUGES_KEY.format(process=f"{socket.gethostname()}:{os.getpid()}")
+    try:
+        with client.pipeline(transaction=False) as pipe:
+            for series, value in pending.items():
+                pipe.hincrbyfloat(COUNTERS_KEY, series, value)
+            if gauges:
+                pipe.hset(gauges_key, mapping=gauges)
+                pipe.expire(gauges_key, GAUGES_TTL)
+            pipe.execute()
+    except redis.RedisError as exc:
+        logger.debug("Dropping %s metric series, export failed: %s", len(pending), exc)
+
+
+def _ensure_pusher() -> None:
+    global _pusher  # noqa: PLW0603
+    if _pusher is not None:
+        return
+    with _lock:
+        if _pusher is None:
+            _pusher = threading.Thread(target=_run, name="metrics-pusher", daemon=True)
+            _pusher.start()
+
+
+def _run() -> None:
+    while True:
+        _wake.wait()
+        _wake.clear()
+        _push()
+
+
+def snapshot() -> dict[str, float]:
+    """Return the values buffered in this process that have not been flushed."""
+    with _lock:
+        return dict(_buffer)
+
+
+def render() -> str:
+    """Render every exported series in the Prometheus text format."""
+    client = get_client()
+    if client is None:
+        return ""
+    values = {
+        series.decode(): float(value)
+        for series, value in client.hgetall(COUNTERS_KEY).items()
+    }
+    prefix = GAUGES_KEY.format(process="")
+    for key in client.scan_iter(match=f"{prefix}*"):
+        process = key.decode().removeprefix(prefix)
+        for series, value in client.hgetall(key).items():
+            values[_with_process(series.decode(), process)] = float(value)
+    lines = [f"{series} {value}" for series, value in sorted(values.items())]
+    return "\n".join(lines) + "\n"
+
+
+def _with_process(series: str, process: str) -> str:
+    if series.endswith("}"):
+        return f'{series[:-1]},process="{process}"}}'
+    return f'{series}{{process="{process}"}}'
+
+
+def store_profile(name: str, profile: dict, keep: int = 20) -> None:
+    """Keep the ``keep`` most recent profiling summaries for ``name``."""
+    client = get_client()
+    if client is None:
+        return
+    key = PROFILES_KEY.format(name=name)
+    try:
+        with client.pipeline(transaction=False) as pipe:
+            pipe.lpush(key, json.dumps(profile))
+            pipe.ltrim(key, 0, keep - 1)
+            pipe.execute()
+    except redis.RedisError as exc:
+        logger.debug("Unable to store profile for %s: %s", name, exc)
+
+
+def _reset_after_fork() -> None:
+    global _client, _lock, _pusher, _wake  # noqa: PLW0603
+    # The parent's values are flushed by the parent, and its socket, lock and
+    # pusher thread must not be shared with the child.
+    _lock = threading.Lock()
+    _pusher = None
+    _wake = threading.Event()
+    _buffer.clear()
+    _gauges.clear()
+    _client = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
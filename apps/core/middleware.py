@@ -0,0 +1,206 @@
+import logging
+import time
+import uuid
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.http import JsonResponse
+from django.utils.cache import patch_vary_headers
+
+from . import compression
+from . import log
+from .health import readiness
+from .routers import has_replica
+from .routers import pin_subject
+from .routers import replica_reads
+
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+REQUEST_ID_HEADER = "X-Request-ID"
+
+access_logger = logging.getLogger("apps.core.access")
+
+
+class HealthCheckMiddleware:
+    """
+    Answer liveness and readiness probes before the rest of the stack runs.
+
+    Must be first in ``MIDDLEWARE``: probes skip host validation, SSL
+    redirects, sessions, auth and the ``ATOMIC_REQUESTS`` transaction.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.liveness_paths = set(settings.HEALTHCHECK_LIVENESS_PATHS)
+        self.readiness_paths = set(settings.HEALTHCHECK_READINESS_PATHS)
+
+    def __call__(self, request):
+        if request.path in self.liveness_paths:
+            return HttpResponse("OK", content_type="text/plain")
+        if request.path in self.readiness_paths:
+            checks = readiness()
+            ready = all(result == "ok" for result in checks.values())
+            return JsonResponse(
+                {"status": "ok" if ready else "unavailable", "checks": checks},
+                status=200 if ready else 503,
+            )
+        return self.get_response(request)
+
+
+class RequestLogMiddleware:
+    """
+    Tag log records with the request context and log one access line each.
+
+    The request id is taken from the proxy's ``X-Request-ID`` header when
+    there is one and echoed back in the response. The route is added once the
+    URL is resolved; the user id once authentication has loaded the user.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_id = request.headers.get(REQUEST_ID_HEADER, "")[:64] or (
+            uuid.uuid4().hex
+        )
+        token = log.set_context(request_id=request_id)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+            response.headers.setdefault(REQUEST_ID_HEADER, request_id)
+            access_logger.info(
+                "%s %s %s",
+                request.method,
+                request.path,
+                response.status_code,
+                extra={
+                    "method": request.method,
+                    "status": response.status_code,
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+                    **self.user_fields(request),
+                },
+            )
+        finally:
+            log.reset_context(token)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        log.update_context(route=request.resolver_match.route)
+
+    @staticmethod
+    def user_fields(request):
+        # Only a user that authentication already loaded; evaluating
+        # request.user here would cost a session lookup on requests that
+        # never needed one. Token-authenticated requests set user_id in the
+        # log context themselves.
+        user = request.__dict__.get("_cached_user")
+        if user is not None and user.is_authenticated:
+            return {"user_id": user.pk}
+        return {}
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Let safe requests read from the replica, with read-your-writes stickiness.
+
+    A request that writes (any unsafe method, or a GET whose queries wrote)
+    sets a short-lived cookie that keeps the client's reads on the primary for
+    ``REPLICA_PIN_SECONDS``, so it never reads older data than it just wrote.
+    Token clients, which send no cookies, are pinned by the subject their
+    authentication passed to ``track_subject``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.cookie_name = settings.REPLICA_PIN_COOKIE_NAME
+        self.pin_seconds = settings.REPLICA_PIN_SECONDS
+
+    def __call__(self, request):
+        if not has_replica():
+            return self.get_response(request)
+        if request.method not in SAFE_METHODS:
+            response = self.get_response(request)
+            self.pin(request, response)
+            return response
+        if self.cookie_name in request.COOKIES:
+            return self.get_response(request)
+        with replica_reads() as state:
+            response = self.get_response(request)
+        if state.wrote:
+            self.pin(request, response)
+        return response
+
+    def pin(self, request, response):
+        subject = getattr(request, "replica_pin_subject", None)
+        if subject is not None:
+            pin_subject(subject)
+        response.set_cookie(
+            self.cookie_name,
+            "1",
+            max_age=self.pin_seconds,
+            secure=settings.SESSION_COOKIE_SECURE,
+            httponly=True,
+            samesite="Lax",
+        )
+
+
+class CompressionMiddleware:
+    """
+    Compress JSON responses with Brotli or gzip, as ``Accept-Encoding`` allows.
+
+    Bodies under ``COMPRESSION_MIN_SIZE`` bytes go out as they are; streaming
+    responses are compressed chunk by chunk. Against BREACH, nothing that may
+    carry a secret next to user-controlled data is compressed: responses of
+    ``COMPRESSION_EXCLUDE_PATHS`` (CSRF and allauth tokens), and responses
+    setting the CSRF cookie, which Django does whenever a view read the token.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.content_types = set(settings.COMPRESSION_CONTENT_TYPES)
+        self.exclude_paths = tuple(settings.COMPRESSION_EXCLUDE_PATHS)
+        self.min_size = settings.COMPRESSION_MIN_SIZE
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self.compressible(request, response):
+            return response
+        if not response.streaming and len(response.content) < self.min_size:
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = compression.negotiate(request.headers.get("Accept-Encoding", ""))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = compression.acompress_sequence(
+                    response.streaming_content, encoding
+                )
+            else:
+                response.streaming_content = compression.compress_sequence(
+                    response.streaming_content, encoding
+                )
+            del response.headers["Content-Length"]
+        else:
+            compressed = compression.compress(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers["Content-Length"] = str(len(compressed))
+
+        # The compressed body is no longer byte-for-byte the one tagged
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    def compressible(self, request, response) -> bool:
+        content_type = response.get("Content-Type", "").partition(";")[0].strip()
+        return (
+            content_type in self.content_types
+            and not response.has_header("Content-Encoding")
+            and not request.path.startswith(self.exclude_paths)
+            and settings.CSRF_COOKIE_NAME not in response.cookies
+        )
@@ -0,0 +1,180 @@
+"""
+Primary/replica database routing.
+
+Reads go to the ``replica`` alias only while ``ReplicaRoutingMiddleware``
+has marked the current request as eligible: a safe-method request from a
+client that has not written recently, to a view that has not opted out with
+``use_primary_database``. Everything else (writes, Celery tasks, management
+commands, reads after a write in the same request) stays on ``default``.
+
+Browsers are pinned to the primary after a write by a cookie. Token clients
+send no cookies, so they are pinned by the token's subject in the cache,
+once the token has been authenticated (``track_subject``).
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.db import connections
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = "default"
+REPLICA = "replica"
+
+# Seconds since the last replayed transaction, or 0 when fully caught up
+REPLICA_LAG_SQL = """
+SELECT CASE
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(
+        EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0
+    )
+END
+"""
+
+PIN_CACHE_KEY = "db:primary-pin:{subject}"
+
+
+class RoutingState:
+    """Per-request routing flags, shared by every query of the request."""
+
+    def __init__(self, *, primary_only: bool = False):
+        self.wrote = False
+        # The client wrote within REPLICA_PIN_SECONDS
+        self.pinned = False
+        # Inside ``use_primary_database``
+        self.primary_only = primary_only
+
+    @property
+    def reads_from_primary(self) -> bool:
+        return self.primary_only or self.wrote or self.pinned
+
+
+_state: ContextVar[RoutingState | None] = ContextVar("db_routing", default=None)
+
+_lag_lock = threading.Lock()
+_lag_checked_at = float("-inf")
+_replica_healthy = False
+
+
+def has_replica() -> bool:
+    return REPLICA in connections.settings
+
+
+@contextmanager
+def replica_reads():
+    """Allow reads inside the block to use the replica."""
+    state = RoutingState()
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+
+
+@contextmanager
+def use_primary_database():
+    """
+    Keep every query inside the block on the primary.
+
+    Writes inside the block still count as writes of the enclosing request,
+    so ``ReplicaRoutingMiddleware`` pins the client afterwards. Also works as
+    a view decorator: ``@use_primary_database()``.
+    """
+    outer = _state.get()
+    state = RoutingState(primary_only=True)
+    token = _state.set(state)
+    try:
+        yield
+    finally:
+        _state.reset(token)
+        if outer is not None and state.wrote:
+            outer.wrote = True
+
+
+def track_subject(request, subject) -> None:
+    """
+    Give a client without cookies read-your-writes stickiness by ``subject``.
+
+    Called once the request is authenticated: if the subject wrote within
+    ``REPLICA_PIN_SECONDS``, the rest of the request reads from the primary.
+    ``ReplicaRoutingMiddleware`` pins the subject when the request writes.
+    """
+    request.replica_pin_subject = subject
+    state = _state.get()
+    if state is None or state.primary_only:
+        return
+    if cache.get(PIN_CACHE_KEY.format(subject=subject)):
+        state.pinned = True
+
+
+def pin_subject(subject) -> None:
+    """Keep the reads of ``subject`` on the primary for a while."""
+    cache.set(
+        PIN_CACHE_KEY.format(subject=subject),
+        1,
+        timeout=settings.REPLICA_PIN_SECONDS,
+    )
+
+
+def replica_is_fresh() -> bool:
+    """
+    Whether replica lag is within ``REPLICA_MAX_LAG_SECONDS``.
+
+    Checked at most every ``REPLICA_LAG_CHECK_INTERVAL`` seconds per process;
+    an unreachable replica counts as stale.
+    """
+    global _lag_checked_at, _replica_healthy  # noqa: PLW0603
+    now = time.monotonic()
+    if now - _lag_checked_at < settings.REPLICA_LAG_CHECK_INTERVAL:
+        return _replica_healthy
+    with _lag_lock:
+        if now - _lag_checked_at < settings.REPLICA_LAG_CHECK_INTERVAL:
+            return _replica_healthy
+        try:
+            with connections[REPLICA].cursor() as cursor:
+                cursor.execute(REPLICA_LAG_SQL)
+                lag = float(cursor.fetchone()[0])
+        except DatabaseError as exc:
+            logger.warning("Replica lag check failed, reading from primary: %s", exc)
+            _replica_healthy = False
+        else:
+            metrics.gauge("db_replica_lag_seconds", lag)
+            _replica_healthy = lag <= settings.REPLICA_MAX_LAG_SECONDS
+        _lag_checked_at = now
+    return _replica_healthy
+
+
+class PrimaryReplicaRouter:
+    """Send eligible reads to the replica and everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state.reads_from_primary or not has_replica():
+            return PRIMARY
+        if not replica_is_fresh():
+            metrics.incr("db_replica_fallback_total")
+            return PRIMARY
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            # Later reads in this request must see the write
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
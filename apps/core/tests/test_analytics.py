@@ -0,0 +1,74 @@
+"""Tests for the buffered server-side analytics queue."""
+
+import queue
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+from django.test import override_settings
+
+from apps.core import analytics
+from apps.core import metrics
+
+
+@override_settings(
+    ANALYTICS_ENABLED=True,
+    POSTHOG_API_KEY="phc_test",
+    ANALYTICS_QUEUE_SIZE=10,
+    ANALYTICS_BATCH_SIZE=4,
+    ANALYTICS_BACKPRESSURE_THRESHOLD=0.5,
+    ANALYTICS_BACKPRESSURE_SAMPLE_RATE=0,
+)
+class AnalyticsQueueTest(SimpleTestCase):
+    """Tests for queueing, batching and shedding analytics events."""
+
+    def setUp(self):
+        metrics.flush()
+        flusher = patch("apps.core.analytics._ensure_flusher")
+        flusher.start()
+        self.addCleanup(flusher.stop)
+        pending = patch.object(analytics, "_queue", queue.Queue[dict](maxsize=10))
+        pending.start()
+        self.addCleanup(pending.stop)
+
+    @override_settings(ANALYTICS_ENABLED=False)
+    def test_disabled_capture_is_a_no_op(self):
+        """Test that nothing is queued when analytics is off."""
+        analytics.capture(1, "signed_up")
+
+        assert analytics._queue.empty()  # noqa: SLF001
+
+    def test_flush_sends_in_batches(self):
+        """Test that flush drains the queue in batches of the batch size."""
+        for number in range(5):
+            analytics.capture(number, "viewed")
+
+        with patch("apps.core.analytics._send") as mock_send:
+            assert analytics.flush() == 5  # noqa: PLR2004
+
+        sizes = [len(call.args[0]) for call in mock_send.call_args_list]
+        assert sizes == [4, 1]
+        event = mock_send.call_args_list[0].args[0][0]
+        assert event["event"] == "viewed"
+        assert event["distinct_id"] == "0"
+
+    def test_backpressure_samples_then_drops(self):
+        """Test that only essential events pass backpressure, until full."""
+        for number in range(5):
+            analytics.capture(number, "viewed")
+        analytics.capture(5, "viewed")
+        for number in range(6):
+            analytics.capture(number, "paid", essential=True)
+
+        assert analytics._queue.qsize() == 10  # noqa: PLR2004, SLF001
+        values = metrics.snapshot()
+        assert values['analytics_dropped_total{reason="sampled"}'] == 1
+        assert values['analytics_dropped_total{reason="full"}'] == 1
+
+    def test_failed_send_is_counted(self):
+        """Test that a failed send drops the batch and counts it."""
+        analytics.capture(1, "viewed")
+
+        with patch("apps.core.analytics._send", side_effect=OSError("down")):
+            assert analytics.flush() == 0
+
+        assert metrics.snapshot()['analytics_dropped_total{reason="error"}'] == 1
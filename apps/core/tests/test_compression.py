@@ -0,0 +1,164 @@
+"""Tests for Brotli and gzip response compression."""
+
+import gzip
+import json
+from unittest.mock import patch
+
+import brotli
+from django.http import HttpResponse
+from django.http import JsonResponse
+from django.http import StreamingHttpResponse
+from django.middleware.csrf import get_token
+from django.test import RequestFactory
+from django.test import SimpleTestCase
+from django.test import TestCase
+from django.test import override_settings
+
+from apps.api.models import Todo
+from apps.core import compression
+from apps.core.middleware import CompressionMiddleware
+from apps.users.models import User
+
+PAYLOAD = {"todos": [{"id": i, "title": f"Todo {i}"} for i in range(200)]}
+
+
+@override_settings(COMPRESSION_MIN_SIZE=1024)
+class CompressionMiddlewareTest(SimpleTestCase):
+    """Tests for ``CompressionMiddleware``."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def respond(self, response, path="/api/todos/", accept="br, gzip"):
+        request = self.factory.get(path, headers={"accept-encoding": accept})
+        if callable(response):
+            return CompressionMiddleware(response)(request)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_prefers_brotli(self):
+        """Test that Brotli wins over gzip at equal weight."""
+        response = self.respond(JsonResponse(PAYLOAD))
+
+        assert response["Content-Encoding"] == "br"
+        assert response["Vary"] == "Accept-Encoding"
+        assert response["Content-Length"] == str(len(response.content))
+        assert json.loads(brotli.decompress(response.content)) == PAYLOAD
+
+    def test_falls_back_to_gzip(self):
+        """Test that a client without Brotli gets gzip."""
+        response = self.respond(JsonResponse(PAYLOAD), accept="gzip, br;q=0")
+
+        assert response["Content-Encoding"] == "gzip"
+        assert json.loads(gzip.decompress(response.content)) == PAYLOAD
+
+    def test_identity_without_accept_encoding(self):
+        """Test that clients that accept nothing get the body as is."""
+        response = self.respond(JsonResponse(PAYLOAD), accept="")
+
+        assert not response.has_header("Content-Encoding")
+        assert response["Vary"] == "Accept-Encoding"
+
+    def test_skips_small_bodies(self):
+        """Test that bodies under the threshold go out uncompressed."""
+        response = self.respond(JsonResponse({"status": "ok"}))
+
+        assert not response.has_header("Content-Encoding")
+
+    def test_skips_other_content_types(self):
+        """Test that only JSON is compressed."""
+        response = self.respond(HttpResponse("x" * 4096, content_type="text/html"))
+
+        assert not response.has_header("Content-Encoding")
+
+    def test_skips_excluded_paths(self):
+        """Test that token endpoints are never compressed."""
+        response = self.respond(JsonResponse(PAYLOAD), path="/api/csrf/")
+
+        assert not response.has_header("Content-Encoding")
+
+    def test_skips_responses_that_read_the_csrf_token(self):
+        """Test that a view that read the CSRF token isn't compressed."""
+
+        def view(request):
+            response = JsonResponse({**PAYLOAD, "csrfToken": get_token(request)})
+            response.set_cookie("csrftoken", "secret")
+            return response
+
+        response = self.respond(view)
+
+        assert not response.has_header("Content-Encoding")
+
+    def test_weakens_etag(self):
+        """Test that a strong ETag becomes weak once the body is re-encoded."""
+        response = JsonResponse(PAYLOAD)
+        response["ETag"] = '"abc"'
+
+        assert self.respond(response)["ETag"] == 'W/"abc"'
+
+    def test_compresses_streaming_responses(self):
+        """Test that a stream is compressed chunk by chunk."""
+        chunks = [
+            json.dumps(PAYLOAD).encode()[i : i + 500] for i in range(0, 4000, 500)
+        ]
+        response = self.respond(
+            StreamingHttpResponse(iter(chunks), content_type="application/json"),
+            accept="gzip",
+        )
+
+        assert response["Content-Encoding"] == "gzip"
+        assert not response.has_header("Content-Length")
+        assert gzip.decompress(b"".join(response.streaming_content)) == b"".join(chunks)
+
+    @patch("apps.core.compression.metrics")
+    def test_reports_ratio_and_cpu_time(self, metrics):
+        """Test that each compressed response records its ratio and CPU time."""
+        self.respond(JsonResponse(PAYLOAD))
+
+        observed = {call.args[0]: call for call in metrics.observe.call_args_list}
+        assert observed["response_compression_ratio"].args[1] < 1
+        assert observed["response_compression_ratio"].kwargs["encoding"] == "br"
+        assert "response_compression_seconds" in observed
+
+
+class NegotiateTest(SimpleTestCase):
+    """Tests for ``negotiate``."""
+
+    def test_negotiation(self):
+        """Test that weights, wildcards and refusals are honoured."""
+        assert compression.negotiate("gzip, deflate, br") == "br"
+        assert compression.negotiate("gzip;q=1.0, br;q=0.5") == "gzip"
+        assert compression.negotiate("*") == "br"
+        assert compression.negotiate("*;q=0, gzip") == "gzip"
+        assert compression.negotiate("identity") is None
+        assert compression.negotiate("br;q=0, gzip;q=0") is None
+        assert compression.negotiate("br;q=oops") is None
+
+
+@override_settings(COMPRESSION_MIN_SIZE=0)
+class CompressionStackTest(TestCase):
+    """Tests for compression in the full middleware stack."""
+
+    def test_csrf_endpoint_is_never_compressed(self):
+        """Test that the CSRF token JSON goes out as is, even if not excluded."""
+        for exclude_paths in (["/api/csrf/"], []):
+            with override_settings(COMPRESSION_EXCLUDE_PATHS=exclude_paths):
+                response = self.client.get(
+                    "/api/csrf/", headers={"accept-encoding": "br"}
+                )
+
+            assert not response.has_header("Content-Encoding")
+            assert "csrfToken" in response.json()
+
+    def test_api_json_is_compressed(self):
+        """Test that a regular API response is compressed."""
+        user = User.objects.create_user(
+            email="compress@example.com",
+            password="testpass123",  # noqa: S106
+        )
+        Todo.objects.bulk_create(Todo(user=user, title=f"Todo {i}") for i in range(50))
+        self.client.force_login(user)
+
+        response = self.client.get("/api/todos/", headers={"accept-encoding": "br"})
+
+        assert response["Content-Encoding"] == "br"
+        assert len(json.loads(brotli.decompress(response.content))) == 50  # noqa: PLR2004
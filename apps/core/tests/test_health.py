@@ -0,0 +1,41 @@
+"""Tests for the liveness and readiness probes."""
+
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.test import override_settings
+
+from apps.core import health
+
+
+class HealthCheckMiddlewareTest(TestCase):
+    def setUp(self):
+        health._cached = None  # noqa: SLF001
+
+    def test_liveness_skips_database_and_host_validation(self):
+        with self.assertNumQueries(0):
+            response = self.client.get("/healthz", HTTP_HOST="10.0.0.7")
+        assert response.status_code == 200  # noqa: PLR2004
+        assert self.client.get("/api/health/").status_code == 200  # noqa: PLR2004
+
+    def test_readiness_reports_failed_checks(self):
+        failing = MagicMock(side_effect=ConnectionError)
+        checks = {"database": health.check_database, "redis": failing}
+        with patch.dict(health.CHECKS, checks, clear=True):
+            response = self.client.get("/readyz")
+
+        assert response.status_code == 503  # noqa: PLR2004
+        assert response.json()["checks"] == {
+            "database": "ok",
+            "redis": "error: ConnectionError",
+        }
+
+    @override_settings(HEALTHCHECK_CACHE_SECONDS=60)
+    def test_readiness_results_are_cached(self):
+        check = MagicMock()
+        with patch.dict(health.CHECKS, {"redis": check}, clear=True):
+            assert self.client.get("/readyz").status_code == 200  # noqa: PLR2004
+            assert self.client.get("/readyz").status_code == 200  # noqa: PLR2004
+
+        check.assert_called_once()
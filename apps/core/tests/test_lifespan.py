@@ -0,0 +1,66 @@
+"""Tests for ASGI lifespan startup warm-up and websocket draining."""
+
+import asyncio
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from config import lifespan
+from config import websocket
+
+
+async def _run_lifespan(*messages):
+    inbox: asyncio.Queue[dict] = asyncio.Queue()
+    for message in messages:
+        inbox.put_nowait({"type": message})
+    sent = []
+
+    async def send(message):
+        sent.append(message["type"])
+
+    await lifespan.lifespan_application({"type": "lifespan"}, inbox.get, send)
+    return sent
+
+
+class LifespanTest(SimpleTestCase):
+    def tearDown(self):
+        websocket._draining = False  # noqa: SLF001
+
+    def test_startup_runs_warmup_steps(self):
+        step = MagicMock()
+        with patch.object(lifespan, "STARTUP_STEPS", [("step", step)]):
+            sent = asyncio.run(_run_lifespan("lifespan.startup", "lifespan.shutdown"))
+
+        step.assert_called_once()
+        assert sent == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
+
+    def test_failed_warmup_fails_startup(self):
+        step = MagicMock(side_effect=RuntimeError("database unavailable"))
+        with patch.object(lifespan, "STARTUP_STEPS", [("step", step)]):
+            sent = asyncio.run(_run_lifespan("lifespan.startup"))
+
+        assert sent == ["lifespan.startup.failed"]
+
+    def test_shutdown_closes_open_websockets(self):
+        async def scenario():
+            events: asyncio.Queue[dict] = asyncio.Queue()
+            events.put_nowait({"type": "websocket.connect"})
+            sent = []
+
+            async def send(message):
+                sent.append(message)
+                if message["type"] == "websocket.close":
+                    events.put_nowait({"type": "websocket.disconnect"})
+
+            connection = asyncio.create_task(
+                websocket.websocket_application({}, events.get, send)
+            )
+            await asyncio.sleep(0)
+            await lifespan.shutdown()
+            await connection
+            return sent
+
+        sent = asyncio.run(scenario())
+        assert sent[-1] == {"type": "websocket.close", "code": 1001}
+        assert not websocket.active_connections
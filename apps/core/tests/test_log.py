@@ -0,0 +1,131 @@
+"""Tests for queued JSON logging and the request log context."""
+
+import io
+import json
+import logging
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase
+from django.test import TestCase
+
+from apps.core import log
+
+User = get_user_model()
+
+
+def make_handler(formatter=None, maxsize=100):
+    handler = log.QueueLogHandler(maxsize=maxsize)
+    handler.target.setStream(io.StringIO())
+    handler.setFormatter(formatter or log.JsonFormatter())
+    handler.addFilter(log.ContextFilter())
+    return handler
+
+
+def emit(handler, logger_name="apps.test", level=logging.INFO, msg="hi", **kwargs):
+    logger = logging.getLogger(logger_name)
+    record = logger.makeRecord(
+        logger_name, level, __file__, 1, msg, kwargs.pop("args", ()), None, **kwargs
+    )
+    handler.handle(record)
+
+
+def written(handler):
+    handler.flush()
+    return [json.loads(line) for line in handler.target.stream.getvalue().splitlines()]
+
+
+class QueueLogHandlerTest(SimpleTestCase):
+    """Tests for the queue handler, JSON output and filters."""
+
+    def test_records_are_written_as_json_with_context(self):
+        """Test that context fields and extras end up in the JSON line."""
+        handler = make_handler()
+        token = log.set_context(request_id="abc", route="api/todos/")
+        try:
+            emit(handler, msg="%s items", args=(3,), extra={"status": 200})
+        finally:
+            log.reset_context(token)
+
+        (line,) = written(handler)
+        assert line["message"] == "3 items"
+        assert line["request_id"] == "abc"
+        assert line["route"] == "api/todos/"
+        assert line["status"] == 200  # noqa: PLR2004
+        assert "duration_ms" in line
+
+    def test_exceptions_are_rendered_before_queueing(self):
+        """Test that the traceback survives the trip through the queue."""
+        handler = make_handler()
+        try:
+            msg = "boom"
+            raise ValueError(msg)  # noqa: TRY301
+        except ValueError:
+            logging.getLogger("apps.test").addHandler(handler)
+            try:
+                logging.getLogger("apps.test").exception("failed")
+            finally:
+                logging.getLogger("apps.test").removeHandler(handler)
+
+        (line,) = written(handler)
+        assert "ValueError: boom" in line["exc_info"]
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        """Test that records are dropped once the queue is full."""
+        handler = make_handler(maxsize=1)
+        with patch.object(handler, "start"):
+            emit(handler)
+            with patch("apps.core.metrics.incr") as incr:
+                emit(handler)
+
+        incr.assert_called_once_with("log_records_dropped_total")
+
+    def test_sampling_only_applies_below_warning(self):
+        """Test per-logger sampling of info records."""
+        sampler = log.SamplingFilter({"celery": 0.0, "celery.beat": 1.0})
+        record = logging.makeLogRecord({"name": "celery.worker", "levelno": 20})
+        assert not sampler.filter(record)
+        record = logging.makeLogRecord({"name": "celery.beat", "levelno": 20})
+        assert sampler.filter(record)
+        record = logging.makeLogRecord({"name": "celery.worker", "levelno": 30})
+        assert sampler.filter(record)
+        record = logging.makeLogRecord({"name": "celeryx", "levelno": 20})
+        assert sampler.filter(record)
+
+    def test_fork_reset_replaces_queue(self):
+        """Test that a forked child starts with a fresh queue and listener."""
+        handler = make_handler()
+        emit(handler)
+        handler.reset_after_fork()
+
+        assert handler.listener is None
+        assert handler.queue.empty()
+
+
+class RequestLogMiddlewareTest(TestCase):
+    """Tests for the request log context."""
+
+    def test_request_id_is_echoed_and_logged(self):
+        """Test the access line carries request id, user and route."""
+        user = User.objects.create_user(
+            email="log@example.com",
+            password="testpass123",  # noqa: S106
+        )
+        self.client.force_login(user)
+        access_logger = logging.getLogger("apps.core.access")
+        context_filter = log.ContextFilter()
+        access_logger.addFilter(context_filter)
+        self.addCleanup(access_logger.removeFilter, context_filter)
+
+        with self.assertLogs("apps.core.access", "INFO") as logs:
+            response = self.client.get(
+                "/api/user/", headers={"X-Request-ID": "req-123"}
+            )
+
+        assert response["X-Request-ID"] == "req-123"
+        (record,) = logs.records
+        fields = vars(record)
+        assert fields["status"] == 200  # noqa: PLR2004
+        assert fields["request_id"] == "req-123"
+        assert fields["user_id"] == user.pk
+        assert fields["route"] == "api/user/"
@@ -0,0 +1,127 @@
+"""Tests for metric buffering, the scrape endpoint and Celery task telemetry."""
+
+import threading
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from django.db import connections
+from django.test import TestCase
+from django.test import override_settings
+
+from apps.core import metrics
+from apps.core.db import collect_pool_stats
+from apps.payments.tasks import summarize_membership_reconcile
+
+
+class MetricsBufferTest(TestCase):
+    def setUp(self):
+        metrics.flush()
+
+    def test_histogram_buckets_are_cumulative(self):
+        metrics.observe("job_seconds", 0.3, buckets=(0.1, 0.5, 1), job="a")
+
+        values = metrics.snapshot()
+        assert 'job_seconds_bucket{job="a",le="0.1"}' not in values
+        assert values['job_seconds_bucket{job="a",le="0.5"}'] == 1
+        assert values['job_seconds_bucket{job="a",le="+Inf"}'] == 1
+        assert values['job_seconds_sum{job="a"}'] == 0.3  # noqa: PLR2004
+
+    def test_periodic_flush_pushes_off_the_calling_thread(self):
+        pushed = threading.Event()
+        pushed_on = []
+
+        def push():
+            pushed_on.append(threading.current_thread())
+            pushed.set()
+
+        with (
+            patch.object(metrics, "get_client", return_value=MagicMock()),
+            patch.object(metrics, "_push", side_effect=push),
+            override_settings(METRICS_FLUSH_INTERVAL=0),
+        ):
+            metrics.incr("pushed_total")
+            assert pushed.wait(timeout=5)
+
+        assert pushed_on[0] is not threading.current_thread()
+
+    def test_gauges_are_labelled_by_host_and_pid(self):
+        client = MagicMock()
+        client.hgetall.side_effect = lambda key: (
+            {}
+            if key == metrics.COUNTERS_KEY
+            else {b'db_pool_in_use{alias="default"}': b"3"}
+        )
+        client.scan_iter.return_value = [
+            b"metrics:gauges:web-1:7",
+            b"metrics:gauges:worker-1:7",
+        ]
+
+        with patch.object(metrics, "get_client", return_value=client):
+            lines = metrics.render().splitlines()
+
+        assert lines == [
+            'db_pool_in_use{alias="default",process="web-1:7"} 3.0',
+            'db_pool_in_use{alias="default",process="worker-1:7"} 3.0',
+        ]
+
+    @override_settings(METRICS_TOKEN="secret")  # noqa: S106
+    def test_endpoint_requires_token(self):
+        assert self.client.get("/metrics/").status_code == 404  # noqa: PLR2004
+        response = self.client.get("/metrics/", HTTP_AUTHORIZATION="Bearer secret")
+        assert response.status_code == 200  # noqa: PLR2004
+
+
+class CeleryTelemetryTest(TestCase):
+    def setUp(self):
+        metrics.flush()
+
+    def test_task_runtime_is_recorded(self):
+        summarize_membership_reconcile.apply(args=([1, 2],))
+
+        values = metrics.snapshot()
+        series = (
+            'celery_task_runtime_seconds_count{queue="unknown",state="SUCCESS",'
+            'task="apps.payments.tasks.bulk.summarize_membership_reconcile"}'
+        )
+        assert values[series] == 1
+
+    @override_settings(TASK_PROFILE_SAMPLE_RATE=1.0)
+    def test_sampled_tasks_are_profiled(self):
+        with patch("apps.core.metrics.store_profile") as mock_store:
+            summarize_membership_reconcile.apply(args=([1],))
+
+        name, profile = mock_store.call_args[0]
+        assert name == "apps.payments.tasks.bulk.summarize_membership_reconcile"
+        assert profile["functions"]
+
+
+class FakePool:
+    def pop_stats(self):
+        return {
+            "pool_size": 4,
+            "pool_available": 1,
+            "requests_waiting": 2,
+            "requests_wait_ms": 1500,
+            "requests_errors": 1,
+        }
+
+
+class PoolStatsTest(TestCase):
+    def setUp(self):
+        metrics.flush()
+
+    def test_pool_stats_are_exported(self):
+        connection = connections["default"]
+        options = {**connection.settings_dict["OPTIONS"], "pool": True}
+        with (
+            patch.dict(connection.settings_dict, {"OPTIONS": options}),
+            patch.object(type(connections["default"]), "pool", FakePool()),
+            patch("apps.core.metrics.gauge") as mock_gauge,
+        ):
+            collect_pool_stats()
+
+        mock_gauge.assert_any_call("db_pool_in_use", 3, alias="default")
+        mock_gauge.assert_any_call("db_pool_waiting", 2, alias="default")
+        values = metrics.snapshot()
+        assert values['db_pool_wait_seconds_total{alias="default"}'] == 1.5  # noqa: PLR2004
+        assert values['db_pool_timeouts_total{alias="default"}'] == 1
@@ -0,0 +1,122 @@
+"""Tests for primary/replica routing and read-your-writes stickiness."""
+
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test import SimpleTestCase
+from django.test import override_settings
+
+from apps.core import routers
+from apps.core.middleware import ReplicaRoutingMiddleware
+from apps.users.models import User
+
+router = routers.PrimaryReplicaRouter()
+
+
+@patch("apps.core.routers.replica_is_fresh", return_value=True)
+@patch("apps.core.routers.has_replica", return_value=True)
+class PrimaryReplicaRouterTest(SimpleTestCase):
+    def test_reads_default_to_primary(self, *mocks):
+        assert router.db_for_read(User) == "default"
+
+    def test_eligible_reads_use_replica_until_a_write(self, *mocks):
+        with routers.replica_reads():
+            assert router.db_for_read(User) == "replica"
+            assert router.db_for_write(User) == "default"
+            assert router.db_for_read(User) == "default"
+
+    def test_use_primary_database_opts_out(self, *mocks):
+        with routers.replica_reads(), routers.use_primary_database():
+            assert router.db_for_read(User) == "default"
+
+    def test_stale_replica_falls_back_to_primary(self, has_replica, replica_is_fresh):
+        replica_is_fresh.return_value = False
+        with routers.replica_reads():
+            assert router.db_for_read(User) == "default"
+
+
+@override_settings(REPLICA_LAG_CHECK_INTERVAL=0, REPLICA_MAX_LAG_SECONDS=5)
+class ReplicaLagTest(SimpleTestCase):
+    def check_with(self, cursor):
+        connections = {"replica": MagicMock()}
+        connections["replica"].cursor.return_value.__enter__.return_value = cursor
+        with patch("apps.core.routers.connections", connections):
+            return routers.replica_is_fresh()
+
+    def test_lag_within_limit(self):
+        assert self.check_with(MagicMock(fetchone=lambda: (1.5,)))
+
+    def test_lag_over_limit(self):
+        assert not self.check_with(MagicMock(fetchone=lambda: (30,)))
+
+    def test_unreachable_replica_is_stale(self):
+        assert not self.check_with(
+            MagicMock(execute=MagicMock(side_effect=DatabaseError))
+        )
+
+
+@patch("apps.core.routers.replica_is_fresh", return_value=True)
+@patch("apps.core.middleware.has_replica", return_value=True)
+@patch("apps.core.routers.has_replica", return_value=True)
+class ReplicaRoutingMiddlewareTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.read_from = None
+
+    def view(self, request, *, write=False):
+        self.read_from = router.db_for_read(User)
+        if write:
+            router.db_for_write(User)
+        return HttpResponse()
+
+    def test_get_reads_from_replica(self, *mocks):
+        response = ReplicaRoutingMiddleware(self.view)(self.factory.get("/"))
+
+        assert self.read_from == "replica"
+        assert "db_primary" not in response.cookies
+
+    def test_post_pins_client_to_primary(self, *mocks):
+        response = ReplicaRoutingMiddleware(self.view)(self.factory.post("/"))
+
+        assert self.read_from == "default"
+        assert response.cookies["db_primary"]["max-age"] == 10  # noqa: PLR2004
+
+    def test_write_during_get_pins_client(self, *mocks):
+        middleware = ReplicaRoutingMiddleware(lambda r: self.view(r, write=True))
+        response = middleware(self.factory.get("/"))
+
+        assert "db_primary" in response.cookies
+
+    def test_write_under_use_primary_database_pins_client(self, *mocks):
+        @routers.use_primary_database()
+        def view(request):
+            return self.view(request, write=True)
+
+        response = ReplicaRoutingMiddleware(view)(self.factory.get("/"))
+
+        assert self.read_from == "default"
+        assert "db_primary" in response.cookies
+
+    def test_pinned_client_reads_from_primary(self, *mocks):
+        request = self.factory.get("/")
+        request.COOKIES["db_primary"] = "1"
+        ReplicaRoutingMiddleware(self.view)(request)
+
+        assert self.read_from == "default"
+
+    def test_token_client_is_pinned_by_subject(self, *mocks):
+        def token_view(request, subject):
+            routers.track_subject(request, subject)
+            return self.view(request)
+
+        ReplicaRoutingMiddleware(lambda r: token_view(r, 1))(self.factory.post("/"))
+
+        ReplicaRoutingMiddleware(lambda r: token_view(r, 1))(self.factory.get("/"))
+        assert self.read_from == "default"
+        ReplicaRoutingMiddleware(lambda r: token_view(r, 2))(self.factory.get("/"))
+        assert self.read_from == "replica"
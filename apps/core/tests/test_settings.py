@@ -0,0 +1,27 @@
+"""Tests for settings that only take effect in a configured process."""
+
+import os
+import subprocess
+import sys
+
+from django.test import SimpleTestCase
+
+
+class DatabasePoolTest(SimpleTestCase):
+    def test_pool_checks_connections_before_handing_them_out(self):
+        probe = (
+            "import django; django.setup(); "
+            "from django.db import connections; "
+            "from psycopg_pool import ConnectionPool; "
+            "pool = connections['default'].pool; "
+            "assert getattr(pool, '_check') == ConnectionPool.check_connection"
+        )
+        result = subprocess.run(  # noqa: S603
+            [sys.executable, "-c", probe],
+            capture_output=True,
+            text=True,
+            check=False,
+            env={**os.environ, "DATABASE_POOL": "true"},
+        )
+
+        assert result.returncode == 0, result.stderr
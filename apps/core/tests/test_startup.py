@@ -0,0 +1,50 @@
+"""Tests for lazy view loading and the startup profiler."""
+
+import subprocess
+import sys
+
+from django.test import SimpleTestCase
+
+from apps.core.lazy import lazy_view
+from apps.core.management.commands.profile_startup import Command
+
+
+class LazyViewTest(SimpleTestCase):
+    def test_keeps_csrf_exemption_without_importing(self):
+        view = lazy_view("apps.payments.views.stripe_webhook", csrf_exempt=True)
+
+        assert view.csrf_exempt is True
+        assert view.__name__ == "stripe_webhook"
+
+
+class LazyIncludeTest(SimpleTestCase):
+    def test_api_is_mounted_lazily_under_its_namespace(self):
+        probe = (
+            "import sys, django; django.setup(); "
+            "from django.urls import resolve; import config.urls; "
+            "assert 'apps.api.api' not in sys.modules; "
+            "assert resolve('/api/csrf/').url_name == 'csrf_token'; "
+            "assert 'ninja' not in sys.modules; "
+            "from apps.api.api import api; "
+            "assert resolve('/api/todos/').namespace == api.urls_namespace"
+        )
+        result = subprocess.run(  # noqa: S603
+            [sys.executable, "-c", probe],
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+
+        assert result.returncode == 0, result.stderr
+
+
+class ProfileStartupTest(SimpleTestCase):
+    def test_importtime_is_summed_per_package(self):
+        stderr = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |   stripe._error\n"
+            "import time:       300 |        420 | stripe\n"
+            "import time:        50 |         50 | json\n"
+        )
+
+        assert Command.parse_importtime(stderr) == {"stripe": 420, "json": 50}
@@ -0,0 +1,97 @@
+"""Tests for route-based Sentry trace sampling."""
+
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase
+from django.test import override_settings
+
+from apps.core import tracing
+
+
+def transaction(path="/api/todos/", seconds=0.1, status="ok", spans=()):
+    return {
+        "type": "transaction",
+        "transaction": path,
+        "request": {"url": f"https://example.com{path}"},
+        "start_timestamp": 1_000.0,
+        "timestamp": 1_000.0 + seconds,
+        "contexts": {"trace": {"status": status}},
+        "spans": list(spans),
+    }
+
+
+@override_settings(
+    SENTRY_TRACES_ROUTE_RATES={"": 0.0, "/api/": 0.5, "/api/todos/": 1.0},
+    SENTRY_TRACES_RECORD_RATE=1.0,
+    SENTRY_TRACES_SLOW_SECONDS=1.0,
+    SENTRY_TRACES_IGNORED_PREFIXES=["/healthz", "/static/"],
+)
+class TracesSamplerTest(SimpleTestCase):
+    """Tests for the head sampler and the send decision."""
+
+    def setUp(self):
+        cache.delete(tracing.RATES_CACHE_KEY)
+        tracing.reset()
+        self.addCleanup(tracing.reset)
+
+    def test_health_and_static_are_not_recorded(self):
+        """Test that ignored paths are dropped before recording."""
+        for path in ("/healthz", "/static/css/app.css"):
+            context = {"wsgi_environ": {"PATH_INFO": path}}
+            assert tracing.traces_sampler(context) == 0.0
+        context = {"asgi_scope": {"path": "/api/user/"}}
+        assert tracing.traces_sampler(context) == 1.0
+
+    def test_longest_prefix_wins(self):
+        """Test that the most specific route rate applies."""
+        assert tracing.rate_for("/api/todos/1/") == 1.0
+        assert tracing.rate_for("/api/user/") == 0.5  # noqa: PLR2004
+        assert tracing.rate_for("/accounts/login/") == 0.0
+
+    def test_slow_failing_and_stripe_transactions_are_kept(self):
+        """Test that tail rules keep transactions a 0 rate would drop."""
+        stripe_span = {
+            "op": "http.client",
+            "description": "POST https://api.stripe.com/v1/checkout/sessions",
+        }
+        path = "/payments/checkout/price_1/"
+        assert tracing.keep_reason(transaction(path, seconds=2.5)) == "slow"
+        assert tracing.keep_reason(transaction(path, status="internal_error")) == (
+            "error"
+        )
+        assert tracing.keep_reason(transaction(path, spans=[stripe_span])) == "stripe"
+        assert tracing.keep_reason(transaction(path, status="not_found")) is None
+
+    def test_before_send_drops_unsampled(self):
+        """Test that dropped transactions return None."""
+        assert tracing.before_send_transaction(transaction("/accounts/"), {}) is None
+        event = transaction("/api/todos/")
+        assert tracing.before_send_transaction(event, {}) is event
+
+    def test_cache_overrides_settings_after_refresh(self):
+        """Test that runtime overrides replace the configured rates."""
+        tracing.set_route_rates({"/api/todos/": 0.0})
+
+        with patch("apps.core.tracing.random.random", return_value=0.01):
+            assert tracing.keep_reason(transaction("/api/todos/")) is None
+            assert tracing.keep_reason(transaction("/api/user/")) == "sampled"
+
+    def test_command_sets_and_clears_overrides(self):
+        """Test trace_sample_rates parsing, merging and --clear."""
+        out = StringIO()
+        call_command("trace_sample_rates", "/api/=0.1", "=0.01", stdout=out)
+
+        assert cache.get(tracing.RATES_CACHE_KEY) == {"/api/": 0.1, "": 0.01}
+        assert "(default)" in out.getvalue()
+
+        call_command("trace_sample_rates", "--clear", stdout=StringIO())
+        assert cache.get(tracing.RATES_CACHE_KEY) is None
+        assert tracing.rate_for("/api/user/") == 0.5  # noqa: PLR2004
+
+        with pytest.raises(CommandError):
+            call_command("trace_sample_rates", "/api/=2", stdout=StringIO())
@@ -0,0 +1,174 @@
+"""
+Sentry trace sampling.
+
+A head sampler only sees a request before it runs, so it can't keep the slow
+or failing ones. Instead ``traces_sampler`` records every transaction except
+health checks and static files (``SENTRY_TRACES_RECORD_RATE``, normally 1.0),
+and ``before_send_transaction`` decides what is actually sent once the
+transaction has finished:
+
+- slower than ``SENTRY_TRACES_SLOW_SECONDS``, failed, or calling Stripe: kept
+- anything else: kept at the rate of the longest matching prefix in the
+  route rates, matched against the request path or the Celery task name
+
+Only sent transactions count against the Sentry quota. The route rates are
+``SENTRY_TRACES_ROUTE_RATES`` overlaid with whatever ``trace_sample_rates``
+stored in the cache, re-read every ``SENTRY_TRACES_RATES_REFRESH`` seconds.
+
+Nothing here imports sentry_sdk at runtime; it only reads the plain dicts
+the SDK passes in.
+"""
+
+import logging
+import random
+import threading
+import time
+from datetime import datetime
+from typing import TYPE_CHECKING
+from typing import Any
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import metrics
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+
+    from sentry_sdk.types import Event
+    from sentry_sdk.types import Hint
+
+logger = logging.getLogger(__name__)
+
+RATES_CACHE_KEY = "sentry:traces:rates"
+
+# Transaction statuses that count as failures; 4xx ones (not_found,
+# permission_denied, ...) are the client's problem
+ERROR_STATUSES = frozenset(
+    {
+        "internal_error",
+        "unknown",
+        "unknown_error",
+        "unavailable",
+        "unimplemented",
+        "data_loss",
+        "deadline_exceeded",
+    }
+)
+STRIPE_HOST = "api.stripe.com"
+
+_lock = threading.Lock()
+_rates: dict[str, float] = {}
+_rates_loaded_at = float("-inf")
+
+
+def route_rates() -> dict[str, float]:
+    """Effective ``{prefix: rate}``; the ``""`` prefix is the default rate."""
+    global _rates, _rates_loaded_at  # noqa: PLW0603
+    now = time.monotonic()
+    if now - _rates_loaded_at < settings.SENTRY_TRACES_RATES_REFRESH:
+        return _rates
+    with _lock:
+        if now - _rates_loaded_at < settings.SENTRY_TRACES_RATES_REFRESH:
+            return _rates
+        overrides: dict[str, float] = {}
+        try:
+            overrides = cache.get(RATES_CACHE_KEY) or {}
+        except Exception as exc:  # noqa: BLE001
+            # Keep sampling with the configured rates
+            logger.warning("Unable to load trace sample rates: %s", exc)
+        _rates = {**settings.SENTRY_TRACES_ROUTE_RATES, **overrides}
+        _rates_loaded_at = now
+    return _rates
+
+
+def set_route_rates(rates: dict[str, float] | None) -> None:
+    """Store runtime overrides for every process; None clears them."""
+    if rates:
+        cache.set(RATES_CACHE_KEY, rates, timeout=None)
+    else:
+        cache.delete(RATES_CACHE_KEY)
+    reset()
+
+
+def reset() -> None:
+    """Forget the loaded rates so the next transaction re-reads them."""
+    global _rates_loaded_at  # noqa: PLW0603
+    _rates_loaded_at = float("-inf")
+
+
+def rate_for(route: str) -> float:
+    rates = route_rates()
+    prefix = max((p for p in rates if route.startswith(p)), key=len, default=None)
+    return 0.0 if prefix is None else float(rates[prefix])
+
+
+def is_ignored(path: str) -> bool:
+    return path.startswith(tuple(settings.SENTRY_TRACES_IGNORED_PREFIXES))
+
+
+def _head_route(sampling_context: dict) -> str:
+    if environ := sampling_context.get("wsgi_environ"):
+        return environ.get("PATH_INFO") or ""
+    if scope := sampling_context.get("asgi_scope"):
+        return scope.get("path") or ""
+    if job := sampling_context.get("celery_job"):
+        return job.get("task") or ""
+    return sampling_context.get("transaction_context", {}).get("name") or ""
+
+
+def traces_sampler(sampling_context: dict) -> float:
+    """Decide whether to record a transaction; see the module docstring."""
+    if is_ignored(_head_route(sampling_context)):
+        return 0.0
+    return settings.SENTRY_TRACES_RECORD_RATE
+
+
+def _seconds(value) -> float:
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).timestamp()
+    return float(value or 0)
+
+
+def _tail_route(event: "Mapping[str, Any]") -> str:
+    url = (event.get("request") or {}).get("url")
+    if url:
+        return urlsplit(url).path
+    return event.get("transaction") or ""
+
+
+def _calls_stripe(event: "Mapping[str, Any]") -> bool:
+    for span in event.get("spans") or ():
+        if not (span.get("op") or "").startswith("http.client"):
+            continue
+        url = (span.get("data") or {}).get("url") or span.get("description") or ""
+        if STRIPE_HOST in url:
+            return True
+    return False
+
+
+def keep_reason(event: "Mapping[str, Any]") -> str | None:
+    """Why a finished transaction should be sent, or None to drop it."""
+    duration = _seconds(event.get("timestamp")) - _seconds(event.get("start_timestamp"))
+    if duration >= settings.SENTRY_TRACES_SLOW_SECONDS:
+        return "slow"
+    trace = (event.get("contexts") or {}).get("trace") or {}
+    if trace.get("status") in ERROR_STATUSES:
+        return "error"
+    if _calls_stripe(event):
+        return "stripe"
+    route = _tail_route(event)
+    if is_ignored(route):
+        return None
+    if random.random() < rate_for(route):  # noqa: S311
+        return "sampled"
+    return None
+
+
+def before_send_transaction(event: "Event", hint: "Hint") -> "Event | None":
+    reason = keep_reason(event)
+    metrics.incr("sentry_transactions_total", decision=reason or "dropped")
+    return event if reason else None
@@ -0,0 +1,29 @@
+import hmac
+
+from django.conf import settings
+from django.http import Http404
+from django.http import HttpResponse
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_GET
+
+from . import metrics as metrics_registry
+
+
+def _is_authorized(request) -> bool:
+    token = settings.METRICS_TOKEN
+    header = request.headers.get("Authorization", "")
+    if token and hmac.compare_digest(header, f"Bearer {token}"):
+        return True
+    return request.user.is_authenticated and request.user.is_staff
+
+
+@never_cache
+@require_GET
+def metrics(request):
+    """Prometheus scrape endpoint for the metrics exported by every process."""
+    if not _is_authorized(request):
+        raise Http404
+    metrics_registry.flush()
+    return HttpResponse(
+        metrics_registry.render(), content_type="text/plain; version=0.0.4"
+    )
@@ -0,0 +1,155 @@
+"""Durable log of raw Stripe webhook events."""
+
+import logging
+from collections.abc import Mapping
+from contextlib import nullcontext
+from datetime import UTC
+from datetime import date
+from datetime import datetime
+from typing import Any
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError
+from django.db import connection
+from django.db import transaction
+
+from .membership import user_for_customer
+from .models import StripeEvent
+
+User = get_user_model()
+
+logger = logging.getLogger(__name__)
+
+# User fields a replay can change, compared before and after in diffs
+REPLAYED_FIELDS = ("stripe_customer_id", "has_membership", "membership_paused")
+
+PARTITION_SQL = """
+CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "payments_stripeevent"
+FOR VALUES FROM ('{start:%Y-%m-%d} 00:00+00') TO ('{end:%Y-%m-%d} 00:00+00')
+"""
+
+
+def event_customer_id(event: Mapping[str, Any]) -> str:
+    """The Stripe customer an event is about, or "" if it has none."""
+    data_object = (event.get("data") or {}).get("object") or {}
+    if data_object.get("object") == "customer":
+        return data_object.get("id") or ""
+    customer = data_object.get("customer") or ""
+    if isinstance(customer, Mapping):
+        # Expanded customer object
+        return customer.get("id") or ""
+    return customer
+
+
+def record_event(event: dict[str, Any]) -> None:
+    """
+    Append ``event``, the decoded webhook body, to the log.
+
+    A redelivered event is ignored.
+    """
+    if not event.get("id"):
+        logger.warning("Not logging Stripe event without an id")
+        return
+    created = event.get("created")
+    StripeEvent.objects.bulk_create(
+        [
+            StripeEvent(
+                event_id=event["id"],
+                created=(
+                    datetime.fromtimestamp(created, tz=UTC)
+                    if created
+                    else datetime.now(tz=UTC)
+                ),
+                event_type=event.get("type") or "",
+                customer_id=event_customer_id(event),
+                livemode=bool(event.get("livemode")),
+                payload=event,
+            )
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def _add_month(month: date, count: int = 1) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def create_event_partitions(months_ahead: int = 3) -> list[str]:
+    """
+    Create monthly partitions from this month to ``months_ahead`` months out.
+
+    Runs daily from beat so events never reach the default partition, which
+    would block creating the partition for their month later on.
+    """
+    month = datetime.now(tz=UTC).date().replace(day=1)
+    created = []
+    for offset in range(months_ahead + 1):
+        start = _add_month(month, offset)
+        name = f"payments_stripeevent_y{start:%Y}m{start:%m}"
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    PARTITION_SQL.format(name=name, start=start, end=_add_month(start))
+                )
+        except DatabaseError:
+            logger.exception("Unable to create Stripe event partition %s", name)
+            continue
+        created.append(name)
+    return created
+
+
+def _affected_user_ids(events: list[StripeEvent]) -> set[int]:
+    """Users the events are known to touch, resolved without asking Stripe."""
+    user_ids = set()
+    for event in events:
+        if event.customer_id:
+            user = user_for_customer(event.customer_id)
+            if user:
+                user_ids.add(user.pk)
+        data_object = (event.payload.get("data") or {}).get("object") or {}
+        user_id = (data_object.get("metadata") or {}).get(
+            settings.STRIPE_SUBSCRIBER_METADATA_KEY
+        )
+        if user_id and str(user_id).isdigit():
+            user_ids.add(int(user_id))
+    return user_ids
+
+
+def _user_states(user_ids: set[int]) -> dict[int, tuple]:
+    rows = User.objects.filter(pk__in=user_ids).values_list("pk", *REPLAYED_FIELDS)
+    return {row[0]: tuple(row[1:]) for row in rows}
+
+
+def replay_events(events: list[StripeEvent], *, dry_run: bool = False):
+    """
+    Re-run the webhook handlers over ``events`` in order.
+
+    Returns ``{user_id: (before, after)}`` for users whose ``REPLAYED_FIELDS``
+    changed, or None when a dry run can't tell which users the events touch
+    without asking Stripe. A dry run applies the events in a transaction that
+    is rolled back, and never calls Stripe: events whose customer or charge
+    can't be resolved locally are skipped.
+    """
+    from .views import _dispatch_webhook  # noqa: PLC0415
+    from .views import local_lookups_only  # noqa: PLC0415
+
+    user_ids = _affected_user_ids(events)
+    if dry_run and not user_ids:
+        return None
+    before = _user_states(user_ids)
+    with (
+        transaction.atomic() if dry_run else nullcontext(),
+        local_lookups_only() if dry_run else nullcontext(),
+    ):
+        for event in events:
+            _dispatch_webhook(event.payload)
+        after = _user_states(user_ids)
+        if dry_run:
+            transaction.set_rollback(True)
+    return {
+        user_id: (before.get(user_id), state)
+        for user_id, state in after.items()
+        if before.get(user_id) != state
+    }
@@ -0,0 +1,139 @@
+import time
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from datetime import UTC
+from datetime import datetime
+from itertools import groupby
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import close_old_connections
+from django.utils.dateparse import parse_date
+from django.utils.dateparse import parse_datetime
+
+from apps.payments.events import REPLAYED_FIELDS
+from apps.payments.events import replay_events
+from apps.payments.models import StripeEvent
+
+
+def parse_when(value: str) -> datetime:
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            msg = f"Invalid date or datetime: {value}"
+            raise CommandError(msg)
+        parsed = datetime(day.year, day.month, day.day)  # noqa: DTZ001
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=UTC)
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-run the webhook handlers over logged Stripe events. Events of one "
+        "customer are replayed oldest first; customers run in parallel."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", type=parse_when, help="Events created from")
+        parser.add_argument("--until", type=parse_when, help="Events created before")
+        parser.add_argument(
+            "--type", action="append", dest="types", help="Event type (repeatable)"
+        )
+        parser.add_argument(
+            "--customer",
+            action="append",
+            dest="customers",
+            help="Stripe customer id (repeatable)",
+        )
+        parser.add_argument(
+            "--workers", type=int, default=4, help="Customers replayed at once"
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=500, help="Events read per query"
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Roll every change back and print the membership diff",
+        )
+
+    def handle(self, *args, **options):
+        events = StripeEvent.objects.order_by("customer_id", "created")
+        if options["since"]:
+            events = events.filter(created__gte=options["since"])
+        if options["until"]:
+            events = events.filter(created__lt=options["until"])
+        if options["types"]:
+            events = events.filter(event_type__in=options["types"])
+        if options["customers"]:
+            events = events.filter(customer_id__in=options["customers"])
+
+        self.dry_run = options["dry_run"]
+        self.replayed = self.failed = self.skipped = self.changed = 0
+        started = time.perf_counter()
+        max_pending = options["workers"] * 4
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            pending: set[Future] = set()
+            for group in self.customer_groups(events, options["batch_size"]):
+                if len(pending) >= max_pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    self.collect(done)
+                pending.add(executor.submit(self.replay, group))
+            self.collect(wait(pending).done)
+
+        elapsed = time.perf_counter() - started
+        rate = self.replayed / elapsed if elapsed else 0
+        self.stdout.write(
+            f"{'Dry run: ' if self.dry_run else ''}replayed {self.replayed} events "
+            f"in {elapsed:.1f}s ({rate:.0f} events/s); {self.changed} users "
+            f"changed, {self.failed} events failed, {self.skipped} skipped"
+        )
+
+    @staticmethod
+    def customer_groups(events, batch_size):
+        """Yield each customer's events together; customerless events alone."""
+        stream = events.iterator(chunk_size=batch_size)
+        for customer_id, group in groupby(stream, key=lambda event: event.customer_id):
+            if customer_id:
+                yield list(group)
+            else:
+                yield from ([event] for event in group)
+
+    def replay(self, group):
+        try:
+            return group, replay_events(group, dry_run=self.dry_run), None
+        except Exception as exc:  # noqa: BLE001
+            return group, None, exc
+        finally:
+            close_old_connections()
+
+    def collect(self, futures):
+        for future in futures:
+            group, diff, error = future.result()
+            if error is not None:
+                self.failed += len(group)
+                self.stderr.write(
+                    f"Replaying {group[0].event_id} ({group[0].customer_id or '-'}) "
+                    f"failed: {error!r}"
+                )
+                continue
+            if diff is None:
+                self.skipped += len(group)
+                continue
+            self.replayed += len(group)
+            self.changed += len(diff)
+            if self.dry_run:
+                for user_id, (before, after) in sorted(diff.items()):
+                    self.stdout.write(self.format_diff(user_id, before, after))
+
+    @staticmethod
+    def format_diff(user_id, before, after):
+        before = before or (None,) * len(REPLAYED_FIELDS)
+        changes = ", ".join(
+            f"{field}: {old!r} -> {new!r}"
+            for field, old, new in zip(REPLAYED_FIELDS, before, after, strict=True)
+            if old != new
+        )
+        return f"user {user_id}: {changes}"
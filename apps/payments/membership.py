@@ -0,0 +1,242 @@
+"""Mapping between Stripe subscription state and the user membership flags."""
+
+import logging
+from collections.abc import Iterable
+from collections.abc import Mapping
+from datetime import UTC
+from datetime import datetime
+from typing import Any
+
+from django.contrib.auth import get_user_model
+from django.db import OperationalError
+from django.db import transaction
+
+from apps.core import analytics
+from apps.users.cache import forget_user
+from apps.users.tokens import revoke_user_tokens
+
+from .models import StripeCustomer
+
+User = get_user_model()
+
+logger = logging.getLogger(__name__)
+
+# Postgres "lock_not_available", raised by FOR UPDATE NOWAIT
+LOCK_NOT_AVAILABLE = "55P03"
+
+# status -> (has_membership, membership_paused)
+SUBSCRIPTION_STATUS_FLAGS: dict[str, tuple[bool, bool]] = {
+    "trialing": (True, False),
+    "active": (True, False),
+    "past_due": (True, True),
+    "unpaid": (True, True),
+    "paused": (True, True),
+    "canceled": (False, False),
+    "incomplete_expired": (False, False),
+}
+NO_MEMBERSHIP = (False, False)
+
+# Flags whose changes are reported to analytics as membership transitions
+MEMBERSHIP_FIELDS = ("has_membership", "membership_paused")
+
+# When a customer has several subscriptions, the most permissive one wins.
+_FLAGS_PRIORITY = {(True, False): 2, (True, True): 1, (False, False): 0}
+
+
+def membership_changed(user_id: int, before: tuple, after: tuple) -> None:
+    """
+    Act on a membership change once the transaction commits.
+
+    Reports it to analytics and revokes the user's access tokens, whose
+    membership claims are now stale; clients refresh them. The cached user
+    is dropped too, as ``bulk_update`` sends no ``post_save``.
+    """
+    forget_user(user_id)
+    properties = {
+        **{
+            f"previous_{name}": value
+            for name, value in zip(MEMBERSHIP_FIELDS, before, strict=True)
+        },
+        **dict(zip(MEMBERSHIP_FIELDS, after, strict=True)),
+    }
+    transaction.on_commit(
+        lambda: analytics.capture(
+            user_id, "membership_changed", properties, essential=True
+        )
+    )
+    transaction.on_commit(lambda: revoke_user_tokens(user_id))
+
+
+def membership_flags(status: str | None) -> tuple[bool, bool] | None:
+    """Return ``(has_membership, membership_paused)`` for a subscription status.
+
+    Unknown statuses (e.g. ``incomplete``) return None and must leave the user
+    untouched.
+    """
+    return SUBSCRIPTION_STATUS_FLAGS.get(status or "")
+
+
+def expected_flags_by_customer(
+    subscriptions: Iterable[Mapping[str, Any]],
+) -> tuple[dict[str, tuple[bool, bool]], set[str]]:
+    """Fold a stream of Stripe subscriptions into per-customer membership flags.
+
+    Returns the expected flags and the set of every customer seen, including
+    customers whose subscriptions only have unknown statuses.
+    """
+    expected: dict[str, tuple[bool, bool]] = {}
+    seen: set[str] = set()
+    for subscription in subscriptions:
+        customer_id = subscription.get("customer")
+        if not customer_id:
+            continue
+        seen.add(customer_id)
+        flags = membership_flags(subscription.get("status"))
+        if flags is None:
+            continue
+        current = expected.get(customer_id)
+        if current is None or _FLAGS_PRIORITY[flags] > _FLAGS_PRIORITY[current]:
+            expected[customer_id] = flags
+    return expected, seen
+
+
+def snapshot_flags(
+    customer_ids: Iterable[str] | None = None,
+) -> dict[str, tuple[bool, bool]]:
+    """Linked users' current flags by customer, to pass to ``apply_membership_flags``.
+
+    Take it before walking Stripe; ``customer_ids`` limits it to those customers.
+    """
+    users = User.objects.exclude(stripe_customer_id="")
+    if customer_ids is not None:
+        users = users.filter(stripe_customer_id__in=list(customer_ids))
+    rows = users.values_list("stripe_customer_id", *MEMBERSHIP_FIELDS)
+    return {
+        customer_id: (has_membership, paused)
+        for customer_id, has_membership, paused in rows.iterator()
+    }
+
+
+def apply_membership_flags(
+    expected: Mapping[str, tuple[bool, bool] | list[bool]],
+    batch_size: int = 500,
+    snapshot: Mapping[str, tuple[bool, bool] | list[bool]] | None = None,
+) -> int:
+    """Bring users in line with ``expected`` and return how many rows changed.
+
+    ``expected`` comes from a Stripe walk that can take minutes, while webhooks
+    keep updating users. With a ``snapshot`` from ``snapshot_flags`` taken
+    before the walk, only users whose flags still match it are written; the
+    others changed since, and the webhook's newer state wins.
+
+    Each batch of ``batch_size`` customers locks its users, re-reads them and
+    writes the differences with ``bulk_update`` in one short transaction. Users
+    locked by a webhook right now are skipped until the next run.
+    """
+    customer_ids = sorted(expected)
+    updated = 0
+    for start in range(0, len(customer_ids), batch_size):
+        with transaction.atomic():
+            users = (
+                User.objects.select_for_update(skip_locked=True)
+                .filter(stripe_customer_id__in=customer_ids[start : start + batch_size])
+                .only("pk", "stripe_customer_id", *MEMBERSHIP_FIELDS)
+                .order_by("pk")
+            )
+            changed = []
+            previous = {}
+            for user in users:
+                before = (user.has_membership, user.membership_paused)
+                after = tuple(expected[user.stripe_customer_id])
+                if snapshot is not None and before != tuple(
+                    snapshot.get(user.stripe_customer_id, ())
+                ):
+                    continue
+                if before != after:
+                    user.has_membership, user.membership_paused = after
+                    changed.append(user)
+                    previous[user.pk] = before
+
+            User.objects.bulk_update(changed, list(MEMBERSHIP_FIELDS))
+            for user in changed:
+                membership_changed(
+                    user.pk,
+                    previous[user.pk],
+                    (user.has_membership, user.membership_paused),
+                )
+        updated += len(changed)
+    return updated
+
+
+def user_for_customer(customer_id: str):
+    """Return the user linked to ``customer_id`` without asking Stripe, or None."""
+    link = (
+        StripeCustomer.objects.select_related("user")
+        .filter(customer_id=customer_id)
+        .first()
+    )
+    if link:
+        return link.user
+    # Customers linked before the mapping table existed
+    user = User.objects.filter(stripe_customer_id=customer_id).first()
+    if user:
+        remember_customer(customer_id, user.pk)
+    return user
+
+
+def remember_customer(customer_id: str, user_id: int) -> None:
+    """Record that ``customer_id`` belongs to ``user_id``."""
+    StripeCustomer.objects.update_or_create(
+        customer_id=customer_id, defaults={"user_id": user_id}
+    )
+
+
+def update_user_flags(
+    user_id: int,
+    fields: Mapping[str, Any],
+    *,
+    nowait=True,
+    event_created: int | None = None,
+) -> bool:
+    """
+    Write ``fields`` to the user under a short row lock.
+
+    With ``nowait`` the lock is ``FOR UPDATE NOWAIT``: returns False instead
+    of waiting when another transaction holds the row, so the caller can
+    requeue rather than stall.
+
+    ``event_created`` is the ``created`` timestamp of the Stripe event the
+    fields come from. An event older than the last one applied to the user is
+    dropped, so a requeued or redelivered update can't undo a newer one.
+    """
+    try:
+        with transaction.atomic():
+            locked = User.objects.select_for_update(nowait=nowait)
+            user = locked.filter(pk=user_id).first()
+            if user is None:
+                return True
+            if event_created is not None:
+                event_at = datetime.fromtimestamp(event_created, tz=UTC)
+                if user.membership_event_at and event_at < user.membership_event_at:
+                    logger.info(
+                        "Dropping membership update for user %s from a stale event",
+                        user_id,
+                    )
+                    return True
+                fields = {**fields, "membership_event_at": event_at}
+            before = tuple(getattr(user, name) for name in MEMBERSHIP_FIELDS)
+            changed = [
+                name for name, value in fields.items() if getattr(user, name) != value
+            ]
+            for name in changed:
+                setattr(user, name, fields[name])
+            if changed:
+                user.save(update_fields=changed)
+            after = tuple(getattr(user, name) for name in MEMBERSHIP_FIELDS)
+            if before != after:
+                membership_changed(user.pk, before, after)
+    except OperationalError as exc:
+        if getattr(exc.__cause__, "sqlstate", None) != LOCK_NOT_AVAILABLE:
+            raise
+        return False
+    return True
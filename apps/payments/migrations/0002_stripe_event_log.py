@@ -0,0 +1,75 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:37
+
+from django.db import migrations, models
+
+# Django can't declare a partitioned table, so the schema is written by hand
+# and kept in step with the model state below.
+CREATE_TABLE = """
+CREATE TABLE "payments_stripeevent" (
+    "event_id" varchar(255) NOT NULL,
+    "created" timestamp with time zone NOT NULL,
+    "received_at" timestamp with time zone NOT NULL,
+    "event_type" varchar(100) NOT NULL,
+    "customer_id" varchar(255) NOT NULL,
+    "livemode" boolean NOT NULL,
+    "payload" jsonb NOT NULL,
+    PRIMARY KEY ("event_id", "created")
+) PARTITION BY RANGE ("created");
+CREATE INDEX "payments_event_customer_idx"
+    ON "payments_stripeevent" ("customer_id", "created");
+CREATE INDEX "payments_event_type_idx"
+    ON "payments_stripeevent" ("event_type", "created");
+CREATE TABLE "payments_stripeevent_default"
+    PARTITION OF "payments_stripeevent" DEFAULT;
+DO $$
+DECLARE
+    month date := date_trunc('month', now() AT TIME ZONE 'UTC');
+BEGIN
+    FOR i IN 0..2 LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF "payments_stripeevent" '
+            'FOR VALUES FROM (%L) TO (%L)',
+            'payments_stripeevent_' || to_char(month, '"y"YYYY"m"MM'),
+            month::timestamp AT TIME ZONE 'UTC',
+            (month + interval '1 month')::timestamp AT TIME ZONE 'UTC'
+        );
+        month := month + interval '1 month';
+    END LOOP;
+END $$;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    CREATE_TABLE,
+                    reverse_sql='DROP TABLE "payments_stripeevent";',
+                ),
+            ],
+            state_operations=[
+                migrations.CreateModel(
+                    name='StripeEvent',
+                    fields=[
+                        ('pk', models.CompositePrimaryKey('event_id', 'created', blank=True, editable=False, primary_key=True, serialize=False)),
+                        ('event_id', models.CharField(max_length=255)),
+                        ('created', models.DateTimeField()),
+                        ('received_at', models.DateTimeField(auto_now_add=True)),
+                        ('event_type', models.CharField(max_length=100)),
+                        ('customer_id', models.CharField(blank=True, default='', max_length=255)),
+                        ('livemode', models.BooleanField(default=False)),
+                        ('payload', models.JSONField()),
+                    ],
+                    options={
+                        'indexes': [models.Index(fields=['customer_id', 'created'], name='payments_event_customer_idx'), models.Index(fields=['event_type', 'created'], name='payments_event_type_idx')],
+                    },
+                ),
+            ],
+        ),
+    ]
@@ -1 +1,57 @@
-# Create your models here.
+from django.contrib.auth import get_user_model
+from django.db import models
+
+User = get_user_model()
+
+
+class StripeCustomer(models.Model):
+    """
+    Every Stripe customer ever linked to a user.
+
+    Webhooks resolve their customer here instead of asking Stripe, including
+    for customers a user has since replaced (``User.stripe_customer_id`` only
+    holds the current one).
+    """
+
+    customer_id = models.CharField(max_length=255, primary_key=True)
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="stripe_customers"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.customer_id
+
+
+class StripeEvent(models.Model):
+    """
+    Raw Stripe webhook events, appended as received, for replay and audit.
+
+    Range-partitioned by month on ``created`` (see migration 0002 and
+    ``apps.payments.events.create_event_partitions``). Stripe redelivers an
+    event with the same id and timestamp, so redeliveries land in the same
+    partition and are dropped by the primary key.
+    """
+
+    pk = models.CompositePrimaryKey("event_id", "created")
+    event_id = models.CharField(max_length=255)
+    # Stripe's event timestamp, not the delivery time
+    created = models.DateTimeField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    event_type = models.CharField(max_length=100)
+    customer_id = models.CharField(max_length=255, blank=True, default="")
+    livemode = models.BooleanField(default=False)
+    payload = models.JSONField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["customer_id", "created"], name="payments_event_customer_idx"
+            ),
+            models.Index(
+                fields=["event_type", "created"], name="payments_event_type_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return self.event_id
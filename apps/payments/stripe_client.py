@@ -0,0 +1,90 @@
+"""
+Lazy Stripe SDK setup.
+
+``stripe`` is a large import. Modules outside the payment views ask for it
+through ``get_stripe()`` so processes that never touch payments never load it.
+"""
+
+import logging
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_configured = False
+
+
+class StripeCallInTransactionError(RuntimeError):
+    """A Stripe request was made while a database transaction was open."""
+
+
+def get_api_key() -> str:
+    return settings.STRIPE_SECRET_KEY or settings.STRIPE_TEST_SECRET_KEY
+
+
+def get_stripe():
+    """Import the Stripe SDK, configuring the API key and version once."""
+    global _configured  # noqa: PLW0603
+    import stripe  # noqa: PLC0415
+
+    if not _configured:
+        api_key = get_api_key()
+        if api_key:
+            stripe.api_key = api_key
+        else:
+            logger.warning(
+                "Stripe secret key is not configured; payment operations will fail."
+            )
+        if settings.STRIPE_API_VERSION:
+            stripe.api_version = settings.STRIPE_API_VERSION
+        if settings.STRIPE_TRANSACTION_GUARD != "off":
+            stripe.default_http_client = _guarded_http_client(stripe)
+        _configured = True
+    return stripe
+
+
+def open_transactions() -> list[str]:
+    """Database aliases with an open transaction, ignoring test case wrappers."""
+    return [
+        connection.alias
+        for connection in connections.all(initialized_only=True)
+        if any(
+            not getattr(block, "_from_testcase", False)
+            for block in connection.atomic_blocks
+        )
+    ]
+
+
+def check_no_transaction(method: str, url: str) -> None:
+    """
+    Warn or raise, per ``STRIPE_TRANSACTION_GUARD``, if a transaction is open.
+
+    A Stripe round-trip inside a transaction keeps its connection, snapshot
+    and row locks held for the duration of a network call.
+    """
+    aliases = open_transactions()
+    if not aliases:
+        return
+    msg = (
+        f"Stripe {method.upper()} {url} called inside an open transaction on "
+        f"{', '.join(aliases)}; move it outside transaction.atomic()"
+    )
+    if settings.STRIPE_TRANSACTION_GUARD == "raise":
+        raise StripeCallInTransactionError(msg)
+    logger.warning(msg)
+
+
+def _guarded_http_client(stripe):
+    client = stripe.new_default_http_client(
+        verify_ssl_certs=stripe.verify_ssl_certs, proxy=stripe.proxy
+    )
+    for name in ("request_with_retries", "request_stream_with_retries"):
+        request = getattr(client, name)
+
+        def guarded(method, url, *args, _request=request, **kwargs):
+            check_no_transaction(method, url)
+            return _request(method, url, *args, **kwargs)
+
+        setattr(client, name, guarded)
+    return client
@@ -0,0 +1,17 @@
+# Tasks are routed to Celery queues by module (see CELERY_TASK_ROUTES), so each
+# class of work lives in its own submodule: webhooks, email or bulk.
+from .bulk import create_stripe_event_partitions
+from .bulk import reconcile_customers
+from .bulk import reconcile_membership_shard
+from .bulk import reconcile_memberships
+from .bulk import summarize_membership_reconcile
+from .webhooks import apply_user_flags
+
+__all__ = [
+    "apply_user_flags",
+    "create_stripe_event_partitions",
+    "reconcile_customers",
+    "reconcile_membership_shard",
+    "reconcile_memberships",
+    "summarize_membership_reconcile",
+]
@@ -0,0 +1,131 @@
+import logging
+from itertools import islice
+
+from celery import chord
+from celery import shared_task
+from celery.exceptions import SoftTimeLimitExceeded
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+
+from apps.payments.events import create_event_partitions
+from apps.payments.membership import NO_MEMBERSHIP
+from apps.payments.membership import apply_membership_flags
+from apps.payments.membership import expected_flags_by_customer
+from apps.payments.membership import snapshot_flags
+from apps.payments.stripe_client import get_api_key
+from apps.payments.stripe_client import get_stripe
+
+User = get_user_model()
+
+logger = logging.getLogger(__name__)
+
+
+def _chunks(items, size):
+    iterator = iter(items)
+    while chunk := dict(islice(iterator, size)):
+        yield chunk
+
+
+@shared_task(
+    soft_time_limit=settings.STRIPE_RECONCILE_SOFT_TIME_LIMIT,
+    time_limit=settings.STRIPE_RECONCILE_TIME_LIMIT,
+)
+def reconcile_memberships():
+    """Re-sync every user's membership flags from Stripe.
+
+    Stripe's list endpoint can only be paged sequentially, so this task walks
+    all subscriptions once and fans the per-customer result out to a chord of
+    shard tasks that apply the differences in bulk. Users whose flags changed
+    during the walk are left to the webhooks that changed them. The walk runs
+    under ``STRIPE_RECONCILE_SOFT_TIME_LIMIT`` rather than the default limit.
+    """
+    if not get_api_key():
+        logger.warning("Stripe secret key missing; skipping membership reconcile")
+        return None
+
+    snapshot = snapshot_flags()
+    stripe = get_stripe()
+    subscriptions = stripe.Subscription.list(status="all", limit=100)
+    try:
+        expected, seen = expected_flags_by_customer(subscriptions.auto_paging_iter())
+    except SoftTimeLimitExceeded:
+        logger.exception(
+            "Membership reconcile ran out of time walking Stripe subscriptions; "
+            "raise STRIPE_RECONCILE_SOFT_TIME_LIMIT"
+        )
+        raise
+
+    # Members whose customer has no subscription at all have lost access
+    flagged_customers = (
+        User.objects.exclude(stripe_customer_id="")
+        .filter(Q(has_membership=True) | Q(membership_paused=True))
+        .values_list("stripe_customer_id", flat=True)
+    )
+    for customer_id in flagged_customers.iterator():
+        if customer_id not in seen:
+            expected[customer_id] = NO_MEMBERSHIP
+
+    shards = [
+        reconcile_membership_shard.s(
+            shard,
+            {
+                customer: snapshot[customer]
+                for customer in shard
+                if customer in snapshot
+            },
+        )
+        for shard in _chunks(expected.items(), settings.STRIPE_RECONCILE_SHARD_SIZE)
+    ]
+    if not shards:
+        return None
+    return chord(shards)(summarize_membership_reconcile.s()).id
+
+
+@shared_task
+def reconcile_membership_shard(expected, snapshot=None):
+    """
+    Apply ``{customer_id: [has_membership, membership_paused]}`` to users.
+
+    ``snapshot`` holds the users' flags from before the walk, in the same shape.
+    """
+    return apply_membership_flags(
+        expected, batch_size=settings.STRIPE_RECONCILE_BATCH_SIZE, snapshot=snapshot
+    )
+
+
+@shared_task
+def summarize_membership_reconcile(results):
+    updated = sum(results)
+    logger.info(
+        "Membership reconcile finished: %s users updated across %s shards",
+        updated,
+        len(results),
+    )
+    return updated
+
+
+@shared_task
+def reconcile_customers(customer_ids):
+    """Reconcile a hand-picked set of customers, e.g. from an admin action."""
+    snapshot = snapshot_flags(customer_ids)
+    stripe = get_stripe()
+    expected = {}
+    for customer_id in customer_ids:
+        subscriptions = stripe.Subscription.list(
+            customer=customer_id, status="all", limit=100
+        )
+        flags, seen = expected_flags_by_customer(subscriptions.auto_paging_iter())
+        if customer_id in flags:
+            expected[customer_id] = flags[customer_id]
+        elif customer_id not in seen:
+            expected[customer_id] = NO_MEMBERSHIP
+    return apply_membership_flags(
+        expected, batch_size=settings.STRIPE_RECONCILE_BATCH_SIZE, snapshot=snapshot
+    )
+
+
+@shared_task
+def create_stripe_event_partitions():
+    """Keep monthly Stripe event log partitions created ahead of time."""
+    return create_event_partitions(settings.STRIPE_EVENT_PARTITIONS_AHEAD)
@@ -0,0 +1,23 @@
+import logging
+
+from celery import shared_task
+
+from apps.payments.membership import update_user_flags
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, max_retries=5)
+def apply_user_flags(self, user_id, fields, event_created=None):
+    """Retry a webhook's membership update that found the user's row locked.
+
+    Each attempt uses ``NOWAIT`` with exponential backoff; the last one waits
+    for the lock instead. The update is dropped once a newer event than
+    ``event_created`` has been applied.
+    """
+    final_attempt = self.request.retries >= self.max_retries
+    if not update_user_flags(
+        user_id, fields, nowait=not final_attempt, event_created=event_created
+    ):
+        logger.info("User %s still locked, retrying flag update", user_id)
+        raise self.retry(countdown=2**self.request.retries)
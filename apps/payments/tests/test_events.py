@@ -0,0 +1,137 @@
+"""Tests for the Stripe webhook event log and replay command."""
+
+import json
+from io import StringIO
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.test import TransactionTestCase
+from django.test import override_settings
+
+from apps.payments.events import create_event_partitions
+from apps.payments.events import record_event
+from apps.payments.models import StripeCustomer
+from apps.payments.models import StripeEvent
+
+User = get_user_model()
+
+
+def subscription_event(event_id, customer_id, status, created=1_790_000_000):
+    return {
+        "id": event_id,
+        "object": "event",
+        "created": created,
+        "type": "customer.subscription.updated",
+        "livemode": False,
+        "data": {
+            "object": {
+                "object": "subscription",
+                "customer": customer_id,
+                "status": status,
+            }
+        },
+    }
+
+
+class StripeEventLogTest(TestCase):
+    """Tests for appending webhook events to the log."""
+
+    @override_settings(STRIPE_WEBHOOK_SECRET="")
+    def test_webhook_logs_event_once(self):
+        """Test that events are logged and redeliveries ignored."""
+        payload = json.dumps(subscription_event("evt_1", "cus_log", "active"))
+
+        for _ in range(2):
+            response = self.client.post(
+                "/payments/webhook/", data=payload, content_type="application/json"
+            )
+            assert response.status_code == 200  # noqa: PLR2004
+
+        event = StripeEvent.objects.get()
+        assert event.event_id == "evt_1"
+        assert event.customer_id == "cus_log"
+        assert event.event_type == "customer.subscription.updated"
+
+    def test_partitions_are_created_ahead(self):
+        """Test that partition creation is idempotent and looks ahead."""
+        created = create_event_partitions(months_ahead=4)
+
+        assert len(created) == 5  # noqa: PLR2004
+        assert create_event_partitions(months_ahead=4) == created
+
+
+class ReplayStripeEventsTest(TransactionTestCase):
+    """Tests for replay_stripe_events, which replays in worker threads."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="replay@example.com",
+            password="testpass123",  # noqa: S106
+            stripe_customer_id="cus_replay",
+        )
+        StripeCustomer.objects.create(customer_id="cus_replay", user=self.user)
+        record_event(subscription_event("evt_a", "cus_replay", "past_due", 100))
+        record_event(subscription_event("evt_b", "cus_replay", "active", 200))
+
+    def replay(self, *args):
+        out = StringIO()
+        call_command("replay_stripe_events", *args, stdout=out)
+        return out.getvalue()
+
+    def test_dry_run_prints_diff_without_writing(self):
+        """Test that a dry run reports the change and rolls it back."""
+        output = self.replay("--dry-run")
+
+        assert f"user {self.user.pk}: has_membership: False -> True" in output
+        assert "replayed 2 events" in output
+        self.user.refresh_from_db()
+        assert self.user.has_membership is False
+
+    @patch("stripe.Charge.retrieve")
+    @patch("stripe.Customer.retrieve")
+    def test_dry_run_never_calls_stripe(self, customer_retrieve, charge_retrieve):
+        """Test that a dry run skips events it can't resolve without Stripe."""
+        metadata = {settings.STRIPE_SUBSCRIBER_METADATA_KEY: str(self.user.pk)}
+        unlinked = subscription_event("evt_c", "cus_unlinked", "active", 300)
+        unlinked["data"]["object"]["metadata"] = metadata
+        record_event(unlinked)
+        record_event(
+            {
+                "id": "evt_d",
+                "object": "event",
+                "created": 400,
+                "type": "charge.dispute.created",
+                "livemode": False,
+                "data": {
+                    "object": {
+                        "object": "dispute",
+                        "charge": "ch_1",
+                        "metadata": metadata,
+                    }
+                },
+            }
+        )
+
+        output = self.replay("--dry-run")
+
+        assert "replayed 4 events" in output
+        assert "0 events failed" in output
+        customer_retrieve.assert_not_called()
+        charge_retrieve.assert_not_called()
+
+    def test_events_apply_in_order_per_customer(self):
+        """Test that the newest event of a customer wins."""
+        self.replay("--workers", "2")
+
+        self.user.refresh_from_db()
+        assert self.user.has_membership is True
+        assert self.user.membership_paused is False
+
+    def test_filters_by_type(self):
+        """Test that --type restricts the replayed events."""
+        output = self.replay("--type", "invoice.paid")
+
+        assert "replayed 0 events" in output
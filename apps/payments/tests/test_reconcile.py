@@ -0,0 +1,131 @@
+"""Tests for the Stripe-to-database membership reconciliation job."""
+
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from apps.payments.membership import apply_membership_flags
+from apps.payments.membership import expected_flags_by_customer
+from apps.payments.tasks import reconcile_customers
+from apps.payments.tasks import reconcile_memberships
+
+User = get_user_model()
+
+
+def _subscription_list(*subscriptions):
+    listing = MagicMock()
+    listing.auto_paging_iter.return_value = iter(subscriptions)
+    return listing
+
+
+class ExpectedFlagsTest(TestCase):
+    def test_most_permissive_subscription_wins(self):
+        expected, seen = expected_flags_by_customer(
+            [
+                {"customer": "cus_1", "status": "canceled"},
+                {"customer": "cus_1", "status": "active"},
+                {"customer": "cus_1", "status": "past_due"},
+                {"customer": "cus_2", "status": "incomplete"},
+            ]
+        )
+        assert expected == {"cus_1": (True, False)}
+        assert seen == {"cus_1", "cus_2"}
+
+
+class ReconcileMembershipTest(TestCase):
+    def setUp(self):
+        self.active = User.objects.create_user(
+            email="active@example.com",
+            password="testpass123",  # noqa: S106
+            stripe_customer_id="cus_active",
+        )
+        self.lapsed = User.objects.create_user(
+            email="lapsed@example.com",
+            password="testpass123",  # noqa: S106
+            stripe_customer_id="cus_lapsed",
+            has_membership=True,
+        )
+
+    def test_apply_only_writes_changed_users(self):
+        updated = apply_membership_flags(
+            {"cus_active": (True, False), "cus_lapsed": (True, False)}
+        )
+
+        assert updated == 1
+        self.active.refresh_from_db()
+        assert self.active.has_membership is True
+
+    @patch("apps.payments.tasks.bulk.chord")
+    @patch("stripe.Subscription.list")
+    def test_reconcile_shards_expected_flags(self, mock_list, mock_chord):
+        mock_list.return_value = _subscription_list(
+            {"customer": "cus_active", "status": "trialing"},
+        )
+
+        reconcile_memberships()
+
+        shards = mock_chord.call_args[0][0]
+        assert len(shards) == 1
+        assert shards[0].args[0] == {
+            "cus_active": (True, False),
+            "cus_lapsed": (False, False),
+        }
+        assert shards[0].args[1] == {
+            "cus_active": (False, False),
+            "cus_lapsed": (True, False),
+        }
+
+    def test_reconcile_has_its_own_time_limits(self):
+        assert reconcile_memberships.soft_time_limit == (
+            settings.STRIPE_RECONCILE_SOFT_TIME_LIMIT
+        )
+        assert reconcile_memberships.time_limit == settings.STRIPE_RECONCILE_TIME_LIMIT
+        assert reconcile_memberships.soft_time_limit > (
+            settings.CELERY_TASK_SOFT_TIME_LIMIT
+        )
+
+    def test_apply_skips_users_changed_since_snapshot(self):
+        updated = apply_membership_flags(
+            {"cus_active": (True, False), "cus_lapsed": (False, False)},
+            snapshot={"cus_active": [False, False], "cus_lapsed": [False, False]},
+        )
+
+        assert updated == 1
+        self.active.refresh_from_db()
+        self.lapsed.refresh_from_db()
+        assert self.active.has_membership is True
+        assert self.lapsed.has_membership is True
+
+    @patch("stripe.Subscription.list")
+    def test_reconcile_keeps_webhook_changes_made_during_the_walk(self, mock_list):
+        def walk():
+            # A webhook pauses the membership while the walk is paging
+            User.objects.filter(pk=self.lapsed.pk).update(membership_paused=True)
+            yield {"customer": "cus_lapsed", "status": "canceled"}
+
+        mock_list.return_value.auto_paging_iter.return_value = walk()
+
+        assert reconcile_customers(["cus_lapsed"]) == 0
+
+        self.lapsed.refresh_from_db()
+        assert self.lapsed.has_membership is True
+
+    @patch("stripe.Subscription.list")
+    def test_reconcile_customers(self, mock_list):
+        mock_list.side_effect = [
+            _subscription_list({"customer": "cus_active", "status": "past_due"}),
+            _subscription_list(),
+        ]
+
+        assert reconcile_customers(["cus_active", "cus_lapsed"]) == 2  # noqa: PLR2004
+
+        self.active.refresh_from_db()
+        self.lapsed.refresh_from_db()
+        assert (self.active.has_membership, self.active.membership_paused) == (
+            True,
+            True,
+        )
+        assert self.lapsed.has_membership is False
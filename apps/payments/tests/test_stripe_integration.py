@@ -76,8 +76,9 @@ class StripeCustomerManagementTest(TestCase):
 
     @patch("apps.payments.views.stripe.Customer.modify")
     def test_link_user_to_customer_updates_metadata(self, mock_modify):
-        """Test that linking user to customer updates Stripe metadata."""
-        _link_user_to_customer(self.user, "cus_link123")
+        """Test that linking user to customer updates Stripe metadata on commit."""
+        with self.captureOnCommitCallbacks(execute=True):
+            _link_user_to_customer(self.user, "cus_link123")
 
         self.user.refresh_from_db()
         assert self.user.stripe_customer_id == "cus_link123"
@@ -0,0 +1,103 @@
+"""Tests keeping Stripe requests out of database transactions."""
+
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test import TestCase
+from django.test import override_settings
+
+from apps.payments.stripe_client import StripeCallInTransactionError
+from apps.payments.stripe_client import check_no_transaction
+from apps.payments.stripe_client import open_transactions
+from apps.payments.views import _dispatch_webhook
+
+User = get_user_model()
+
+
+class TransactionGuardTest(TestCase):
+    """Tests for the Stripe-call-in-transaction guard."""
+
+    def test_test_case_transaction_is_ignored(self):
+        """Test that the transaction wrapping each test case does not count."""
+        assert open_transactions() == []
+        check_no_transaction("get", "/v1/customers")
+
+    @override_settings(STRIPE_TRANSACTION_GUARD="raise")
+    def test_raises_inside_atomic_block(self):
+        """Test that a Stripe request inside atomic() raises."""
+        with transaction.atomic(), pytest.raises(StripeCallInTransactionError):
+            check_no_transaction("get", "/v1/customers")
+
+    @override_settings(STRIPE_TRANSACTION_GUARD="warn")
+    def test_warns_inside_atomic_block(self):
+        """Test that warn mode only logs."""
+        with (
+            transaction.atomic(),
+            self.assertLogs("apps.payments.stripe_client", "WARNING"),
+        ):
+            check_no_transaction("get", "/v1/customers")
+
+
+class StripeViewsTransactionTest(TestCase):
+    """Tests that views make their Stripe requests with no transaction open."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="txn@example.com",
+            password="testpass123",  # noqa: S106
+            stripe_customer_id="cus_txn",
+        )
+        self.client.force_login(self.user)
+        self.seen = []
+
+    def record(self, *args, **kwargs):
+        self.seen.append(open_transactions())
+        return MagicMock(data=[], url="https://stripe.test/session")
+
+    def test_current_user_fetches_subscription_outside_transaction(self):
+        """Test that /api/user/ is not wrapped in ATOMIC_REQUESTS."""
+        with patch("stripe.Subscription.list", side_effect=self.record):
+            response = self.client.get("/api/user/")
+
+        assert response.status_code == 200  # noqa: PLR2004
+        assert self.seen == [[]]
+
+    def test_checkout_calls_stripe_outside_transaction(self):
+        """Test that the checkout view opens no request-wide transaction."""
+        with (
+            patch("apps.payments.views.stripe.Customer.retrieve", self.record),
+            patch("apps.payments.views.stripe.Price.retrieve", self.record),
+            patch("apps.payments.views.stripe.checkout.Session.create", self.record),
+        ):
+            response = self.client.get("/payments/checkout/price_test123/")
+
+        assert response.status_code == 303  # noqa: PLR2004
+        assert self.seen == [[], [], []]
+
+    def test_webhook_customer_lookup_holds_no_lock(self):
+        """Test that an unlinked customer is looked up before any transaction."""
+        customer = {"metadata": {"user_id": str(self.user.pk)}}
+
+        def retrieve(customer_id):
+            self.seen.append(open_transactions())
+            return customer
+
+        with (
+            patch("apps.payments.views.stripe.Customer.retrieve", retrieve),
+            patch("apps.payments.views.stripe.Customer.modify", self.record),
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            _dispatch_webhook(
+                {
+                    "type": "customer.subscription.updated",
+                    "data": {"object": {"customer": "cus_new", "status": "active"}},
+                }
+            )
+
+        self.user.refresh_from_db()
+        assert self.user.stripe_customer_id == "cus_new"
+        assert self.user.has_membership
+        assert self.seen == [[], []]
@@ -10,6 +10,8 @@ from django.test import TestCase
 from django.test import override_settings
 from stripe import SignatureVerificationError
 
+from apps.payments.models import StripeCustomer
+from apps.payments.tasks import apply_user_flags
 from apps.payments.views import _dispatch_webhook
 from apps.payments.views import _handle_checkout_session
 from apps.payments.views import _handle_invoice_upcoming
@@ -104,12 +106,15 @@ class WebhookDispatchTest(TestCase):
         """Test that checkout.session.completed event is dispatched correctly."""
         event = {
             "type": "checkout.session.completed",
+            "created": 1_000,
             "data": {"object": {"id": "cs_123", "metadata": {}}},
         }
 
         with patch("apps.payments.views._handle_checkout_session") as mock_handler:
             _dispatch_webhook(event)
-            mock_handler.assert_called_once_with({"id": "cs_123", "metadata": {}})
+            mock_handler.assert_called_once_with(
+                {"id": "cs_123", "metadata": {}}, 1_000
+            )
 
     def test_dispatch_async_payment_succeeded(self):
         """Test that async_payment_succeeded is dispatched correctly."""
@@ -387,3 +392,58 @@ class SubscriptionWebhookTest(TestCase):
         }
 
         _handle_invoice_upcoming(invoice)
+
+
+class CustomerResolutionTest(TestCase):
+    """Tests for resolving customers and updating flags without long locks."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="resolved@example.com",
+            password="testpass123",  # noqa: S106
+            stripe_customer_id="cus_current",
+        )
+        StripeCustomer.objects.create(customer_id="cus_previous", user=self.user)
+
+    @patch("apps.payments.views.stripe.Customer.retrieve")
+    def test_previous_customer_resolves_without_stripe(self, mock_retrieve):
+        """Test that a replaced customer still maps to its user locally."""
+        _handle_subscription_deleted({"id": "sub_old", "customer": "cus_previous"})
+
+        mock_retrieve.assert_not_called()
+
+    def test_legacy_link_is_remembered(self):
+        """Test that a customer only stored on the user is added to the map."""
+        _handle_invoice_upcoming({"id": "in_1", "customer": "cus_current"})
+
+        link = StripeCustomer.objects.get(customer_id="cus_current")
+        assert link.user == self.user
+
+    @patch("apps.payments.views.apply_user_flags.delay")
+    @patch("apps.payments.views.update_user_flags", return_value=False)
+    def test_locked_user_is_requeued(self, mock_update, mock_delay):
+        """Test that lock contention requeues the update instead of waiting."""
+        with self.captureOnCommitCallbacks(execute=True):
+            _handle_subscription_paused({"customer": "cus_current"})
+
+        mock_delay.assert_called_once_with(
+            self.user.pk, {"membership_paused": True}, event_created=None
+        )
+
+    def test_stale_event_does_not_undo_a_newer_one(self):
+        """Test that an event older than the last applied one is dropped."""
+        _handle_subscription_paused({"customer": "cus_current"}, created=2_000)
+        # e.g. a requeued resume from before the pause
+        apply_user_flags.apply(
+            args=(self.user.pk, {"membership_paused": False}),
+            kwargs={"event_created": 1_000},
+        )
+
+        self.user.refresh_from_db()
+        assert self.user.membership_paused is True
+        assert self.user.membership_event_at.timestamp() == 2_000  # noqa: PLR2004
+
+        _handle_subscription_resumed({"customer": "cus_current"}, created=3_000)
+
+        self.user.refresh_from_db()
+        assert self.user.membership_paused is False
@@ -1,11 +1,32 @@
 from django.urls import path
 
-from . import views
+from apps.core.lazy import lazy_view
 
 app_name = "payments"
 
+# Views are imported on first use so processes that never serve payments
+# skip loading the Stripe SDK. None of them run inside ATOMIC_REQUESTS: they
+# call Stripe and keep their own transactions short.
 urlpatterns = [
-    path("checkout/<str:price_id>/", views.create_checkout_session, name="checkout"),
-    path("customer-portal/", views.customer_portal, name="customer-portal"),
-    path("webhook/", views.stripe_webhook, name="webhook"),
+    path(
+        "checkout/<str:price_id>/",
+        lazy_view(
+            "apps.payments.views.create_checkout_session", non_atomic_requests=True
+        ),
+        name="checkout",
+    ),
+    path(
+        "customer-portal/",
+        lazy_view("apps.payments.views.customer_portal", non_atomic_requests=True),
+        name="customer-portal",
+    ),
+    path(
+        "webhook/",
+        lazy_view(
+            "apps.payments.views.stripe_webhook",
+            csrf_exempt=True,
+            non_atomic_requests=True,
+        ),
+        name="webhook",
+    ),
 ]
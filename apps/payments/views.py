@@ -1,6 +1,9 @@
 import json
 import logging
 from collections.abc import Iterable
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING
 from typing import Any
 
 import stripe
@@ -17,22 +20,49 @@ from stripe import InvalidRequestError
 from stripe import SignatureVerificationError
 from stripe import StripeError
 
-User = get_user_model()
+from apps.core import analytics
+from apps.core.routers import use_primary_database
 
-logger = logging.getLogger(__name__)
+from .events import record_event
+from .membership import membership_flags
+from .membership import remember_customer
+from .membership import update_user_flags
+from .membership import user_for_customer
+from .stripe_client import get_api_key
+from .stripe_client import get_stripe
+from .tasks import apply_user_flags
 
-stripe_api_key = settings.STRIPE_SECRET_KEY or settings.STRIPE_TEST_SECRET_KEY
-if stripe_api_key:
-    stripe.api_key = stripe_api_key
+if TYPE_CHECKING:
+    from apps.users.models import User
 else:
-    logger.warning("Stripe secret key is not configured; payment operations will fail.")
+    User = get_user_model()
+
+logger = logging.getLogger(__name__)
 
-if settings.STRIPE_API_VERSION:
-    stripe.api_version = settings.STRIPE_API_VERSION
+# This module is only imported once a payments URL is hit (see urls.py)
+get_stripe()
+stripe_api_key = get_api_key()
 
 SUBSCRIBER_METADATA_KEY = settings.STRIPE_SUBSCRIBER_METADATA_KEY
 CHECKOUT_MODE = "subscription"
 
+_local_lookups_only: ContextVar[bool] = ContextVar("local_lookups_only", default=False)
+
+
+@contextmanager
+def local_lookups_only():
+    """
+    Resolve customers and charges without asking Stripe while active.
+
+    Events whose customer isn't in the local map are then skipped. Used by
+    replay dry runs, which run inside a transaction that is rolled back.
+    """
+    token = _local_lookups_only.set(True)
+    try:
+        yield
+    finally:
+        _local_lookups_only.reset(token)
+
 
 def _set_user_fields(user: User, **fields: Any) -> Iterable[str]:
     """Update model fields if values changed and return the list of updated fields."""
@@ -52,16 +82,20 @@ def _link_user_to_customer(user: User, customer_id: str | None) -> None:
     if not customer_id:
         return
     updated = _set_user_fields(user, stripe_customer_id=customer_id)
+    remember_customer(customer_id, user.pk)
     if updated:
-        try:
-            stripe.Customer.modify(
-                customer_id,
-                metadata={SUBSCRIBER_METADATA_KEY: str(user.pk)},
-            )
-        except StripeError as exc:
-            logger.debug(
-                "Unable to sync metadata for customer %s: %s", customer_id, exc
-            )
+        # Runs immediately outside a transaction, otherwise once it commits
+        transaction.on_commit(lambda: _sync_customer_metadata(customer_id, user.pk))
+
+
+def _sync_customer_metadata(customer_id: str, user_id: int) -> None:
+    try:
+        stripe.Customer.modify(
+            customer_id,
+            metadata={SUBSCRIBER_METADATA_KEY: str(user_id)},
+        )
+    except StripeError as exc:
+        logger.debug("Unable to sync metadata for customer %s: %s", customer_id, exc)
 
 
 def _get_or_create_customer_id(user: User) -> str:
@@ -89,47 +123,69 @@ def _get_or_create_customer_id(user: User) -> str:
         raise
 
     _set_user_fields(user, stripe_customer_id=customer["id"])
+    remember_customer(customer["id"], user.pk)
     return customer["id"]
 
 
 def _get_user_for_customer(customer_id: str) -> User | None:
+    """
+    Find the user for a Stripe customer, asking Stripe when not yet linked.
+
+    Takes no locks and must run outside a transaction: the Stripe lookup is a
+    network round-trip. Customers found through Stripe are remembered, so
+    each one is looked up at most once.
+    """
     if not customer_id:
         return None
 
+    user = user_for_customer(customer_id)
+    if user or _local_lookups_only.get():
+        return user
+
     try:
-        return User.objects.select_for_update().get(stripe_customer_id=customer_id)
-    except User.DoesNotExist:
-        try:
-            customer = stripe.Customer.retrieve(customer_id)
-        except StripeError as exc:
-            logger.warning(
-                "Customer %s not found when handling webhook: %s", customer_id, exc
-            )
-            return None
+        customer = stripe.Customer.retrieve(customer_id)
+    except StripeError as exc:
+        logger.warning(
+            "Customer %s not found when handling webhook: %s", customer_id, exc
+        )
+        return None
 
-        metadata_user_id = customer.get("metadata", {}).get(SUBSCRIBER_METADATA_KEY)
-        if not metadata_user_id:
-            logger.warning(
-                "Customer %s missing %s metadata", customer_id, SUBSCRIBER_METADATA_KEY
-            )
-            return None
+    metadata_user_id = customer.get("metadata", {}).get(SUBSCRIBER_METADATA_KEY)
+    if not metadata_user_id:
+        logger.warning(
+            "Customer %s missing %s metadata", customer_id, SUBSCRIBER_METADATA_KEY
+        )
+        return None
 
-        try:
-            user = User.objects.select_for_update().get(pk=metadata_user_id)
-        except User.DoesNotExist:
-            logger.warning(
-                "User %s referenced by customer %s does not exist",
-                metadata_user_id,
-                customer_id,
-            )
-            return None
+    user = User.objects.filter(pk=metadata_user_id).first()
+    if user is None:
+        logger.warning(
+            "User %s referenced by customer %s does not exist",
+            metadata_user_id,
+            customer_id,
+        )
+        return None
 
-        _link_user_to_customer(user, customer_id)
-        return user
+    _link_user_to_customer(user, customer_id)
+    return user
+
+
+def _update_membership(user: User, created: int | None, **fields: bool) -> None:
+    """
+    Write flags under a NOWAIT lock, or requeue if another event holds it.
+
+    ``created`` is the event's timestamp, so the write, or its requeue, is
+    dropped once a newer event was applied.
+    """
+    if not update_user_flags(user.pk, fields, event_created=created):
+        logger.info("User %s locked by a concurrent update; requeueing", user.pk)
+        transaction.on_commit(
+            lambda: apply_user_flags.delay(user.pk, fields, event_created=created)
+        )
 
 
 def _resolve_customer_from_charge(charge_id: str | None) -> str | None:
-    if not charge_id:
+    if not charge_id or _local_lookups_only.get():
         return None
     try:
         charge = stripe.Charge.retrieve(charge_id)
@@ -140,6 +196,10 @@ def _resolve_customer_from_charge(charge_id: str | None) -> str | None:
     return charge.get("customer")
 
 
+# Billing state is read-modify-write, never from a lagging replica. No
+# request-wide transaction: the Stripe calls must not hold a connection open.
+@use_primary_database()
+@transaction.non_atomic_requests
 @login_required
 def create_checkout_session(request, price_id):
     user = request.user
@@ -177,6 +237,9 @@ def create_checkout_session(request, price_id):
         }
 
         checkout_session = stripe.checkout.Session.create(**session_kwargs)
+        analytics.capture(
+            user.pk, "checkout_started", {"price_id": price_id}, essential=True
+        )
         return HttpResponseRedirect(checkout_session.url, status=303)
 
     except InvalidRequestError:
@@ -194,6 +257,9 @@ def create_checkout_session(request, price_id):
         return HttpResponse("Unexpected error. Please contact support.", status=500)
 
 
+# Billing state is read-modify-write, never from a lagging replica
+@use_primary_database()
+@transaction.non_atomic_requests
 @login_required
 def customer_portal(request):
     frontend_url = settings.FRONTEND_URL
@@ -222,7 +288,9 @@ def customer_portal(request):
         return redirect(frontend_url)
 
 
+# Each handler opens its own transaction around just its writes
 @csrf_exempt
+@transaction.non_atomic_requests
 @require_POST
 def stripe_webhook(request):
     payload = request.body
@@ -249,6 +317,9 @@ def stripe_webhook(request):
         logger.warning("Stripe error validating webhook: %s", exc)
         return HttpResponse(status=400)
 
+    # Logged before handling, so a failed or buggy handler can be replayed.
+    # If the log is unavailable the 500 makes Stripe redeliver later.
+    record_event(event)
     _dispatch_webhook(event)
     return HttpResponse(status=200)
 
@@ -256,125 +327,141 @@ def stripe_webhook(request):
 def _dispatch_webhook(event):
     event_type = event.get("type")
     data_object = event.get("data", {}).get("object", {})
+    created = event.get("created")
 
     if event_type in {
         "checkout.session.completed",
         "checkout.session.async_payment_succeeded",
     }:
-        _handle_checkout_session(data_object)
+        _handle_checkout_session(data_object, created)
     elif event_type == "customer.subscription.deleted":
-        _handle_subscription_deleted(data_object)
+        _handle_subscription_deleted(data_object, created)
     elif event_type == "customer.subscription.updated":
-        _handle_subscription_updated(data_object)
+        _handle_subscription_updated(data_object, created)
     elif event_type == "customer.subscription.paused":
-        _handle_subscription_paused(data_object)
+        _handle_subscription_paused(data_object, created)
     elif event_type == "customer.subscription.resumed":
-        _handle_subscription_resumed(data_object)
+        _handle_subscription_resumed(data_object, created)
     elif event_type == "charge.dispute.created":
-        _handle_subscription_dispute_created(data_object)
+        _handle_subscription_dispute_created(data_object, created)
     elif event_type == "invoice.upcoming":
         _handle_invoice_upcoming(data_object)
     else:
         logger.debug("Unhandled Stripe event: %s", event_type)
 
 
-def _handle_checkout_session(session: dict[str, Any]):
+def _handle_checkout_session(session: dict[str, Any], created: int | None = None):
     user_id = (session.get("metadata") or {}).get(SUBSCRIBER_METADATA_KEY)
     if not user_id:
         logger.warning("Checkout session %s missing user metadata", session.get("id"))
         return
 
     try:
-        with transaction.atomic():
-            user = User.objects.select_for_update().get(pk=user_id)
-            _link_user_to_customer(user, session.get("customer"))
-            _set_user_fields(user, has_membership=True, membership_paused=False)
+        user = User.objects.get(pk=user_id)
+        _link_user_to_customer(user, session.get("customer"))
+        _update_membership(user, created, has_membership=True, membership_paused=False)
+        properties = {
+            "checkout_session": session.get("id"),
+            "mode": session.get("mode"),
+        }
+        # Deferred so a rolled-back replay (replay_stripe_events --dry-run)
+        # reports nothing
+        transaction.on_commit(
+            lambda: analytics.capture(
+                user.pk, "checkout_completed", properties, essential=True
+            )
+        )
     except User.DoesNotExist:
         logger.exception("User %s not found for checkout session", user_id)
     except Exception:
         logger.exception("Error handling checkout session %s", session.get("id"))
 
 
-def _handle_subscription_deleted(subscription: dict[str, Any]):
+def _handle_subscription_deleted(
+    subscription: dict[str, Any], created: int | None = None
+):
     customer_id = subscription.get("customer")
     if not customer_id:
         logger.warning("Subscription %s missing customer", subscription.get("id"))
         return
 
-    with transaction.atomic():
-        user = _get_user_for_customer(customer_id)
-        if not user:
-            logger.warning("No user linked to subscription customer %s", customer_id)
-            return
-        _set_user_fields(user, has_membership=False, membership_paused=False)
+    user = _get_user_for_customer(customer_id)
+    if not user:
+        logger.warning("No user linked to subscription customer %s", customer_id)
+        return
+    _update_membership(user, created, has_membership=False, membership_paused=False)
 
 
-def _handle_subscription_updated(subscription: dict[str, Any]):
+def _handle_subscription_updated(
+    subscription: dict[str, Any], created: int | None = None
+):
     customer_id = subscription.get("customer")
     status = subscription.get("status")
     if not customer_id or not status:
         logger.warning("Subscription update missing customer or status")
         return
 
-    with transaction.atomic():
-        user = _get_user_for_customer(customer_id)
-        if not user:
-            logger.warning("No user linked to subscription customer %s", customer_id)
-            return
-
-        if status in {"trialing", "active"}:
-            _set_user_fields(user, has_membership=True, membership_paused=False)
-        elif status in {"past_due", "unpaid"}:
-            _set_user_fields(user, has_membership=True, membership_paused=True)
-        elif status in {"canceled", "incomplete_expired"}:
-            _set_user_fields(user, has_membership=False, membership_paused=False)
-        elif status == "paused":
-            _set_user_fields(user, has_membership=True, membership_paused=True)
-        else:
-            logger.info("Unhandled subscription status %s for user %s", status, user.pk)
-
+    user = _get_user_for_customer(customer_id)
+    if not user:
+        logger.warning("No user linked to subscription customer %s", customer_id)
+        return
 
-def _handle_subscription_paused(subscription: dict[str, Any]):
+    flags = membership_flags(status)
+    if flags is None:
+        logger.info("Unhandled subscription status %s for user %s", status, user.pk)
+        return
+    has_membership, membership_paused = flags
+    _update_membership(
+        user,
+        created,
+        has_membership=has_membership,
+        membership_paused=membership_paused,
+    )
+
+
+def _handle_subscription_paused(
+    subscription: dict[str, Any], created: int | None = None
+):
     customer_id = subscription.get("customer")
     if not customer_id:
         return
 
-    with transaction.atomic():
-        user = _get_user_for_customer(customer_id)
-        if user:
-            _set_user_fields(user, membership_paused=True)
+    user = _get_user_for_customer(customer_id)
+    if user:
+        _update_membership(user, created, membership_paused=True)
 
 
-def _handle_subscription_resumed(subscription: dict[str, Any]):
+def _handle_subscription_resumed(
+    subscription: dict[str, Any], created: int | None = None
+):
     customer_id = subscription.get("customer")
     if not customer_id:
         return
 
-    with transaction.atomic():
-        user = _get_user_for_customer(customer_id)
-        if user:
-            _set_user_fields(user, membership_paused=False)
+    user = _get_user_for_customer(customer_id)
+    if user:
+        _update_membership(user, created, membership_paused=False)
 
 
-def _handle_subscription_dispute_created(dispute: dict[str, Any]):
+def _handle_subscription_dispute_created(
+    dispute: dict[str, Any], created: int | None = None
+):
     charge_id = dispute.get("charge")
     customer_id = dispute.get("customer") or _resolve_customer_from_charge(charge_id)
     if not customer_id:
         logger.warning("Dispute %s missing customer", dispute.get("id"))
         return
 
-    with transaction.atomic():
-        user = _get_user_for_customer(customer_id)
-        if user:
-            _set_user_fields(user, membership_paused=True)
-            amount = (dispute.get("amount") or 0) / 100
-            logger.warning(
-                "Membership paused for user %s due to dispute on charge %s "
-                "(amount %.2f)",
-                user.pk,
-                charge_id,
-                amount,
-            )
+    user = _get_user_for_customer(customer_id)
+    if user:
+        _update_membership(user, created, membership_paused=True)
+        amount = (dispute.get("amount") or 0) / 100
+        logger.warning(
+            "Membership paused for user %s due to dispute on charge %s (amount %.2f)",
+            user.pk,
+            charge_id,
+            amount,
+        )
 
 
 def _handle_invoice_upcoming(invoice: dict[str, Any]):
@@ -382,9 +469,8 @@ def _handle_invoice_upcoming(invoice: dict[str, Any]):
     if not customer_id:
         return
 
-    with transaction.atomic():
-        user = _get_user_for_customer(customer_id)
-        if user:
-            logger.info("Upcoming invoice for user %s", user.pk)
-        else:
-            logger.info("Upcoming invoice for customer %s", customer_id)
+    user = _get_user_for_customer(customer_id)
+    if user:
+        logger.info("Upcoming invoice for user %s", user.pk)
+    else:
+        logger.info("Upcoming invoice for customer %s", customer_id)
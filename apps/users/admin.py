@@ -6,12 +6,16 @@ from allauth.socialaccount.models import SocialToken
 from django import forms
 from django.conf import settings
 from django.contrib import admin
+from django.contrib import messages
 from django.contrib.auth import admin as auth_admin
 from django.contrib.auth.models import Group
 from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
 from unfold.admin import ModelAdmin
 
+from apps.core.admin import LargeTableAdminMixin
+from apps.payments.tasks import reconcile_customers
+
 from .forms import UserAdminChangeForm
 from .forms import UserAdminCreationForm
 from .models import User
@@ -109,7 +113,7 @@ class SocialTokenAdmin(socialaccount_admin.SocialTokenAdmin, ModelAdmin):
 
 
 @admin.register(User)
-class UserAdmin(auth_admin.UserAdmin, ModelAdmin):
+class UserAdmin(LargeTableAdminMixin, auth_admin.UserAdmin, ModelAdmin):
     form = UserAdminChangeForm
     add_form = UserAdminCreationForm
     fieldsets = (
@@ -139,8 +143,29 @@ class UserAdmin(auth_admin.UserAdmin, ModelAdmin):
         "has_membership",
         "membership_paused",
     ]
-    search_fields = ["name"]
+    list_filter = ("has_membership", "is_staff", "is_superuser", "is_active", "groups")
+    search_fields = ["email", "name"]
     readonly_fields = ("stripe_customer_id", "stripe_dashboard_link")
+    actions = ["reconcile_membership"]
+
+    @admin.action(description=_("Reconcile membership with Stripe"))
+    def reconcile_membership(self, request, queryset):
+        """Queue a Stripe re-sync of the selected users' membership flags."""
+        customer_ids = list(
+            queryset.exclude(stripe_customer_id="")
+            .order_by()
+            .values_list("stripe_customer_id", flat=True)
+            .distinct()
+        )
+        shard_size = settings.STRIPE_RECONCILE_SHARD_SIZE
+        for start in range(0, len(customer_ids), shard_size):
+            reconcile_customers.delay(customer_ids[start : start + shard_size])
+        self.message_user(
+            request,
+            _("Queued membership reconcile for %(count)d Stripe customers.")
+            % {"count": len(customer_ids)},
+            messages.SUCCESS,
+        )
 
     def stripe_customer(self, obj):
         """Display stored Stripe customer ID."""
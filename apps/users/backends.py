@@ -0,0 +1,16 @@
+from allauth.account.auth_backends import AuthenticationBackend
+
+from . import cache
+
+
+class CachedAuthenticationBackend(AuthenticationBackend):
+    """
+    allauth's backend, loading session users through ``apps.users.cache``.
+
+    Being an allauth backend, it is the one allauth records in the session
+    on login, so ``AuthenticationMiddleware`` goes through ``get_user`` here.
+    """
+
+    def get_user(self, user_id):
+        user = cache.get_user(user_id)
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,138 @@
+"""
+Two-tier cache of the users behind session-authenticated requests.
+
+``get_user`` serves ``request.user`` for ``CachedAuthenticationBackend``
+without the ``users_user`` query on every request. A cached user also
+carries its primary ``EmailAddress`` and its permissions, so the account
+page and ``has_perm`` checks don't query either.
+
+The tiers are:
+
+- local: a small per-process LRU of pickled users, trusted for
+  ``USER_CACHE_LOCAL_TIMEOUT`` seconds. It saves the cache round trip on a
+  burst of requests from one user.
+- shared: the default cache (Redis in production) for ``USER_CACHE_TIMEOUT``
+  seconds.
+
+``forget_user`` deletes both tiers in this process, now and again once the
+transaction commits. It runs when the user is saved (so on password changes,
+and therefore session auth hash changes), when the primary email,
+permissions or groups change, and on membership updates. Other processes
+may keep serving their local copy for ``USER_CACHE_LOCAL_TIMEOUT`` seconds.
+Writes that bypass ``save()``, such as ``QuerySet.update()``, must call
+``forget_user`` themselves.
+"""
+
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from allauth.account.models import EmailAddress
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import transaction
+
+from apps.core import metrics
+from apps.core.routers import use_primary_database
+
+USER_KEY = "users:user:{user_id}"
+
+# Set on cached users; see ``primary_email``
+PRIMARY_EMAIL_ATTR = "cached_primary_email"
+
+_lock = threading.Lock()
+_local: "OrderedDict[int, tuple[float, bytes]]" = OrderedDict()
+
+
+def get_user(user_id: int):
+    """The user with ``user_id``, from the cache when possible, or None."""
+    data = _get_local(user_id)
+    if data is not None:
+        metrics.incr("user_cache_total", tier="local")
+    else:
+        key = USER_KEY.format(user_id=user_id)
+        data = cache.get(key)
+        if data is not None:
+            metrics.incr("user_cache_total", tier="shared")
+        else:
+            metrics.incr("user_cache_total", tier="miss")
+            user = load_user(user_id)
+            if user is None:
+                return None
+            data = pickle.dumps(user)
+            cache.set(key, data, timeout=settings.USER_CACHE_TIMEOUT)
+        _set_local(user_id, data)
+    # A fresh instance per request, so changes to one never leak into another
+    return pickle.loads(data)  # noqa: S301
+
+
+# Cached for minutes, so never filled from a lagging replica: a stale password
+# hash would keep revoked sessions alive
+@use_primary_database()
+def load_user(user_id: int):
+    """Load the user with what is cached alongside it, or None."""
+    user = get_user_model()._default_manager.filter(pk=user_id).first()  # noqa: SLF001
+    if user is None:
+        return None
+    setattr(
+        user,
+        PRIMARY_EMAIL_ATTR,
+        EmailAddress.objects.filter(user=user, primary=True).first(),
+    )
+    # Fills the ``_perm_cache`` attributes ModelBackend checks before querying
+    ModelBackend().get_all_permissions(user)
+    return user
+
+
+def primary_email(user) -> EmailAddress | None:
+    """The user's primary email address, without a query for cached users."""
+    try:
+        return vars(user)[PRIMARY_EMAIL_ATTR]
+    except KeyError:
+        return EmailAddress.objects.filter(user=user, primary=True).first()
+
+
+def forget_user(user_id: int) -> None:
+    """Drop the cached user, now and once the current transaction commits."""
+    _forget(user_id)
+    # Another request may cache the old row before this transaction commits
+    transaction.on_commit(lambda: _forget(user_id))
+
+
+def reset() -> None:
+    """Empty this process's local tier."""
+    with _lock:
+        _local.clear()
+
+
+def _forget(user_id: int) -> None:
+    with _lock:
+        _local.pop(user_id, None)
+    cache.delete(USER_KEY.format(user_id=user_id))
+
+
+def _get_local(user_id: int) -> bytes | None:
+    with _lock:
+        entry = _local.get(user_id)
+        if entry is None:
+            return None
+        expires, data = entry
+        if expires <= time.monotonic():
+            del _local[user_id]
+            return None
+        _local.move_to_end(user_id)
+        return data
+
+
+def _set_local(user_id: int, data: bytes) -> None:
+    timeout = settings.USER_CACHE_LOCAL_TIMEOUT
+    if timeout <= 0:
+        return
+    with _lock:
+        _local[user_id] = (time.monotonic() + timeout, data)
+        _local.move_to_end(user_id)
+        while len(_local) > settings.USER_CACHE_LOCAL_SIZE:
+            _local.popitem(last=False)
@@ -0,0 +1,117 @@
+"""
+Argon2 password hashing on a bounded, per-process thread pool.
+
+Argon2 is slow and memory-hungry on purpose (``ARGON2_MEMORY_COST`` KiB per
+hash). ``BoundedArgon2PasswordHasher`` runs every hash, and so every login,
+signup and password change, on at most ``PASSWORD_HASHING_WORKERS`` threads.
+At most ``PASSWORD_HASHING_QUEUE`` more hashes may wait for a thread. When
+the pool is that busy, or a hash waited ``PASSWORD_HASHING_TIMEOUT``
+seconds, ``HashingBusy`` is raised and ``HashingBusyMiddleware`` answers
+503. A login burst thus gets fast rejections instead of piling up on every
+worker thread and in memory.
+
+The Argon2 costs come from settings; ``manage.py calibrate_password_hasher``
+measures them on the deployment hardware. Hashes made with other costs are
+upgraded on the next successful login.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher
+
+from apps.core import metrics
+
+_lock = threading.Lock()
+_executor: ThreadPoolExecutor | None = None
+_slots: threading.BoundedSemaphore | None = None
+_worker = threading.local()
+
+
+class HashingBusy(Exception):  # noqa: N818
+    """Too many password hashes are running or waiting in this process."""
+
+
+def run(fn, *args):
+    """Call ``fn(*args)`` on the hashing pool and return its result."""
+    if getattr(_worker, "active", False):
+        # Already on a pool thread, e.g. encode() from within verify()
+        return fn(*args)
+    executor, slots = _pool()
+    if not slots.acquire(blocking=False):
+        metrics.incr("password_hashing_rejected_total", reason="full")
+        raise HashingBusy
+    started = time.perf_counter()
+    try:
+        future = executor.submit(_call, fn, args)
+    except BaseException:
+        slots.release()
+        raise
+    # The slot is held until the hash is done, even if the caller gave up
+    future.add_done_callback(lambda _: slots.release())
+    try:
+        return future.result(timeout=settings.PASSWORD_HASHING_TIMEOUT)
+    except TimeoutError:
+        metrics.incr("password_hashing_rejected_total", reason="timeout")
+        raise HashingBusy from None
+    finally:
+        metrics.observe("password_hashing_seconds", time.perf_counter() - started)
+
+
+def reset() -> None:
+    """Drop this process's pool; the next hash starts a new one."""
+    global _executor, _slots
+    with _lock:
+        executor, _executor, _slots = _executor, None, None
+    if executor is not None:
+        executor.shutdown(wait=False)
+
+
+def _pool() -> tuple[ThreadPoolExecutor, threading.BoundedSemaphore]:
+    global _executor, _slots  # noqa: PLW0603
+    with _lock:
+        if _executor is None or _slots is None:
+            workers = settings.PASSWORD_HASHING_WORKERS
+            _executor = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="password-hashing"
+            )
+            _slots = threading.BoundedSemaphore(
+                workers + settings.PASSWORD_HASHING_QUEUE
+            )
+        return _executor, _slots
+
+
+def _call(fn, args):
+    _worker.active = True
+    try:
+        return fn(*args)
+    finally:
+        _worker.active = False
+
+
+def _reset_after_fork() -> None:
+    # The pool's threads stay behind in the parent
+    global _executor, _slots, _lock  # noqa: PLW0603
+    _executor = _slots = None
+    _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class BoundedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Django's Argon2 hasher with settings-driven costs, run through ``run``."""
+
+    def __init__(self):
+        self.time_cost = settings.ARGON2_TIME_COST
+        self.memory_cost = settings.ARGON2_MEMORY_COST
+        self.parallelism = settings.ARGON2_PARALLELISM
+
+    def encode(self, password, salt):
+        return run(super().encode, password, salt)
+
+    def verify(self, password, encoded):
+        return run(super().verify, password, encoded)
@@ -0,0 +1,263 @@
+import contextlib
+import csv
+import json
+import sys
+import time
+from itertools import islice
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from allauth.account.models import EmailAddress
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db import transaction
+from django.db.models.functions import Lower
+
+from apps.payments.models import StripeCustomer
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+User = get_user_model()
+
+FIELDS = ("email", "name", "password", "stripe_customer_id", "email_verified")
+TRUE_VALUES = frozenset({"1", "true", "yes", "y", "t"})
+
+
+class InvalidRow(ValueError):  # noqa: N818
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Import users from CSV or NDJSON in batches, with their primary email "
+        "addresses and Stripe customers. Columns: "
+        f"{', '.join(FIELDS)} (only email is required). Passwords must already "
+        "be hashed in Django's format; users without one get an unusable "
+        "password. Nothing is hashed, and no model signals are sent. Existing "
+        "emails, compared case-insensitively, are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help='Input file, or "-" for stdin')
+        parser.add_argument(
+            "--format",
+            choices=["csv", "ndjson"],
+            help="Input format; guessed from the file extension by default",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=1000, help="Users inserted per batch"
+        )
+        parser.add_argument(
+            "--copy",
+            action="store_true",
+            help="Load each batch with COPY instead of a multi-row INSERT",
+        )
+
+    def handle(self, *args, **options):
+        fmt = options["format"] or self.guess_format(options["path"])
+        insert = self.insert_copy if options["copy"] else self.insert_bulk_create
+        self.counts = {"read": 0, "created": 0, "existing": 0, "invalid": 0}
+        started = time.perf_counter()
+
+        with self.open(options["path"]) as stream:
+            rows = self.parse(stream, fmt)
+            while batch := list(islice(rows, options["batch_size"])):
+                self.import_batch(batch, insert)
+                if options["verbosity"] >= 2:  # noqa: PLR2004
+                    self.report(started)
+
+        self.report(started)
+
+    @staticmethod
+    def guess_format(path: str) -> str:
+        suffix = Path(path).suffix.lower()
+        if suffix == ".csv":
+            return "csv"
+        if suffix in {".ndjson", ".jsonl"}:
+            return "ndjson"
+        msg = f"Can't tell the format of {path!r}; pass --format"
+        raise CommandError(msg)
+
+    @staticmethod
+    def open(path: str):
+        if path == "-":
+            return contextlib.nullcontext(sys.stdin)
+        try:
+            return Path(path).open(newline="", encoding="utf-8")
+        except OSError as exc:
+            raise CommandError(str(exc)) from exc
+
+    def parse(self, stream, fmt: str):
+        """Yield each valid input row, cleaned; count and report the rest."""
+        records: Iterable[dict]
+        if fmt == "csv":
+            records = csv.DictReader(stream)
+        else:
+            records = (json.loads(line) for line in stream if line.strip())
+        for number, record in enumerate(records, start=1):
+            self.counts["read"] += 1
+            try:
+                yield self.clean(record)
+            except InvalidRow as exc:
+                self.counts["invalid"] += 1
+                self.stderr.write(f"Row {number}: {exc}")
+
+    @staticmethod
+    def clean(record: dict) -> dict:
+        email = str(record.get("email") or "").strip().lower()
+        if "@" not in email:
+            msg = f"invalid email {email!r}"
+            raise InvalidRow(msg)
+        password = str(record.get("password") or "")
+        if password:
+            try:
+                identify_hasher(password)
+            except ValueError:
+                msg = "password is not a hash in Django's format"
+                raise InvalidRow(msg) from None
+        else:
+            # Unusable; the user signs in through a reset or a social account
+            password = make_password(None)
+        verified = record.get("email_verified")
+        return {
+            "email": email,
+            "name": str(record.get("name") or ""),
+            "password": password,
+            "stripe_customer_id": str(record.get("stripe_customer_id") or ""),
+            "verified": verified is True or str(verified).lower() in TRUE_VALUES,
+        }
+
+    def import_batch(self, batch: list[dict], insert) -> None:
+        by_email: dict[str, dict] = {}
+        for row in batch:
+            # Within the input the first row for an email wins
+            by_email.setdefault(row["email"], row)
+        # Emails are matched case-insensitively, as allauth does on login,
+        # against both the users and the addresses of other users
+        emails = list(by_email)
+        existing = set(
+            User.objects.alias(email_lower=Lower("email"))
+            .filter(email_lower__in=emails)
+            .values_list(Lower("email"), flat=True)
+        )
+        existing.update(
+            EmailAddress.objects.alias(email_lower=Lower("email"))
+            .filter(email_lower__in=emails)
+            .values_list(Lower("email"), flat=True)
+        )
+        new_rows = [row for email, row in by_email.items() if email not in existing]
+
+        with transaction.atomic():
+            ids = insert(
+                [
+                    User(
+                        email=row["email"],
+                        name=row["name"],
+                        password=row["password"],
+                        stripe_customer_id=row["stripe_customer_id"],
+                    )
+                    for row in new_rows
+                ]
+            )
+            created = [row for row in new_rows if row["email"] in ids]
+            EmailAddress.objects.bulk_create(
+                [
+                    EmailAddress(
+                        user_id=ids[row["email"]],
+                        email=row["email"],
+                        verified=row["verified"],
+                        primary=True,
+                    )
+                    for row in created
+                ],
+                ignore_conflicts=True,
+            )
+            # An address verified by another user since the existence check
+            # was skipped; without it nobody could sign in to the new user
+            with_address = set(
+                EmailAddress.objects.filter(
+                    user_id__in=[ids[row["email"]] for row in created]
+                ).values_list("user_id", flat=True)
+            )
+            orphans = [row for row in created if ids[row["email"]] not in with_address]
+            if orphans:
+                User.objects.filter(
+                    pk__in=[ids[row["email"]] for row in orphans]
+                ).delete()
+                created = [row for row in created if row not in orphans]
+            StripeCustomer.objects.bulk_create(
+                [
+                    StripeCustomer(
+                        customer_id=row["stripe_customer_id"],
+                        user_id=ids[row["email"]],
+                    )
+                    for row in created
+                    if row["stripe_customer_id"]
+                ],
+                ignore_conflicts=True,
+            )
+
+        self.counts["created"] += len(created)
+        self.counts["existing"] += len(batch) - len(created)
+
+    @staticmethod
+    def insert_bulk_create(users: list) -> dict[str, int]:
+        """Insert with one multi-row INSERT; returns ``{email: id}``."""
+        return {user.email: user.pk for user in User.objects.bulk_create(users)}
+
+    @staticmethod
+    def insert_copy(users: list) -> dict[str, int]:
+        """
+        COPY into a temporary table, then insert what doesn't exist yet.
+
+        Emails taken since the existence check are skipped instead of failing
+        the batch. Returns ``{email: id}`` of the inserted users.
+        """
+        table = User._meta.db_table  # noqa: SLF001
+        fields = [
+            field
+            for field in User._meta.concrete_fields  # noqa: SLF001
+            if not field.primary_key
+        ]
+        quote = connection.ops.quote_name
+        columns = ", ".join(quote(field.attname) for field in fields)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TEMPORARY TABLE user_import ON COMMIT DROP AS "  # noqa: S608
+                f"SELECT {columns} FROM {quote(table)} WITH NO DATA"
+            )
+            with cursor.copy(f"COPY user_import ({columns}) FROM STDIN") as copy:
+                for user in users:
+                    copy.write_row(
+                        [
+                            field.get_db_prep_save(
+                                field.pre_save(user, add=True), connection
+                            )
+                            for field in fields
+                        ]
+                    )
+            cursor.execute(
+                f"INSERT INTO {quote(table)} ({columns}) "  # noqa: S608
+                f"SELECT {columns} FROM user_import "
+                f"ON CONFLICT ({quote('email')}) DO NOTHING "
+                f"RETURNING {quote('email')}, {quote('id')}"
+            )
+            ids = dict(cursor.fetchall())
+            # ON COMMIT DROP alone would leave it for the next batch when
+            # the caller's transaction spans several
+            cursor.execute("DROP TABLE user_import")
+        return ids
+
+    def report(self, started: float) -> None:
+        elapsed = time.perf_counter() - started
+        counts = self.counts
+        self.stdout.write(
+            f"{counts['created']} created, {counts['existing']} existing or "
+            f"duplicate, {counts['invalid']} invalid of {counts['read']} rows "
+            f"in {elapsed:.1f}s ({counts['read'] / max(elapsed, 1e-9):.0f} rows/s)"
+        )
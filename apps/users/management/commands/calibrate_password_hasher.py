@@ -0,0 +1,125 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import argon2
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+# OWASP's minimum, then steps up to Django's default (KiB)
+MEMORY_COSTS = [19456, 47104, 65536, 102400]
+PASSWORD = "calibration password"  # noqa: S105
+
+
+class Command(BaseCommand):
+    help = (
+        "Time Argon2 hashes on this machine and recommend the time and memory "
+        "costs that stay within a target hash time, plus the login throughput "
+        "the hashing pool would then allow per process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--target-ms",
+            type=float,
+            default=250.0,
+            help="Longest acceptable time for one hash",
+        )
+        parser.add_argument(
+            "--memory-cost",
+            type=int,
+            nargs="+",
+            default=MEMORY_COSTS,
+            help="Memory costs to try, in KiB",
+        )
+        parser.add_argument(
+            "--parallelism",
+            type=int,
+            default=settings.ARGON2_PARALLELISM,
+            help="Argon2 lanes per hash",
+        )
+        parser.add_argument(
+            "--max-time-cost", type=int, default=10, help="Largest time cost to try"
+        )
+        parser.add_argument(
+            "--samples", type=int, default=3, help="Hashes timed per combination"
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.PASSWORD_HASHING_WORKERS,
+            help="Concurrent hashes for the throughput check",
+        )
+
+    def handle(self, *args, **options):
+        target = options["target_ms"] / 1000
+        parallelism = options["parallelism"]
+        self.samples = options["samples"]
+
+        candidates = []
+        self.stdout.write(f"{'memory KiB':>12} {'time cost':>10} {'ms':>8}")
+        for memory_cost in sorted(options["memory_cost"]):
+            best = None
+            for time_cost in range(1, options["max_time_cost"] + 1):
+                seconds = self.measure(time_cost, memory_cost, parallelism)
+                self.stdout.write(
+                    f"{memory_cost:>12} {time_cost:>10} {seconds * 1000:>8.1f}"
+                )
+                if seconds > target:
+                    break
+                best = (time_cost, memory_cost, seconds)
+            if best is None:
+                # More memory only gets slower
+                break
+            candidates.append(best)
+
+        if not candidates:
+            msg = f"No combination hashes within {options['target_ms']:g} ms"
+            raise CommandError(msg)
+        # Most work an attacker must repeat per guess; ties go to more memory
+        time_cost, memory_cost, seconds = max(
+            candidates, key=lambda c: (c[0] * c[1], c[1])
+        )
+        throughput = self.throughput(
+            time_cost, memory_cost, parallelism, options["workers"]
+        )
+
+        self.stdout.write("")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Recommended for {options['target_ms']:g} ms "
+                f"({seconds * 1000:.1f} ms measured):"
+            )
+        )
+        self.stdout.write(f"DJANGO_ARGON2_TIME_COST={time_cost}")
+        self.stdout.write(f"DJANGO_ARGON2_MEMORY_COST={memory_cost}")
+        self.stdout.write(f"DJANGO_ARGON2_PARALLELISM={parallelism}")
+        self.stdout.write(
+            f"With {options['workers']} hashing workers: {throughput:.1f} "
+            f"hashes/s per process, up to "
+            f"{options['workers'] * memory_cost / 1024:.0f} MiB while hashing"
+        )
+
+    def measure(self, time_cost, memory_cost, parallelism) -> float:
+        """Median seconds for one hash."""
+        hasher = argon2.PasswordHasher(
+            time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism
+        )
+        timings = []
+        for _ in range(self.samples):
+            started = time.perf_counter()
+            hasher.hash(PASSWORD)
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings)
+
+    def throughput(self, time_cost, memory_cost, parallelism, workers) -> float:
+        """Hashes per second with ``workers`` running at once."""
+        hasher = argon2.PasswordHasher(
+            time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism
+        )
+        count = workers * self.samples
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(hasher.hash, [PASSWORD] * count))
+        return count / (time.perf_counter() - started)
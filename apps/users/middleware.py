@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.http import JsonResponse
+
+from .hashers import HashingBusy
+
+
+class HashingBusyMiddleware:
+    """Answer 503 with ``Retry-After`` when the password hashing pool is full."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, HashingBusy):
+            return None
+        response = JsonResponse(
+            {"status": 503, "errors": [{"message": "Too many logins, try again."}]},
+            status=503,
+        )
+        response["Retry-After"] = str(settings.PASSWORD_HASHING_RETRY_AFTER)
+        return response
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_large_table_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='membership_event_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Creation time of the last Stripe event applied to the flags.', null=True),
+        ),
+    ]
@@ -1,9 +1,15 @@
 from typing import ClassVar
 
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.indexes import OpClass
 from django.db.models import BooleanField
 from django.db.models import CharField
+from django.db.models import DateTimeField
 from django.db.models import EmailField
+from django.db.models import Index
+from django.db.models import Q
+from django.db.models.functions import Upper
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 
@@ -31,12 +37,38 @@ class User(AbstractUser):
     username = None  # type: ignore[assignment]
     has_membership = BooleanField(default=False)
     membership_paused = BooleanField(default=False)
+    membership_event_at = DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Creation time of the last Stripe event applied to the flags.",
+    )
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
 
     objects: ClassVar[UserManager] = UserManager()
 
+    class Meta:
+        verbose_name = _("user")
+        verbose_name_plural = _("users")
+        indexes = [
+            # Admin search uses icontains, which Django renders as UPPER(col) LIKE
+            GinIndex(
+                OpClass(Upper("email"), name="gin_trgm_ops"),
+                name="users_user_email_trgm",
+            ),
+            GinIndex(
+                OpClass(Upper("name"), name="gin_trgm_ops"),
+                name="users_user_name_trgm",
+            ),
+            Index(
+                fields=["id"],
+                condition=Q(has_membership=True),
+                name="users_user_members_idx",
+            ),
+        ]
+
     def get_absolute_url(self) -> str:
         """Get URL for user's detail view.
 
@@ -0,0 +1,83 @@
+from allauth.account.models import EmailAddress
+from allauth.account.signals import user_signed_up
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import m2m_changed
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from apps.core import analytics
+
+from .cache import forget_user
+from .tokens import request_access_token
+from .tokens import revoke_token
+from .tokens import revoke_user_tokens
+
+User = get_user_model()
+
+
+@receiver(user_signed_up)
+def capture_signup(sender, request, user, **kwargs):
+    sociallogin = kwargs.get("sociallogin")
+    method = sociallogin.account.provider if sociallogin else "email"
+    analytics.capture(user.pk, "user_signed_up", {"method": method}, essential=True)
+
+
+@receiver(user_logged_out)
+def revoke_tokens_on_logout(sender, request, user, **kwargs):
+    # The refresh tokens went with the session; this stops the access tokens
+    if user is None:
+        return
+    payload = request_access_token(request) if request is not None else None
+    if payload is not None and payload["sub"] == str(user.pk):
+        # One device of an app client; the others keep their sessions
+        revoke_token(payload)
+    else:
+        revoke_user_tokens(user.pk)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_saved_user(sender, instance, **kwargs):
+    # Covers password changes, which also change the session auth hash
+    forget_user(instance.pk)
+
+
+@receiver(post_save, sender=EmailAddress)
+@receiver(post_delete, sender=EmailAddress)
+def forget_email_owner(sender, instance, **kwargs):
+    forget_user(instance.user_id)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def forget_user_permissions(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith("post_"):
+            forget_user(instance.pk)
+    elif action == "pre_clear":
+        # group.user_set.clear(): no pk_set, and no members left by post_clear
+        for user_id in instance.user_set.values_list("pk", flat=True):
+            forget_user(user_id)
+    elif action in {"post_add", "post_remove"}:
+        for user_id in pk_set:
+            forget_user(user_id)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def forget_group_members(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        groups = [instance] if action.startswith("post_") else []
+    elif action == "pre_clear":
+        groups = list(instance.group_set.all())
+    elif action in {"post_add", "post_remove"}:
+        groups = list(Group.objects.filter(pk__in=pk_set))
+    else:
+        return
+    if not groups:
+        return
+    users = User.objects.filter(groups__in=groups).distinct()
+    for user_id in users.values_list("pk", flat=True):
+        forget_user(user_id)
@@ -0,0 +1,132 @@
+"""Tests for the bulk user import command."""
+
+import io
+import json
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+from allauth.account.models import EmailAddress
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.test import TestCase
+
+from apps.payments.models import StripeCustomer
+from apps.users.management.commands.bulk_import_users import Command
+
+User = get_user_model()
+
+CSV = """email,name,password,stripe_customer_id,email_verified
+Ada@Example.com,Ada,{hashed},cus_ada,true
+bob@example.com,Bob,,,false
+existing@example.com,Existing,,,true
+ada@example.com,Duplicate,,,true
+nobody,Invalid,,,true
+eve@example.com,Eve,plaintext,,true
+"""
+
+
+class BulkImportUsersTest(TestCase):
+    """Tests for importing users from CSV and NDJSON."""
+
+    def setUp(self):
+        User.objects.create_user(email="existing@example.com")
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def run_import(self, name, content, *args):
+        path = self.directory / name
+        path.write_text(content)
+        out, err = io.StringIO(), io.StringIO()
+        call_command(
+            "bulk_import_users", str(path), *args, batch_size=2, stdout=out, stderr=err
+        )
+        return out.getvalue(), err.getvalue()
+
+    def check_imported(self, out, err):
+        ada = User.objects.get(email="ada@example.com")
+        assert ada.name == "Ada"
+        assert ada.check_password("secret")
+        assert ada.stripe_customer_id == "cus_ada"
+        assert StripeCustomer.objects.get(customer_id="cus_ada").user_id == ada.pk
+        assert EmailAddress.objects.get(user=ada, primary=True).verified
+
+        bob = User.objects.get(email="bob@example.com")
+        assert not bob.has_usable_password()
+        assert not EmailAddress.objects.get(user=bob).verified
+
+        assert not User.objects.filter(email="eve@example.com").exists()
+        assert User.objects.get(email="existing@example.com").name == ""
+        assert "2 created, 2 existing or duplicate, 2 invalid of 6 rows" in out
+        assert "rows/s" in out
+        assert "Row 5: invalid email" in err
+        assert "Row 6: password is not a hash" in err
+
+    def test_csv_with_bulk_create(self):
+        """Test a CSV import through bulk_create."""
+        out, err = self.run_import(
+            "users.csv", CSV.format(hashed=make_password("secret"))
+        )
+
+        self.check_imported(out, err)
+
+    def test_csv_with_copy(self):
+        """Test the same import through COPY."""
+        out, err = self.run_import(
+            "users.csv", CSV.format(hashed=make_password("secret")), "--copy"
+        )
+
+        self.check_imported(out, err)
+
+    def test_ndjson(self):
+        """Test NDJSON input with JSON booleans."""
+        lines = [
+            {"email": "nd@example.com", "email_verified": True},
+            {"email": "json@example.com", "email_verified": False},
+        ]
+        content = "\n".join(json.dumps(line) for line in lines) + "\n\n"
+
+        out, _ = self.run_import("users.ndjson", content, "--copy")
+
+        assert "2 created" in out
+        assert EmailAddress.objects.get(email="nd@example.com").verified
+        assert not EmailAddress.objects.get(email="json@example.com").verified
+
+    def test_existing_emails_match_case_insensitively(self):
+        """Test that an existing mixed-case email isn't imported again."""
+        User.objects.create_user(email="Alice@Example.com")
+        other = User.objects.create_user(email="other@example.com")
+        EmailAddress.objects.create(
+            user=other, email="Carol@Example.com", verified=True, primary=False
+        )
+        content = "email\nalice@example.com\ncarol@example.com\n"
+
+        for args in ((), ("--copy",)):
+            with self.subTest(args=args):
+                out, _ = self.run_import("users.csv", content, *args)
+
+                assert "0 created, 2 existing or duplicate" in out
+                assert (
+                    User.objects.filter(email__iexact="alice@example.com").count() == 1
+                )
+
+    def test_address_taken_during_import_counts_as_existing(self):
+        """Test that a user whose address lost a race isn't left behind."""
+        insert = Command.insert_bulk_create
+
+        def racing_insert(users):
+            other = User.objects.create_user(email="other@example.com")
+            EmailAddress.objects.create(
+                user=other, email="carol@example.com", verified=True, primary=True
+            )
+            return insert(users)
+
+        with patch.object(Command, "insert_bulk_create", staticmethod(racing_insert)):
+            out, _ = self.run_import(
+                "users.csv", "email,email_verified\ncarol@example.com,true\n"
+            )
+
+        assert "0 created, 1 existing or duplicate" in out
+        assert not User.objects.filter(email="carol@example.com").exists()
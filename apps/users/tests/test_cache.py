@@ -0,0 +1,142 @@
+"""Tests for the cached session user loader."""
+
+from unittest.mock import patch
+
+from allauth.account.models import EmailAddress
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from apps.core import routers
+from apps.payments.membership import apply_membership_flags
+from apps.users import cache as user_cache
+
+User = get_user_model()
+
+
+class UserCacheTest(TestCase):
+    """Tests for serving request.user from the cache."""
+
+    def setUp(self):
+        cache.clear()
+        user_cache.reset()
+        self.addCleanup(user_cache.reset)
+        self.user = User.objects.create_user(
+            email="cached@example.com",
+            password="testpass123",  # noqa: S106
+            stripe_customer_id="cus_cached",
+        )
+        EmailAddress.objects.create(
+            user=self.user, email=self.user.email, verified=True, primary=True
+        )
+        self.client.force_login(self.user)
+
+    def user_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/user/")
+        assert response.status_code == 200  # noqa: PLR2004
+        return [
+            q["sql"]
+            for q in queries
+            if '"users_user"' in q["sql"] or '"account_emailaddress"' in q["sql"]
+        ]
+
+    def test_session_requests_skip_user_queries(self):
+        """Test that a warm cache serves request.user."""
+        self.user_queries()
+
+        assert self.user_queries() == []
+
+    def test_shared_tier_serves_other_processes(self):
+        """Test that an empty local tier falls back to the shared cache."""
+        self.user_queries()
+        user_cache.reset()
+
+        with self.assertNumQueries(0):
+            user = user_cache.get_user(self.user.pk)
+            email = user_cache.primary_email(user)
+
+        assert email is not None
+        assert email.verified
+        assert user.email == self.user.email
+
+    def test_permissions_are_cached(self):
+        """Test that has_perm needs no query for a cached user."""
+        group = Group.objects.create(name="editors")
+        group.permissions.add(Permission.objects.get(codename="change_user"))
+        self.user.groups.add(group)
+        user_cache.get_user(self.user.pk)
+
+        with self.assertNumQueries(0):
+            user = user_cache.get_user(self.user.pk)
+            assert user.has_perm("users.change_user")
+
+        group.permissions.clear()
+        assert not user_cache.get_user(self.user.pk).has_perm("users.change_user")
+
+    @patch("apps.core.routers.replica_is_fresh", return_value=True)
+    @patch("apps.core.routers.has_replica", return_value=True)
+    def test_cache_is_filled_from_primary(self, *mocks):
+        """Test that a miss during a replica-eligible request reads the primary."""
+        # No replica alias exists here, so a replica read would raise
+        with routers.replica_reads():
+            user = user_cache.get_user(self.user.pk)
+            email = user_cache.primary_email(user)
+
+        assert user.stripe_customer_id == "cus_cached"
+        assert email is not None
+        assert email.email == self.user.email
+
+    def test_save_invalidates(self):
+        """Test that saving the user, e.g. a password change, drops the cache."""
+        self.user_queries()
+
+        self.user.set_password("newpass456")
+        self.user.save()
+
+        # The session auth hash no longer matches: logged out
+        response = self.client.get("/api/user/")
+        assert response.status_code == 401  # noqa: PLR2004
+
+    def test_email_change_invalidates(self):
+        """Test that verifying another primary email refreshes the cache."""
+        user_cache.get_user(self.user.pk)
+        EmailAddress.objects.filter(user=self.user).delete()
+        EmailAddress.objects.create(
+            user=self.user, email="new@example.com", verified=False, primary=True
+        )
+
+        email = user_cache.primary_email(user_cache.get_user(self.user.pk))
+        assert email is not None
+        assert email.email == "new@example.com"
+
+    def test_membership_updates_invalidate(self):
+        """Test that bulk membership updates from Stripe drop the cache."""
+        assert not user_cache.get_user(self.user.pk).has_membership
+
+        apply_membership_flags({"cus_cached": (True, False)})
+
+        assert user_cache.get_user(self.user.pk).has_membership
+
+    @override_settings(USER_CACHE_LOCAL_TIMEOUT=0)
+    def test_local_tier_can_be_disabled(self):
+        """Test that a zero local timeout always asks the shared cache."""
+        user_cache.get_user(self.user.pk)
+        cache.clear()
+
+        with CaptureQueriesContext(connection) as queries:
+            user_cache.get_user(self.user.pk)
+
+        assert queries
+
+    def test_instances_are_not_shared(self):
+        """Test that each call returns its own copy of the user."""
+        first = user_cache.get_user(self.user.pk)
+        first.name = "changed"
+
+        assert user_cache.get_user(self.user.pk).name == ""
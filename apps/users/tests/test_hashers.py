@@ -0,0 +1,107 @@
+"""Tests for bounded Argon2 hashing and its calibration command."""
+
+import io
+import threading
+
+import pytest
+from allauth.account.models import EmailAddress
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.test import TestCase
+from django.test import override_settings
+
+from apps.users import hashers
+
+User = get_user_model()
+
+BOUNDED_HASHER = override_settings(
+    PASSWORD_HASHERS=["apps.users.hashers.BoundedArgon2PasswordHasher"],
+    ARGON2_TIME_COST=1,
+    ARGON2_MEMORY_COST=64,
+    ARGON2_PARALLELISM=1,
+    PASSWORD_HASHING_WORKERS=1,
+    PASSWORD_HASHING_QUEUE=0,
+)
+
+
+@BOUNDED_HASHER
+class BoundedHasherTest(TestCase):
+    """Tests for the hashing pool and the 503 it leads to."""
+
+    def setUp(self):
+        hashers.reset()
+        self.addCleanup(hashers.reset)
+
+    def occupy_pool(self):
+        """Hold the only hashing slot until the test ends."""
+        release = threading.Event()
+        started = threading.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+
+        thread = threading.Thread(target=hashers.run, args=(block,))
+        thread.start()
+        started.wait(5)
+        self.addCleanup(thread.join)
+        self.addCleanup(release.set)
+
+    def test_hashes_run_on_the_pool_with_configured_costs(self):
+        """Test that hashing works and uses the settings' costs."""
+        encoded = make_password("secret")
+
+        assert encoded.startswith("argon2$argon2id$v=19$m=64,t=1,p=1$")
+        assert check_password("secret", encoded)
+        assert not check_password("wrong", encoded)
+
+    def test_full_pool_raises_busy(self):
+        """Test that hashing is refused rather than queued past the limit."""
+        self.occupy_pool()
+
+        with pytest.raises(hashers.HashingBusy):
+            make_password("secret")
+
+    def test_login_answers_503_when_busy(self):
+        """Test the login endpoint's response while the pool is full."""
+        user = User.objects.create_user(
+            email="busy@example.com",
+            password="testpass123",  # noqa: S106
+        )
+        EmailAddress.objects.create(
+            user=user, email=user.email, verified=True, primary=True
+        )
+        self.occupy_pool()
+
+        response = self.client.post(
+            "/_allauth/app/v1/auth/login",
+            {"email": user.email, "password": "testpass123"},
+            content_type="application/json",
+        )
+
+        assert response.status_code == 503  # noqa: PLR2004
+        assert response["Retry-After"] == "2"
+
+
+class CalibratePasswordHasherTest(TestCase):
+    """Tests for the calibration command."""
+
+    def test_recommends_costs_within_target(self):
+        """Test that the command prints settings for the chosen costs."""
+        out = io.StringIO()
+        call_command(
+            "calibrate_password_hasher",
+            target_ms=10_000,
+            memory_cost=[64],
+            parallelism=1,
+            max_time_cost=2,
+            samples=1,
+            workers=1,
+            stdout=out,
+        )
+
+        output = out.getvalue()
+        assert "DJANGO_ARGON2_TIME_COST=2" in output
+        assert "DJANGO_ARGON2_MEMORY_COST=64" in output
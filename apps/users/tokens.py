@@ -0,0 +1,119 @@
+"""
+Signed access tokens for API clients.
+
+allauth's headless app client hands out a short-lived JWT access token and a
+refresh token on login (``HEADLESS_TOKEN_STRATEGY``). The access token
+carries the user id and membership flags, so ``authenticate_access_token``
+can accept it without touching the session or user tables.
+
+Revocation goes through the cache (Redis in production) with two kinds of
+entries, both expiring once the tokens they cover would have expired anyway:
+a single token by ``jti``, or every token of a user issued before a point in
+time. An app client logging out with its access token has that token denied,
+leaving the user's other devices signed in. Any other logout, and membership
+changes, deny every token of the user, so clients refresh and get current
+claims.
+"""
+
+import time
+from functools import cached_property
+
+from allauth.core.internal.httpkit import get_authorization_credential
+from allauth.headless import app_settings
+from allauth.headless.tokens.strategies.jwt import JWTTokenStrategy
+from allauth.headless.tokens.strategies.jwt.internal import decode_token
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+DENIED_JTI_KEY = "tokens:denied:{jti}"
+USER_NOT_BEFORE_KEY = "tokens:not-before:{user_id}"
+
+
+class AccessTokenStrategy(JWTTokenStrategy):
+    """allauth's JWT strategy, with membership claims in the access token."""
+
+    def get_claims(self, user):
+        return {
+            "membership": user.has_membership,
+            "membership_paused": user.membership_paused,
+            # "iat" has whole seconds, too coarse to tell a token refreshed
+            # right after a revocation from one issued just before it
+            "issued": time.time(),
+        }
+
+
+class TokenUser:
+    """
+    The user an access token was issued to, built from its claims alone.
+
+    Has the id and membership flags of the token; any other attribute loads
+    the user from the database, once. Query by ``user_id=user.pk`` rather
+    than passing it where a ``User`` instance is expected.
+    """
+
+    is_authenticated = True
+    is_anonymous = False
+    is_active = True
+
+    def __init__(self, payload: dict):
+        self.pk = self.id = int(payload["sub"])
+        self.has_membership = bool(payload.get("membership"))
+        self.membership_paused = bool(payload.get("membership_paused"))
+        self.token = payload
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.user, name)
+
+    def __repr__(self):
+        return f"<TokenUser {self.pk}>"
+
+    @cached_property
+    def user(self):
+        return get_user_model().objects.get(pk=self.pk)
+
+    def is_member(self):
+        return self.has_membership and not self.membership_paused
+
+
+def authenticate_access_token(token: str) -> TokenUser | None:
+    """The user of a valid, unrevoked access token, or None."""
+    payload = decode_token(token, "access")
+    if payload is None:
+        return None
+    denied_key = DENIED_JTI_KEY.format(jti=payload["jti"])
+    not_before_key = USER_NOT_BEFORE_KEY.format(user_id=payload["sub"])
+    # One round trip for both checks
+    entries = cache.get_many([denied_key, not_before_key])
+    if denied_key in entries:
+        return None
+    if payload.get("issued", payload["iat"]) < entries.get(not_before_key, 0):
+        return None
+    return TokenUser(payload)
+
+
+def request_access_token(request) -> dict | None:
+    """The payload of the valid access token the request presents, if any."""
+    token = get_authorization_credential(
+        request, app_settings.JWT_AUTHORIZATION_HEADER_SCHEME
+    )
+    if token is None:
+        return None
+    return decode_token(token, "access")
+
+
+def revoke_token(payload: dict) -> None:
+    """Deny one access token until it expires."""
+    ttl = int(payload["exp"] - time.time())
+    if ttl > 0:
+        cache.set(DENIED_JTI_KEY.format(jti=payload["jti"]), 1, timeout=ttl)
+
+
+def revoke_user_tokens(user_id: int) -> None:
+    """Deny every access token issued to the user until now."""
+    cache.set(
+        USER_NOT_BEFORE_KEY.format(user_id=user_id),
+        time.time(),
+        timeout=app_settings.JWT_ACCESS_TOKEN_EXPIRES_IN,
+    )
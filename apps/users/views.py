@@ -1,7 +1,8 @@
-from allauth.account.models import EmailAddress
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render
 
+from .cache import primary_email
+
 
 @login_required
 def account_settings(request):
@@ -9,11 +10,9 @@ def account_settings(request):
     user = request.user
 
     # Get user's primary email for verification status
-    primary_email = EmailAddress.objects.filter(user=user, primary=True).first()
-
     context = {
         "user": user,
-        "primary_email": primary_email,
+        "primary_email": primary_email(user),
     }
 
     return render(request, "users/account_settings.html", context)
@@ -21,7 +21,9 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.local")
 # This application object is used by any ASGI server configured to use this file.
 django_application = get_asgi_application()
 
-# Import websocket application here, so apps from django_application are loaded first
+# Import websocket and lifespan applications here, so apps from django_application
+# are loaded first
+from config.lifespan import lifespan_application  # noqa: E402
 from config.websocket import websocket_application  # noqa: E402
 
 
@@ -30,6 +32,8 @@ async def application(scope, receive, send):
         await django_application(scope, receive, send)
     elif scope["type"] == "websocket":
         await websocket_application(scope, receive, send)
+    elif scope["type"] == "lifespan":
+        await lifespan_application(scope, receive, send)
     else:
         msg = f"Unknown scope type {scope['type']}"
         raise NotImplementedError(msg)
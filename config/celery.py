@@ -1,7 +1,18 @@
+import cProfile
 import os
+import pstats
+import random
+import time
+from contextvars import Token
 
 from celery import Celery
+from celery.signals import before_task_publish
 from celery.signals import setup_logging
+from celery.signals import task_failure
+from celery.signals import task_postrun
+from celery.signals import task_prerun
+from celery.signals import task_retry
+from celery.signals import worker_process_shutdown
 
 # set the default Django settings module for the 'celery' program.
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.local")
@@ -24,5 +35,137 @@ def config_loggers(*args, **kwargs):
     dictConfig(settings.LOGGING)
 
 
+# Task telemetry
+# ------------------------------------------------------------------------------
+# Queue wait, run time, retries and failures are recorded per task and queue
+# through apps.core.metrics. A sample of executions can also be profiled.
+
+# task id -> (start time, profiler or None, log context token), for tasks
+# running in this process
+_running: dict[str, tuple[float, cProfile.Profile | None, Token]] = {}
+
+
+def _queue_name(request) -> str:
+    return (getattr(request, "delivery_info", None) or {}).get(
+        "routing_key"
+    ) or "unknown"
+
+
+@before_task_publish.connect
+def stamp_enqueued_at(headers=None, **kwargs):
+    if headers is not None:
+        headers.setdefault("enqueued_at", time.time())
+
+
+@task_prerun.connect
+def record_task_start(task_id=None, task=None, **kwargs):
+    from django.conf import settings  # noqa: PLC0415
+
+    from apps.core import log  # noqa: PLC0415
+    from apps.core import metrics  # noqa: PLC0415
+
+    enqueued_at = getattr(task.request, "enqueued_at", None)
+    if enqueued_at:
+        metrics.observe(
+            "celery_task_queue_wait_seconds",
+            max(time.time() - enqueued_at, 0),
+            task=task.name,
+            queue=_queue_name(task.request),
+        )
+
+    profiler = None
+    if random.random() < settings.TASK_PROFILE_SAMPLE_RATE:  # noqa: S311
+        profiler = cProfile.Profile()
+        profiler.enable()
+    token = log.set_context(request_id=task_id, route=task.name)
+    _running[task_id] = (time.perf_counter(), profiler, token)
+
+
+@task_postrun.connect
+def record_task_finish(task_id=None, task=None, state=None, **kwargs):
+    from apps.core import log  # noqa: PLC0415
+    from apps.core import metrics  # noqa: PLC0415
+
+    started = _running.pop(task_id, None)
+    if started is None:
+        return
+    started_at, profiler, token = started
+    log.reset_context(token)
+    runtime = time.perf_counter() - started_at
+    metrics.observe(
+        "celery_task_runtime_seconds",
+        runtime,
+        task=task.name,
+        queue=_queue_name(task.request),
+        state=state or "UNKNOWN",
+    )
+    if profiler is not None:
+        profiler.disable()
+        _store_profile(task.name, task_id, runtime, profiler)
+
+
+def _store_profile(task_name, task_id, runtime, profiler):
+    from django.conf import settings  # noqa: PLC0415
+
+    from apps.core import metrics  # noqa: PLC0415
+
+    profile = pstats.Stats(profiler).get_stats_profile()
+    top = sorted(
+        profile.func_profiles.items(),
+        key=lambda item: item[1].cumtime,
+        reverse=True,
+    )
+    metrics.store_profile(
+        task_name,
+        {
+            "task_id": task_id,
+            "runtime": runtime,
+            "recorded_at": time.time(),
+            "functions": [
+                {
+                    "function": f"{func.file_name}:{func.line_number}({name})",
+                    "calls": func.ncalls,
+                    "total_time": func.tottime,
+                    "cumulative_time": func.cumtime,
+                }
+                for name, func in top[: settings.TASK_PROFILE_TOP_N]
+            ],
+        },
+    )
+
+
+@task_retry.connect
+def record_task_retry(sender=None, request=None, **kwargs):
+    from apps.core import metrics  # noqa: PLC0415
+
+    metrics.incr(
+        "celery_task_retries_total", task=sender.name, queue=_queue_name(request)
+    )
+
+
+@task_failure.connect
+def record_task_failure(sender=None, exception=None, **kwargs):
+    from apps.core import metrics  # noqa: PLC0415
+
+    metrics.incr(
+        "celery_task_failures_total",
+        task=sender.name,
+        queue=_queue_name(sender.request),
+        exception=type(exception).__name__,
+    )
+
+
+@worker_process_shutdown.connect
+def flush_buffers(**kwargs):
+    from apps.core import analytics  # noqa: PLC0415
+    from apps.core import log  # noqa: PLC0415
+    from apps.core import metrics  # noqa: PLC0415
+
+    analytics.flush()
+    metrics.flush()
+    # Pool children exit without running atexit hooks
+    log.flush()
+
+
 # Load task modules from all registered Django app configs.
 app.autodiscover_tasks()
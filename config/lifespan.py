@@ -0,0 +1,119 @@
+"""
+ASGI lifespan handling: warm caches before traffic, drain on shutdown.
+
+Startup runs each step in ``STARTUP_STEPS`` and reports how long each took.
+A failed step fails startup, so a broken instance never joins the pool.
+"""
+
+import asyncio
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from config.websocket import active_connections
+from config.websocket import drain_websockets
+
+logger = logging.getLogger(__name__)
+
+
+def warm_database():
+    from django.db import connections  # noqa: PLC0415
+
+    for alias in connections:
+        connections[alias].ensure_connection()
+
+
+def warm_stripe():
+    from apps.payments.stripe_client import get_stripe  # noqa: PLC0415
+
+    get_stripe()
+
+
+def warm_api_schema():
+    from apps.api.api import api  # noqa: PLC0415
+
+    api.get_openapi_schema()
+
+
+def warm_templates():
+    from django.template.loader import get_template  # noqa: PLC0415
+
+    for name in settings.STARTUP_WARM_TEMPLATES:
+        get_template(name)
+
+
+STARTUP_STEPS = [
+    ("database", warm_database),
+    ("stripe", warm_stripe),
+    ("api_schema", warm_api_schema),
+    ("templates", warm_templates),
+]
+
+
+def flush_metrics():
+    from apps.core import metrics  # noqa: PLC0415
+
+    metrics.flush()
+
+
+def flush_analytics():
+    from apps.core import analytics  # noqa: PLC0415
+
+    analytics.flush()
+
+
+SHUTDOWN_STEPS = [
+    ("analytics", flush_analytics),
+    ("metrics", flush_metrics),
+]
+
+
+async def startup():
+    from apps.core import metrics  # noqa: PLC0415
+
+    started = time.perf_counter()
+    timings = {}
+    for name, step in STARTUP_STEPS:
+        step_started = time.perf_counter()
+        await sync_to_async(step, thread_sensitive=True)()
+        timings[name] = round(time.perf_counter() - step_started, 3)
+
+    total = time.perf_counter() - started
+    metrics.observe("asgi_startup_seconds", total)
+    logger.info("ASGI startup completed in %.3fs %s", total, timings)
+
+
+async def shutdown():
+    try:
+        async with asyncio.timeout(settings.ASGI_SHUTDOWN_TIMEOUT):
+            await drain_websockets()
+    except TimeoutError:
+        logger.warning(
+            "Shutting down with %s websocket(s) still open", len(active_connections)
+        )
+    for name, step in SHUTDOWN_STEPS:
+        try:
+            await sync_to_async(step, thread_sensitive=True)()
+        except Exception:
+            logger.exception("Shutdown step %s failed", name)
+
+
+async def lifespan_application(scope, receive, send):
+    while True:
+        message = await receive()
+
+        if message["type"] == "lifespan.startup":
+            try:
+                await startup()
+            except Exception as exc:
+                logger.exception("ASGI startup failed")
+                await send({"type": "lifespan.startup.failed", "message": str(exc)})
+                return
+            await send({"type": "lifespan.startup.complete"})
+
+        elif message["type"] == "lifespan.shutdown":
+            await shutdown()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
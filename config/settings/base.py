@@ -6,6 +6,8 @@ import sys
 from pathlib import Path
 
 import environ
+from celery.schedules import crontab
+from kombu import Queue
 
 BASE_DIR = Path(__file__).resolve(strict=True).parent.parent.parent
 APPS_DIR = BASE_DIR / "apps"
@@ -33,6 +35,39 @@ USE_TZ = True
 DATABASES = {"default": env.db("DATABASE_URL")}
 
 DATABASES["default"]["ATOMIC_REQUESTS"] = True
+# psycopg 3 connection pool, shared by all threads of a process. Replaces
+# persistent per-thread connections (CONN_MAX_AGE must then stay at 0).
+DATABASE_POOL = env.bool("DATABASE_POOL", default=False)
+if DATABASE_POOL:
+    DATABASES["default"].setdefault("OPTIONS", {})["pool"] = {
+        "min_size": env.int("DATABASE_POOL_MIN_SIZE", default=2),
+        "max_size": env.int("DATABASE_POOL_MAX_SIZE", default=10),
+        # Seconds a client waits for a free connection before an error
+        "timeout": env.float("DATABASE_POOL_TIMEOUT", default=10.0),
+        # Idle connections above min_size are closed after max_idle seconds,
+        # and every connection is replaced after max_lifetime seconds
+        "max_idle": env.float("DATABASE_POOL_MAX_IDLE", default=300.0),
+        "max_lifetime": env.float("DATABASE_POOL_MAX_LIFETIME", default=1800.0),
+    }
+    # Connections are checked before being handed out, so one dropped by the
+    # server or a proxy never reaches a view. With a pool, Django turns this
+    # into the pool's check=ConnectionPool.check_connection; passing "check"
+    # in the pool options as well would be a duplicate argument.
+    DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+# Optional streaming replica for safe reads, see apps.core.routers
+DATABASE_REPLICA_URL = env("DATABASE_REPLICA_URL", default="")
+if DATABASE_REPLICA_URL:
+    DATABASES["replica"] = env.db("DATABASE_REPLICA_URL")
+    DATABASES["replica"]["OPTIONS"] = {**DATABASES["default"].get("OPTIONS", {})}
+    DATABASES["replica"]["CONN_HEALTH_CHECKS"] = DATABASE_POOL
+    DATABASES["replica"]["TEST"] = {"MIRROR": "default"}
+DATABASE_ROUTERS = ["apps.core.routers.PrimaryReplicaRouter"]
+# Reads stay on the primary for this long after a client writes
+REPLICA_PIN_SECONDS = env.int("REPLICA_PIN_SECONDS", default=10)
+REPLICA_PIN_COOKIE_NAME = "db_primary"
+# Fall back to the primary while the replica is further behind than this
+REPLICA_MAX_LAG_SECONDS = env.float("REPLICA_MAX_LAG_SECONDS", default=5.0)
+REPLICA_LAG_CHECK_INTERVAL = env.float("REPLICA_LAG_CHECK_INTERVAL", default=5.0)
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 # URLS
@@ -49,6 +84,7 @@ INSTALLED_APPS = [
     "django.contrib.sites",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     # Django admin, unfold has to come before django.contrib.admin
     "unfold",
     "django.contrib.admin",
@@ -60,6 +96,7 @@ INSTALLED_APPS = [
     "allauth.headless",
     "django_celery_beat",
     # Local apps
+    "apps.core",
     "apps.users",
     "apps.payments",
     "apps.api",
@@ -68,6 +105,9 @@ INSTALLED_APPS = [
 # AUTHENTICATION
 # ------------------------------------------------------------------------------
 AUTHENTICATION_BACKENDS = [
+    # Recorded in the session on login; serves request.user from the cache
+    "apps.users.backends.CachedAuthenticationBackend",
+    # Still needed for sessions that recorded them before
     "django.contrib.auth.backends.ModelBackend",
     "allauth.account.auth_backends.AuthenticationBackend",
 ]
@@ -75,16 +115,34 @@ AUTH_USER_MODEL = "users.User"
 # TODO Change if the route behind auth that you want to redirect to after successful login is different
 LOGIN_REDIRECT_URL = "/app"
 LOGIN_URL = "account_login"
+# Session users, see apps.users.cache. The local tier can't be invalidated from
+# other processes, so it is kept short.
+USER_CACHE_TIMEOUT = env.int("DJANGO_USER_CACHE_TIMEOUT", default=300)
+USER_CACHE_LOCAL_TIMEOUT = env.float("DJANGO_USER_CACHE_LOCAL_TIMEOUT", default=5.0)
+USER_CACHE_LOCAL_SIZE = 1000
 
 # PASSWORDS
 # ------------------------------------------------------------------------------
 PASSWORD_HASHERS = [
-    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    # Argon2 on a bounded thread pool, see apps.users.hashers
+    "apps.users.hashers.BoundedArgon2PasswordHasher",
     "django.contrib.auth.hashers.PBKDF2PasswordHasher",
     "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
     "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
 ]
 
+# Measure these with `manage.py calibrate_password_hasher` on production
+# hardware; the defaults are Django's. Memory cost is in KiB per hash.
+ARGON2_TIME_COST = env.int("DJANGO_ARGON2_TIME_COST", default=2)
+ARGON2_MEMORY_COST = env.int("DJANGO_ARGON2_MEMORY_COST", default=102400)
+ARGON2_PARALLELISM = env.int("DJANGO_ARGON2_PARALLELISM", default=8)
+# Hashes running at once per process, and how many more may wait; beyond
+# that, or after the timeout, logins and signups get a 503
+PASSWORD_HASHING_WORKERS = env.int("DJANGO_PASSWORD_HASHING_WORKERS", default=2)
+PASSWORD_HASHING_QUEUE = env.int("DJANGO_PASSWORD_HASHING_QUEUE", default=8)
+PASSWORD_HASHING_TIMEOUT = 5.0
+PASSWORD_HASHING_RETRY_AFTER = 2
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -109,6 +167,12 @@ MIDDLEWARE = [
         if DEBUG
         else []
     ),
+    # Health probes short-circuit before anything else runs
+    "apps.core.middleware.HealthCheckMiddleware",
+    "apps.core.middleware.RequestLogMiddleware",
+    "apps.core.middleware.ReplicaRoutingMiddleware",
+    # Compresses the body every middleware below has finished with
+    "apps.core.middleware.CompressionMiddleware",
     # Core Django and third-party middleware
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
@@ -119,7 +183,38 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "allauth.account.middleware.AccountMiddleware",
+    "apps.users.middleware.HashingBusyMiddleware",
+]
+
+# COMPRESSION
+# ------------------------------------------------------------------------------
+# JSON responses only; static files are precompressed by WhiteNoise
+COMPRESSION_CONTENT_TYPES = ["application/json"]
+COMPRESSION_MIN_SIZE = env.int("DJANGO_COMPRESSION_MIN_SIZE", default=1024)
+COMPRESSION_BROTLI_QUALITY = env.int("DJANGO_COMPRESSION_BROTLI_QUALITY", default=4)
+COMPRESSION_GZIP_LEVEL = 6
+# Responses with secrets next to user-controlled data are never compressed
+# (BREACH): the CSRF token, and allauth's session and JWT tokens
+COMPRESSION_EXCLUDE_PATHS = ["/api/csrf/", "/_allauth/"]
+
+# HEALTH CHECKS
+# ------------------------------------------------------------------------------
+HEALTHCHECK_LIVENESS_PATHS = ["/healthz", "/api/health/"]
+HEALTHCHECK_READINESS_PATHS = ["/readyz"]
+HEALTHCHECK_CACHE_SECONDS = env.float("HEALTHCHECK_CACHE_SECONDS", default=5.0)
+
+# ASGI LIFESPAN
+# ------------------------------------------------------------------------------
+# Templates compiled into the cached loader before the server accepts traffic
+STARTUP_WARM_TEMPLATES = [
+    "base.html",
+    "pages/home.html",
+    "account/login.html",
+    "account/signup.html",
+    "users/account_settings.html",
 ]
+# Seconds to wait for websocket clients to disconnect on shutdown
+ASGI_SHUTDOWN_TIMEOUT = env.float("ASGI_SHUTDOWN_TIMEOUT", default=10.0)
 
 # STATIC
 # ------------------------------------------------------------------------------
@@ -192,6 +287,16 @@ DJANGO_ADMIN_FORCE_ALLAUTH = env.bool("DJANGO_ADMIN_FORCE_ALLAUTH", default=Fals
 # LOGGING
 # ------------------------------------------------------------------------------
 
+# Records go through a bounded queue to a writer thread (apps.core.log), one
+# JSON object per line with the request or task context attached. Set
+# DJANGO_LOG_FORMAT=verbose for plain text.
+LOG_FORMAT = env("DJANGO_LOG_FORMAT", default="json")
+LOGGING_QUEUE_SIZE = env.int("DJANGO_LOGGING_QUEUE_SIZE", default=10_000)
+# Fraction of debug/info records kept per logger (and its children)
+LOGGING_SAMPLE_RATES = {
+    "apps.core.access": env.float("DJANGO_ACCESS_LOG_SAMPLE_RATE", default=1.0),
+    "celery.app.trace": 0.1,
+}
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
@@ -199,12 +304,22 @@ LOGGING = {
         "verbose": {
             "format": "%(levelname)s %(asctime)s %(module)s %(process)d %(thread)d %(message)s",
         },
+        "json": {"()": "apps.core.log.JsonFormatter"},
+    },
+    "filters": {
+        "context": {"()": "apps.core.log.ContextFilter"},
+        "sampled": {
+            "()": "apps.core.log.SamplingFilter",
+            "rates": LOGGING_SAMPLE_RATES,
+        },
     },
     "handlers": {
         "console": {
             "level": "DEBUG",
-            "class": "logging.StreamHandler",
-            "formatter": "verbose",
+            "()": "apps.core.log.QueueLogHandler",
+            "maxsize": LOGGING_QUEUE_SIZE,
+            "formatter": LOG_FORMAT,
+            "filters": ["sampled", "context"],
         },
     },
     "root": {"level": "INFO", "handlers": ["console"]},
@@ -214,6 +329,14 @@ LOGGING = {
 REDIS_URL = env("REDIS_URL", default="redis://redis:6379/0")
 REDIS_SSL = REDIS_URL.startswith("rediss://")
 
+# METRICS
+# ------------------------------------------------------------------------------
+# Each process buffers metrics and adds them into a Redis hash every few
+# seconds; /metrics/ renders that hash for Prometheus.
+METRICS_REDIS_URL = env("METRICS_REDIS_URL", default=REDIS_URL)
+METRICS_FLUSH_INTERVAL = env.float("METRICS_FLUSH_INTERVAL", default=5.0)
+METRICS_TOKEN = env("METRICS_TOKEN", default="")
+
 # Celery
 # ------------------------------------------------------------------------------
 if USE_TZ:
@@ -234,9 +357,59 @@ CELERY_TASK_TIME_LIMIT = 5 * 60
 # TODO: set to whatever value is adequate in your circumstances
 CELERY_TASK_SOFT_TIME_LIMIT = 60
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
+# Each class of work gets its own queue and worker pool (see the production
+# compose file), so a large backfill on `bulk` never delays webhook processing.
+CELERY_TASK_DEFAULT_QUEUE = "default"
+CELERY_TASK_QUEUES = tuple(
+    Queue(name, routing_key=name) for name in ("webhooks", "email", "default", "bulk")
+)
+# Routing is by module: put tasks in <app>/tasks/{webhooks,email,bulk}.py.
+# With the Redis broker 0 is the highest priority and 9 the lowest.
+CELERY_TASK_ROUTES = {
+    "apps.*.tasks.webhooks.*": {"queue": "webhooks", "priority": 0},
+    "apps.*.tasks.email.*": {"queue": "email", "priority": 3},
+    "apps.*.tasks.bulk.*": {"queue": "bulk", "priority": 9},
+}
+CELERY_TASK_DEFAULT_PRIORITY = 5
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    "priority_steps": list(range(10)),
+    "sep": ":",
+    # Workers listening on several queues drain them in the order given to -Q
+    "queue_order_strategy": "priority",
+}
 CELERY_WORKER_SEND_TASK_EVENTS = True
 CELERY_TASK_SEND_SENT_EVENT = True
 CELERY_WORKER_HIJACK_ROOT_LOGGER = False
+# Fraction of task executions to run under cProfile (0 disables profiling)
+TASK_PROFILE_SAMPLE_RATE = env.float("TASK_PROFILE_SAMPLE_RATE", default=0.0)
+TASK_PROFILE_TOP_N = env.int("TASK_PROFILE_TOP_N", default=25)
+CELERY_BEAT_SCHEDULE = {
+    "reconcile-stripe-memberships": {
+        "task": "apps.payments.tasks.bulk.reconcile_memberships",
+        "schedule": crontab(minute=30, hour=3),
+    },
+    "create-stripe-event-partitions": {
+        "task": "apps.payments.tasks.bulk.create_stripe_event_partitions",
+        "schedule": crontab(minute=0, hour=2),
+    },
+    "archive-completed-todos": {
+        "task": "apps.api.tasks.bulk.archive_todos",
+        "schedule": crontab(minute=45),
+    },
+    "compact-todo-tombstones": {
+        "task": "apps.api.tasks.bulk.compact_todo_tombstones",
+        "schedule": crontab(minute=15, hour=4),
+    },
+}
+# Completed todos untouched for this many days move to api_archivedtodo, in
+# batches, for at most the time budget per hourly run (see apps.api.archive)
+TODO_ARCHIVE_AFTER_DAYS = env.int("TODO_ARCHIVE_AFTER_DAYS", default=30)
+TODO_ARCHIVE_BATCH_SIZE = 1000
+TODO_ARCHIVE_TIME_BUDGET = 45.0
+# Delta sync (apps.api.sync): deletions are remembered this long; older
+# cursors get a full resync. Cursors trail each poll by the overlap.
+TODO_TOMBSTONE_RETENTION_DAYS = env.int("TODO_TOMBSTONE_RETENTION_DAYS", default=30)
+TODO_SYNC_OVERLAP = 5
 
 # django-allauth
 # ------------------------------------------------------------------------------
@@ -256,6 +429,20 @@ SOCIALACCOUNT_AUTO_SIGNUP = True  # Automatically create accounts for social log
 
 SOCIALACCOUNT_PROVIDERS = {}
 
+# Headless app clients get a short-lived signed access token carrying the user
+# id and membership flags, plus a refresh token (apps.users.tokens). The API
+# accepts the access token without a session or user lookup.
+HEADLESS_TOKEN_STRATEGY = "apps.users.tokens.AccessTokenStrategy"  # noqa: S105
+# An RSA private key (PEM) switches signing from HS256 with SECRET_KEY to RS256
+HEADLESS_JWT_PRIVATE_KEY = env("DJANGO_JWT_PRIVATE_KEY", default="")
+HEADLESS_JWT_ALGORITHM = "RS256" if HEADLESS_JWT_PRIVATE_KEY else "HS256"
+HEADLESS_JWT_ACCESS_TOKEN_EXPIRES_IN = env.int(
+    "DJANGO_JWT_ACCESS_TOKEN_EXPIRES_IN", default=300
+)
+HEADLESS_JWT_REFRESH_TOKEN_EXPIRES_IN = env.int(
+    "DJANGO_JWT_REFRESH_TOKEN_EXPIRES_IN", default=86400
+)
+
 
 # STRIPE
 # ------------------------------------------------------------------------------
@@ -268,6 +455,22 @@ STRIPE_API_VERSION = env("STRIPE_API_VERSION", default=None)
 STRIPE_SUBSCRIBER_METADATA_KEY = env(
     "STRIPE_SUBSCRIBER_METADATA_KEY", default="user_id"
 )
+# Stripe requests made inside a database transaction: "raise", "warn" or "off"
+STRIPE_TRANSACTION_GUARD = env(
+    "STRIPE_TRANSACTION_GUARD", default="raise" if DEBUG else "off"
+)
+# Customers per reconcile shard task, and rows per bulk_update statement
+STRIPE_RECONCILE_SHARD_SIZE = env.int("STRIPE_RECONCILE_SHARD_SIZE", default=1000)
+STRIPE_RECONCILE_BATCH_SIZE = env.int("STRIPE_RECONCILE_BATCH_SIZE", default=500)
+# The nightly reconcile pages through every subscription in one task, far
+# longer than CELERY_TASK_SOFT_TIME_LIMIT allows. Keep both under the Redis
+# broker's visibility timeout (an hour), or the task is delivered twice.
+STRIPE_RECONCILE_SOFT_TIME_LIMIT = env.int(
+    "STRIPE_RECONCILE_SOFT_TIME_LIMIT", default=30 * 60
+)
+STRIPE_RECONCILE_TIME_LIMIT = env.int("STRIPE_RECONCILE_TIME_LIMIT", default=35 * 60)
+# Months of webhook event log partitions kept created ahead of the current one
+STRIPE_EVENT_PARTITIONS_AHEAD = 3
 
 # DJANGO UNFOLD
 # ------------------------------------------------------------------------------
@@ -306,3 +509,36 @@ UNFOLD = {
 # ------------------------------------------------------------------------------
 POSTHOG_API_KEY = env("POSTHOG_API_KEY")
 POSTHOG_HOST = env("POSTHOG_HOST")
+# Server-side capture (apps.core.analytics): one bounded queue per process,
+# sent in batches by a background thread
+ANALYTICS_ENABLED = env.bool("ANALYTICS_ENABLED", default=True)
+ANALYTICS_QUEUE_SIZE = env.int("ANALYTICS_QUEUE_SIZE", default=10_000)
+ANALYTICS_BATCH_SIZE = 100
+ANALYTICS_FLUSH_INTERVAL = env.float("ANALYTICS_FLUSH_INTERVAL", default=5.0)
+ANALYTICS_SEND_TIMEOUT = 5
+# Past this fraction of the queue, non-essential events are sampled
+ANALYTICS_BACKPRESSURE_THRESHOLD = 0.8
+ANALYTICS_BACKPRESSURE_SAMPLE_RATE = 0.1
+
+# SENTRY TRACING
+# ------------------------------------------------------------------------------
+# See apps.core.tracing. Slow, failing and Stripe-calling transactions are
+# always sent; the rest at the rate of the longest matching path or task name
+# prefix, "" being the default. `manage.py trace_sample_rates` overrides these
+# at runtime through the cache.
+SENTRY_TRACES_ROUTE_RATES = {
+    "": env.float("SENTRY_TRACES_SAMPLE_RATE", default=0.0),
+    "/payments/": 1.0,
+}
+# Fraction of transactions recorded in-process for the decision above
+SENTRY_TRACES_RECORD_RATE = env.float("SENTRY_TRACES_RECORD_RATE", default=1.0)
+SENTRY_TRACES_SLOW_SECONDS = env.float("SENTRY_TRACES_SLOW_SECONDS", default=1.0)
+SENTRY_TRACES_RATES_REFRESH = 30.0
+SENTRY_TRACES_IGNORED_PREFIXES = [
+    *HEALTHCHECK_LIVENESS_PATHS,
+    *HEALTHCHECK_READINESS_PATHS,
+    "/metrics/",
+    STATIC_URL,
+    MEDIA_URL,
+    "/favicon.ico",
+]
@@ -26,11 +26,17 @@ TEST_RUNNER = "django.test.runner.DiscoverRunner"
 
 STRIPE_SECRET_KEY = "sk_test_1234567890"  # noqa: S105
 STRIPE_WEBHOOK_SECRET = "whsec_test_1234567890"  # noqa: S105
+STRIPE_TRANSACTION_GUARD = "raise"
 
 # PASSWORDS
 # ------------------------------------------------------------------------------
 PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
 
+# METRICS
+# ------------------------------------------------------------------------------
+METRICS_REDIS_URL = ""
+ANALYTICS_ENABLED = False
+
 # EMAIL
 # ------------------------------------------------------------------------------
 EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
@@ -1,7 +1,6 @@
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
-from django.http import HttpResponse
 from django.http import JsonResponse
 from django.middleware.csrf import get_token
 from django.urls import include
@@ -11,13 +10,11 @@ from django.views.decorators.cache import never_cache
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.views.decorators.http import require_http_methods
 
-from apps.api.api import api
+from apps.core.lazy import lazy_include
+from apps.core.views import metrics
 
 urlpatterns = [
-    path("api/", api.urls),
-    # Allauth headless API endpoints
-    path("_allauth/", include("allauth.headless.urls")),
-    path("api/health/", lambda request: HttpResponse("OK"), name="health_check"),
+    # Ahead of the API mount, so serving it doesn't import the API
     path(
         "api/csrf/",
         never_cache(
@@ -31,6 +28,14 @@ urlpatterns = [
         ),
         name="csrf_token",
     ),
+    # Ninja, pydantic and the schemas load on the first API request
+    path(
+        "api/",
+        lazy_include("apps.api.urls", app_name="ninja", namespace="api-1.0.0"),
+    ),
+    # Allauth headless API endpoints
+    path("_allauth/", include("allauth.headless.urls")),
+    path("metrics/", metrics, name="metrics"),
     path("payments/", include("apps.payments.urls", namespace="payments")),
     # Django Admin, use {% url 'admin:index' %}
     path(settings.ADMIN_URL, admin.site.urls),
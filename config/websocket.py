@@ -1,13 +1,45 @@
+import asyncio
+import contextlib
+
+# send callables of the websocket connections currently open in this process
+active_connections = set()
+_idle = asyncio.Event()
+_idle.set()
+_draining = False
+
+
 async def websocket_application(scope, receive, send):
-    while True:
-        event = await receive()
+    active_connections.add(send)
+    _idle.clear()
+    try:
+        while True:
+            event = await receive()
+
+            if event["type"] == "websocket.connect":
+                if _draining:
+                    await send({"type": "websocket.close", "code": 1012})
+                    break
+                await send({"type": "websocket.accept"})
+
+            if event["type"] == "websocket.disconnect":
+                break
 
-        if event["type"] == "websocket.connect":
-            await send({"type": "websocket.accept"})
+            if event["type"] == "websocket.receive":
+                if event["text"] == "ping":
+                    await send({"type": "websocket.send", "text": "pong!"})
+    finally:
+        active_connections.discard(send)
+        if not active_connections:
+            _idle.set()
 
-        if event["type"] == "websocket.disconnect":
-            break
 
-        if event["type"] == "websocket.receive":
-            if event["text"] == "ping":
-                await send({"type": "websocket.send", "text": "pong!"})
+async def drain_websockets() -> None:
+    """Refuse new connections, ask open ones to close and wait until all are gone."""
+    global _draining  # noqa: PLW0603
+    _draining = True
+    for send in list(active_connections):
+        # 1001 "going away": clients should reconnect to another instance.
+        # The connection may already be gone, which is what we want anyway.
+        with contextlib.suppress(OSError, RuntimeError):
+            await send({"type": "websocket.close", "code": 1001})
+    await _idle.wait()
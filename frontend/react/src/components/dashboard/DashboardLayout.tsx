@@ -17,7 +17,7 @@ interface Todo {
     description: string
     completed: boolean
     created_at: string
-    updated_at: string
+    updated_at?: string
 }
 
 interface User {
@@ -68,7 +68,7 @@ export function DashboardLayout() {
 
     const fetchTodos = async () => {
         try {
-            const response = await fetch('/api/todos/', {
+            const response = await fetch('/api/todos/?fields=id,title,description,completed,created_at', {
                 credentials: 'include',
             })
             if (response.ok) {